@@ -0,0 +1,197 @@
+# analise_estoque.py
+"""
+Análises de estoque por SKU, calculadas com NumPy em uma passada:
+
+- classe ABC pelo volume de saídas no período (A até ABC_LIMITE_A do total
+  acumulado, B até ABC_LIMITE_B, C o resto e os sem saída);
+- giro: saídas do período / estoque médio (média do saldo no início e no
+  fim do período; o do início é o atual desfeito das movimentações);
+- média diária de saída e dias de cobertura do estoque atual.
+
+As quantidades vêm do resumo diário (movimentacoes_resumo_diario), lido uma
+vez por período em arrays; o agrupamento por SKU é feito no NumPy
+(bincount), não no banco. O resultado fica em memória até mudarem os totais
+do resumo no período (toda movimentação soma neles, mesmo a que chega com
+id menor que outra já gravada) ou virar o dia (em UTC, como
+data_movimentacao).
+"""
+import os
+import threading
+from datetime import date, datetime, timedelta
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+import models
+
+ABC_LIMITE_A = float(os.getenv("ABC_LIMITE_A", "0.8"))
+ABC_LIMITE_B = float(os.getenv("ABC_LIMITE_B", "0.95"))
+
+ORDENACOES = {
+    # nome -> (coluna, decrescente)
+    "saidas": ("saidas", True),
+    "giro": ("giro", True),
+    "cobertura": ("dias_cobertura", False),
+}
+
+
+class Analise:
+    """Arrays alinhados por SKU (produto_ids em ordem crescente)."""
+
+    def __init__(self, dias: int, produto_ids, entradas, saidas, ajustes, estoque_atual):
+        self.dias = dias
+        self.produto_ids = produto_ids
+        self.entradas = entradas
+        self.saidas = saidas
+        self.estoque_atual = estoque_atual
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            estoque_inicio = estoque_atual - entradas + saidas - ajustes
+            self.estoque_medio = (estoque_inicio + estoque_atual) / 2
+            self.giro = np.where(self.estoque_medio > 0, saidas / self.estoque_medio, np.nan)
+            self.media_diaria_saida = saidas / dias
+            self.dias_cobertura = np.where(
+                self.media_diaria_saida > 0, np.maximum(estoque_atual, 0) / self.media_diaria_saida, np.inf
+            )
+        self.classes = _classificar_abc(saidas)
+
+    def __len__(self):
+        return len(self.produto_ids)
+
+
+def _classificar_abc(saidas):
+    classes = np.full(len(saidas), "C", dtype="<U1")
+    total = saidas.sum()
+    if total <= 0:
+        return classes
+    ordem = np.argsort(-saidas, kind="stable")
+    acumulado = np.cumsum(saidas[ordem]) / total
+    # A participação acumulada antes do SKU decide a classe: o que cruza o limite entra nela
+    antes = acumulado - saidas[ordem] / total
+    ordenadas = np.select([antes < ABC_LIMITE_A, antes < ABC_LIMITE_B], ["A", "B"], "C")
+    ordenadas[saidas[ordem] <= 0] = "C"
+    classes[ordem] = ordenadas
+    return classes
+
+
+def _matriz(linhas, colunas: int):
+    return np.fromiter(chain.from_iterable(linhas), dtype=np.int64, count=len(linhas) * colunas).reshape(-1, colunas)
+
+def _calcular(db: Session, dias: int, hoje: date) -> Analise:
+    resumo = models.MovimentacaoResumoDiario
+    movimentos = _matriz(db.execute(
+        select(
+            resumo.produto_id,
+            case((resumo.tipo == "saida", 1), (resumo.tipo == "ajuste", 2), else_=0),
+            resumo.quantidade_total
+        ).where(resumo.dia > hoje - timedelta(days=dias))
+    ).all(), 3)
+    estoque = _matriz(db.execute(
+        select(models.Estoque.produto_id, func.coalesce(models.Estoque.quantidade, 0))
+        .where(models.Estoque.produto_id.is_not(None))
+    ).all(), 2)
+
+    # Um índice por SKU que tenha movimentação no período ou saldo
+    produto_ids = np.union1d(movimentos[:, 0], estoque[:, 0])
+    posicao_mov = np.searchsorted(produto_ids, movimentos[:, 0])
+    quantidade = movimentos[:, 2].astype(np.float64)
+    total = len(produto_ids)
+    # Ajustes (escritas diretas no saldo) não são entrada nem saída, mas
+    # entram na conta do saldo no início do período
+    saidas, entradas, ajustes = (
+        np.bincount(posicao_mov, weights=np.where(movimentos[:, 1] == codigo, quantidade, 0), minlength=total)
+        for codigo in (1, 0, 2)
+    )
+    estoque_atual = np.bincount(
+        np.searchsorted(produto_ids, estoque[:, 0]), weights=estoque[:, 1].astype(np.float64), minlength=total
+    )
+    return Analise(dias, produto_ids, entradas, saidas, ajustes, estoque_atual)
+
+
+# --- Cache até a próxima movimentação ---
+_cache: dict[int, tuple[tuple, Analise]] = {}
+_lock = threading.Lock()
+
+def analise(db: Session, dias: int) -> Analise:
+    """Análise dos últimos `dias` dias (incluindo hoje), recalculada só se houver movimentação nova."""
+    hoje = datetime.utcnow().date()  # mesmo relógio de data_movimentacao (crud)
+    resumo = models.MovimentacaoResumoDiario
+    versao = (hoje, *db.execute(
+        select(func.count(), func.sum(resumo.movimentacoes), func.sum(resumo.quantidade_total))
+        .where(resumo.dia > hoje - timedelta(days=dias))
+    ).one())
+    with _lock:
+        guardada = _cache.get(dias)
+        if guardada is None or guardada[0] != versao:
+            _cache[dias] = (versao, _calcular(db, dias, hoje))
+        return _cache[dias][1]
+
+
+# --- Respostas ---
+def _numero(valor: float):
+    return round(float(valor), 2) if np.isfinite(valor) else None
+
+def listar(
+    db: Session,
+    dias: int,
+    classe: str | None = None,
+    cobertura_maxima: float | None = None,
+    ordenar: str = "saidas",
+    limite: int = 100
+) -> list[dict]:
+    """SKUs filtrados por classe ABC e/ou dias de cobertura, ordenados e limitados no NumPy."""
+    a = analise(db, dias)
+    selecao = np.ones(len(a), dtype=bool)
+    if classe:
+        selecao &= a.classes == classe
+    if cobertura_maxima is not None:
+        selecao &= a.dias_cobertura <= cobertura_maxima
+    indices = np.flatnonzero(selecao)
+
+    coluna, decrescente = ORDENACOES[ordenar]
+    valores = getattr(a, coluna)[indices]
+    valores = np.where(np.isnan(valores), -np.inf if decrescente else np.inf, valores)
+    indices = indices[np.argsort(-valores if decrescente else valores, kind="stable")[:limite]]
+
+    ids = a.produto_ids[indices].tolist()
+    produtos = dict(
+        (id_, (sku, descricao)) for id_, sku, descricao in db.execute(
+            select(models.Produto.id, models.Produto.sku, models.Produto.descricao)
+            .where(models.Produto.id.in_(ids))
+        )
+    ) if ids else {}
+    return [
+        {
+            "produto_id": id_,
+            "sku": produtos.get(id_, (None, None))[0],
+            "descricao": produtos.get(id_, (None, None))[1],
+            "classe_abc": str(a.classes[i]),
+            "saidas": int(a.saidas[i]),
+            "entradas": int(a.entradas[i]),
+            "estoque_atual": int(a.estoque_atual[i]),
+            "estoque_medio": _numero(a.estoque_medio[i]),
+            "giro": _numero(a.giro[i]),
+            "media_diaria_saida": _numero(a.media_diaria_saida[i]),
+            "dias_cobertura": _numero(a.dias_cobertura[i]),
+        }
+        for id_, i in zip(ids, indices.tolist())
+    ]
+
+def resumo_abc(db: Session, dias: int) -> list[dict]:
+    """Por classe: quantidade de SKUs, saídas e participação nas saídas do período."""
+    a = analise(db, dias)
+    total = a.saidas.sum()
+    resumo = []
+    for classe in ("A", "B", "C"):
+        selecao = a.classes == classe
+        saidas = a.saidas[selecao].sum()
+        resumo.append({
+            "classe": classe,
+            "skus": int(selecao.sum()),
+            "saidas": int(saidas),
+            "participacao": round(float(saidas / total), 4) if total else 0.0,
+            "estoque_atual": int(a.estoque_atual[selecao].sum()),
+        })
+    return resumo
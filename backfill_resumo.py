@@ -0,0 +1,39 @@
+# backfill_resumo.py
+"""
+Recalcula o resumo diário de movimentações (movimentacoes_resumo_diario)
+a partir da tabela movimentacoes.
+
+A migração 0003 já faz a carga inicial; use este comando para reconstruir
+o resumo depois de correções manuais no histórico, inteiro ou por período.
+O recálculo nunca começa antes do primeiro dia ainda presente em
+movimentacoes: os totais de meses arquivados (particoes.py arquivar) são
+mantidos.
+
+Uso (a partir da raiz do projeto):
+    python backfill_resumo.py
+    python backfill_resumo.py --inicio 2025-01-01 --fim 2025-01-31
+"""
+import argparse
+from datetime import date
+
+import crud, models
+from database import Base, SessionLocal, engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inicio", type=date.fromisoformat, default=None, help="primeiro dia (AAAA-MM-DD)")
+    parser.add_argument("--fim", type=date.fromisoformat, default=None, help="último dia (AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine, tables=[models.MovimentacaoResumoDiario.__table__])
+    db = SessionLocal()
+    try:
+        gravadas = crud.recalcular_resumo_movimentacoes(db, args.inicio, args.fim)
+    finally:
+        db.close()
+    print(f"Resumo recalculado: {gravadas} linhas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# benchmarks/carga_async.py
+"""
+Teste de carga: caminho síncrono (def + Session/psycopg2, no threadpool)
+contra o assíncrono (async def + AsyncSession/asyncpg) nas rotas de
+consulta de estoque e de movimentação.
+
+Os dois caminhos são montados num app próprio, lado a lado, e recebem a
+mesma carga de clientes concorrentes via httpx (ASGITransport, sem rede).
+Mostra requisições/s e p50/p99 de cada um.
+
+Precisa de um banco com produtos, locais e estoque (ex.: /popular_estoque).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.carga_async --clientes 50 --requisicoes 2000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import crud, crud_async, models, schemas
+from database import SessionLocal, get_async_db, get_db
+
+
+def _montar_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync/estoque/{produto_id}")
+    def estoque_sync(produto_id: int, db: Session = Depends(get_db)):
+        return [schemas.EstoqueProdutoOut.model_validate(e) for e in crud.get_estoque_por_produto(db, produto_id)]
+
+    @app.post("/sync/movimentacoes")
+    def movimentacao_sync(mov: schemas.MovimentacaoCreate, db: Session = Depends(get_db)):
+        return schemas.Movimentacao.model_validate(crud.create_movimentacao(db, mov))
+
+    @app.get("/async/estoque/{produto_id}")
+    async def estoque_async(produto_id: int, db: AsyncSession = Depends(get_async_db)):
+        return [schemas.EstoqueProdutoOut.model_validate(e) for e in await crud_async.get_estoque_por_produto(db, produto_id)]
+
+    @app.post("/async/movimentacoes")
+    async def movimentacao_async(mov: schemas.MovimentacaoCreate, db: AsyncSession = Depends(get_async_db)):
+        return schemas.Movimentacao.model_validate(await crud_async.create_movimentacao(db, mov))
+
+    return app
+
+def _pares_estoque(limite: int = 1000):
+    db = SessionLocal()
+    try:
+        return db.query(models.Estoque.produto_id, models.Estoque.local_id).limit(limite).all()
+    finally:
+        db.close()
+
+async def _carga(cliente: httpx.AsyncClient, prefixo: str, pares, clientes: int, requisicoes: int, escrita: float):
+    latencias = []
+    erros = 0
+    restantes = iter(range(requisicoes))
+
+    async def trabalhador():
+        nonlocal erros
+        for _ in restantes:
+            produto_id, local_id = random.choice(pares)
+            inicio = time.perf_counter()
+            if random.random() < escrita:
+                r = await cliente.post(f"{prefixo}/movimentacoes", json={
+                    "tipo": "entrada", "produto_id": produto_id, "local_id": local_id, "quantidade": 1
+                })
+            else:
+                r = await cliente.get(f"{prefixo}/estoque/{produto_id}")
+            latencias.append(time.perf_counter() - inicio)
+            if r.status_code != 200:
+                erros += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(clientes)))
+    total = time.perf_counter() - inicio
+
+    latencias.sort()
+    p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+    return requisicoes / total, statistics.median(latencias), p99, erros
+
+async def executar(clientes: int, requisicoes: int, escrita: float):
+    pares = _pares_estoque()
+    if not pares:
+        raise SystemExit("Banco sem estoque: popule antes (POST /popular_estoque)")
+
+    transporte = httpx.ASGITransport(app=_montar_app())
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        print(f"clientes={clientes} requisicoes={requisicoes} escrita={escrita:.0%}")
+        for prefixo in ("/sync", "/async"):
+            # Aquecimento: abre as conexões do pool antes de medir
+            await _carga(cliente, prefixo, pares, clientes, clientes, 0)
+        for prefixo in ("/sync", "/async"):
+            vazao, p50, p99, erros = await _carga(cliente, prefixo, pares, clientes, requisicoes, escrita)
+            print(f"{prefixo[1:]:>5}: {vazao:7.0f} req/s  p50={p50 * 1000:6.1f}ms  p99={p99 * 1000:6.1f}ms  erros={erros}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, default=50)
+    parser.add_argument("--requisicoes", type=int, default=2000)
+    parser.add_argument("--escrita", type=float, default=0.2, help="fração de POST /movimentacoes (padrão 0.2)")
+    args = parser.parse_args()
+    asyncio.run(executar(args.clientes, args.requisicoes, args.escrita))
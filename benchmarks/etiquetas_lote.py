@@ -0,0 +1,53 @@
+# benchmarks/etiquetas_lote.py
+"""
+Benchmark de renderização de etiquetas: etiquetas/s no caminho por
+requisição (uma etiqueta por vez, na thread da requisição) contra o lote
+distribuído no pool de processos (etiquetas_lote.renderizar_lote).
+
+O cache é ignorado nas duas medições, para comparar só a renderização.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.etiquetas_lote --etiquetas 300 --processos 4
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+import etiquetas_lote
+from qrcode_utils import renderizar_etiqueta_rack
+
+
+def _locais(n: int):
+    return [
+        SimpleNamespace(id=i, codigo=f"A01-C{i // 40:02d}-R{i % 40:02d}", descricao=f"Rack {i}", rack_nivel=f"N{i % 5}")
+        for i in range(1, n + 1)
+    ]
+
+def executar(etiquetas: int, processos: int | None):
+    locais = _locais(etiquetas)
+    if processos:
+        etiquetas_lote.ETIQUETAS_PROCESSOS = processos
+
+    inicio = time.perf_counter()
+    for local in locais:
+        renderizar_etiqueta_rack(local.codigo, local.descricao, local.rack_nivel, local.id)
+    sequencial = etiquetas / (time.perf_counter() - inicio)
+
+    itens = [etiquetas_lote.item_local(l) for l in locais]
+    # Aquece o pool (criação dos processos não entra na medição)
+    list(etiquetas_lote.renderizar_lote(itens[:etiquetas_lote.ETIQUETAS_PROCESSOS], usar_cache=False))
+    inicio = time.perf_counter()
+    gerados = sum(1 for _ in etiquetas_lote.renderizar_lote(itens, usar_cache=False))
+    lote = gerados / (time.perf_counter() - inicio)
+
+    print(f"processos={etiquetas_lote.ETIQUETAS_PROCESSOS} etiquetas={etiquetas}")
+    print(f"por requisição: {sequencial:.0f} etiquetas/s")
+    print(f"lote (pool):    {lote:.0f} etiquetas/s ({lote / sequencial:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--etiquetas", type=int, default=300)
+    parser.add_argument("--processos", type=int, default=None, help="padrão: ETIQUETAS_PROCESSOS ou nº de CPUs")
+    args = parser.parse_args()
+    executar(args.etiquetas, args.processos)
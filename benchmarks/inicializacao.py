@@ -0,0 +1,70 @@
+# benchmarks/inicializacao.py
+"""
+Tempo de inicialização a frio de um worker: import de main, lifespan
+(startup) e primeira resposta de GET /saude, cada rodada num processo
+Python novo (sem módulos em cache na memória).
+
+Mostra a mediana e o pior caso de cada etapa e confere que as dependências
+de etiquetas (qrcode, PIL) não são carregadas ao subir a API.
+
+Uso (a partir da raiz do projeto; o banco precisa estar migrado):
+    python -m benchmarks.inicializacao --rodadas 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Executado em cada processo filho
+_SCRIPT = """
+import json, sys, time
+inicio = time.perf_counter()
+import main
+importado = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as cliente:
+    pronto = time.perf_counter()
+    status = cliente.get("/saude").status_code
+    respondido = time.perf_counter()
+print(json.dumps({
+    "import": importado - inicio,
+    "pronto": pronto - inicio,
+    "primeira_resposta": respondido - inicio,
+    "status": status,
+    "modulos_etiqueta": sorted(m for m in ("qrcode", "PIL", "PIL.Image") if m in sys.modules),
+}))
+"""
+
+ETAPAS = ("import", "pronto", "primeira_resposta")
+
+
+def _rodada() -> dict:
+    saida = subprocess.run(
+        [sys.executable, "-c", _SCRIPT], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rodadas", type=int, default=10)
+    args = parser.parse_args()
+
+    _rodada()  # aquece o cache de disco e os .pyc
+    rodadas = [_rodada() for _ in range(args.rodadas)]
+
+    for etapa in ETAPAS:
+        tempos = [r[etapa] * 1000 for r in rodadas]
+        print(f"{etapa:>18}: mediana {statistics.median(tempos):7.1f} ms | pior {max(tempos):7.1f} ms")
+
+    if any(r["status"] != 200 for r in rodadas):
+        raise SystemExit("GET /saude não respondeu 200")
+    carregados = sorted({m for r in rodadas for m in r["modulos_etiqueta"]})
+    if carregados:
+        raise SystemExit(f"Módulos de etiqueta carregados na inicialização: {', '.join(carregados)}")
+    print("OK: qrcode e PIL não são carregados na inicialização")
+
+
+if __name__ == "__main__":
+    main()
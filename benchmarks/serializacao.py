@@ -0,0 +1,93 @@
+# benchmarks/serializacao.py
+"""
+Linhas/s servidas por /estoque e /relatorios/estoque-geral antes e depois
+do caminho rápido de serialização (respostas.py).
+
+- /estoque: todas as páginas (limit=1000) com validação pelo response_model
+  (VALIDAR_RESPOSTAS=true, antes) e pelo caminho rápido (false, depois).
+- /relatorios/estoque-geral: lista de dicts pelo encoder padrão do FastAPI
+  (crud.relatorio_estoque_geral, antes) e a rota atual com orjson (depois).
+
+Uso (a partir da raiz do projeto; aponte DATABASE_URL para um banco de teste):
+    python -m benchmarks.serializacao --produtos 500 --locais 200
+"""
+import argparse
+import time
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+import crud, models, respostas
+from database import Base, SessionLocal, engine, get_db
+from main import app
+
+
+def _semear(produtos: int, locais: int) -> int:
+    db = SessionLocal()
+    try:
+        prefixo = f"SER{time.time_ns()}-"
+        db.add_all(models.Produto(sku=f"{prefixo}{i}", descricao=f"Produto {i}", lote=f"L{i % 50}") for i in range(produtos))
+        db.add_all(
+            models.Local(codigo=f"{prefixo}{i}", armazem=prefixo, corredor=str(i % 20), rack_nivel=str(i), descricao=f"Local {i}")
+            for i in range(locais)
+        )
+        db.commit()
+        crud.popular_estoque(db, quantidade_default=5, armazem=prefixo, prefixo_sku=prefixo)
+        return db.query(models.Estoque).count()
+    finally:
+        db.close()
+
+def _app_antes() -> FastAPI:
+    antes = FastAPI()
+
+    @antes.get("/relatorios/estoque-geral")
+    def estoque_geral(db: Session = Depends(get_db)):
+        return crud.relatorio_estoque_geral(db)
+
+    return antes
+
+def _todas_as_paginas(client) -> int:
+    linhas, url = 0, "/estoque?limit=1000"
+    while url:
+        resposta = client.get(url)
+        linhas += len(resposta.json())
+        cursor = resposta.headers.get("X-Next-Cursor")
+        url = f"/estoque?limit=1000&cursor={cursor}" if cursor else None
+    return linhas
+
+def _medir(funcao, repeticoes: int):
+    melhor, linhas = float("inf"), 0
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        linhas = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return linhas / melhor, linhas
+
+def executar(produtos: int, locais: int, repeticoes: int):
+    Base.metadata.create_all(bind=engine)
+    total = _semear(produtos, locais)
+    print(f"linhas de estoque no banco: {total} (orjson={'sim' if respostas.orjson else 'não'})")
+
+    with TestClient(app) as client, TestClient(_app_antes()) as client_antes:
+        resultados = {}
+        for validar in (True, False):
+            respostas.VALIDAR_RESPOSTAS = validar
+            resultados["/estoque", validar] = _medir(lambda: _todas_as_paginas(client), repeticoes)
+        resultados["/relatorios/estoque-geral", True] = _medir(
+            lambda: len(client_antes.get("/relatorios/estoque-geral").json()), repeticoes)
+        resultados["/relatorios/estoque-geral", False] = _medir(
+            lambda: len(client.get("/relatorios/estoque-geral").json()), repeticoes)
+
+    for rota in ("/estoque", "/relatorios/estoque-geral"):
+        antes, depois = resultados[rota, True][0], resultados[rota, False][0]
+        print(f"{rota}: antes {antes:,.0f} linhas/s, depois {depois:,.0f} linhas/s ({depois / antes:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--produtos", type=int, default=500)
+    parser.add_argument("--locais", type=int, default=200)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+    executar(args.produtos, args.locais, args.repeticoes)
@@ -0,0 +1,132 @@
+# benchmarks/stress_movimentacoes.py
+"""
+Teste de estresse de concorrência de create_movimentacao sobre um único item.
+
+Vários workers registram entradas e saídas no mesmo produto/local ao mesmo
+tempo. Ao final, o saldo em `estoque` precisa bater com a soma das
+movimentações gravadas e nunca pode ficar negativo. Para comparação, o modo
+"legado" reproduz o antigo ler-alterar-gravar em Python (perde atualizações)
+e "legado-bloqueio" o mesmo fluxo corrigido com SELECT ... FOR UPDATE.
+A invariante do modo atomico também roda nos testes, em escala menor
+(tests/test_concorrencia_movimentacoes.py, com TEST_POSTGRES_URL); este
+script fica para a carga alta e a comparação com os modos legados.
+
+Uso (a partir da raiz do projeto; aponte DATABASE_URL para um banco de teste):
+    python -m benchmarks.stress_movimentacoes --workers 32 --operacoes 200
+    python -m benchmarks.stress_movimentacoes --modo legado-bloqueio
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from sqlalchemy import func
+
+import crud, models, schemas
+from database import SessionLocal, engine, Base
+
+
+def _preparar(saldo_inicial: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        produto = models.Produto(sku=f"STRESS-{time.time_ns()}", descricao="Item de estresse")
+        local = models.Local(codigo=f"STRESS-{time.time_ns()}", armazem="B", corredor="0", rack_nivel="0")
+        db.add_all([produto, local])
+        db.commit()
+        db.add(models.Estoque(produto_id=produto.id, local_id=local.id, quantidade=saldo_inicial))
+        db.commit()
+        return produto.id, local.id
+    finally:
+        db.close()
+
+def _movimentar_legado(db, mov: schemas.MovimentacaoCreate, bloquear: bool = False):
+    # Antigo create_movimentacao: lê o saldo, altera em Python e grava.
+    # Com bloquear=True usa SELECT ... FOR UPDATE, a forma correta desse fluxo.
+    produto = db.query(models.Produto).filter(models.Produto.id == mov.produto_id).first()
+    local = db.query(models.Local).filter(models.Local.id == mov.local_id).first()
+    query = db.query(models.Estoque).filter_by(produto_id=mov.produto_id, local_id=mov.local_id)
+    estoque = (query.with_for_update() if bloquear else query).first()
+    if mov.tipo == "saida":
+        if estoque.quantidade < mov.quantidade:
+            raise HTTPException(status_code=400, detail="Quantidade insuficiente em estoque")
+        estoque.quantidade -= mov.quantidade
+    else:
+        estoque.quantidade += mov.quantidade
+    db_mov = models.Movimentacao(**mov.model_dump())
+    db.add(db_mov)
+    db.commit()
+    db.refresh(db_mov)
+    db.refresh(estoque)
+
+def _worker(produto_id: int, local_id: int, operacoes: int, modo: str, semente: int):
+    rnd = random.Random(semente)
+    aceitas = recusadas = 0
+    db = SessionLocal()
+    try:
+        for _ in range(operacoes):
+            mov = schemas.MovimentacaoCreate(
+                tipo=rnd.choice(("entrada", "saida")),
+                produto_id=produto_id,
+                local_id=local_id,
+                quantidade=rnd.randint(1, 5)
+            )
+            try:
+                if modo == "atomico":
+                    crud.create_movimentacao(db, mov)
+                else:
+                    _movimentar_legado(db, mov, bloquear=(modo == "legado-bloqueio"))
+                aceitas += 1
+            except HTTPException:
+                db.rollback()
+                recusadas += 1
+    finally:
+        db.close()
+    return aceitas, recusadas
+
+def executar(workers: int, operacoes: int, modo: str, saldo_inicial: int):
+    produto_id, local_id = _preparar(saldo_inicial)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        resultados = list(pool.map(
+            lambda i: _worker(produto_id, local_id, operacoes, modo, i), range(workers)
+        ))
+    duracao = time.perf_counter() - inicio
+
+    db = SessionLocal()
+    try:
+        saldo = db.query(models.Estoque.quantidade).filter_by(produto_id=produto_id, local_id=local_id).scalar()
+        linhas = db.query(func.count(models.Estoque.id)).filter_by(produto_id=produto_id, local_id=local_id).scalar()
+        somas = dict(
+            db.query(models.Movimentacao.tipo, func.sum(models.Movimentacao.quantidade))
+            .filter_by(produto_id=produto_id, local_id=local_id)
+            .group_by(models.Movimentacao.tipo)
+            .all()
+        )
+    finally:
+        db.close()
+
+    esperado = saldo_inicial + (somas.get("entrada") or 0) - (somas.get("saida") or 0)
+    aceitas = sum(a for a, _ in resultados)
+    recusadas = sum(r for _, r in resultados)
+
+    print(f"modo={modo} workers={workers} operacoes/worker={operacoes}")
+    print(f"aceitas={aceitas} recusadas={recusadas} tempo={duracao:.2f}s "
+          f"vazao={aceitas / duracao:.0f} movimentações/s")
+    print(f"saldo={saldo} esperado={esperado} linhas_estoque={linhas}")
+
+    ok = saldo == esperado and saldo >= 0 and linhas == 1
+    print("OK" if ok else "FALHA: saldo divergente das movimentações")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--operacoes", type=int, default=200, help="movimentações por worker")
+    parser.add_argument("--modo", choices=("atomico", "legado", "legado-bloqueio"), default="atomico")
+    parser.add_argument("--saldo-inicial", type=int, default=100)
+    args = parser.parse_args()
+    raise SystemExit(0 if executar(args.workers, args.operacoes, args.modo, args.saldo_inicial) else 1)
@@ -0,0 +1,119 @@
+# benchmarks/suite/__init__.py
+"""
+Suíte de benchmarks reprodutível da API: armazém sintético, microbenchmarks
+de crud.py e das etiquetas, e teste de carga em processo com tráfego misto
+(coletores e relatórios). Cada execução grava um JSON em
+benchmarks/resultados/ para comparar versões.
+
+Use um banco só para isso (DATABASE_URL): a semente apaga os dados. Os
+microbenchmarks e a carga gravam movimentações, então, para comparar
+versões, semeie a cada execução (--semear) com os mesmos parâmetros.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.suite semear --produtos 5000 --locais 1000 --movimentacoes 200000
+    python -m benchmarks.suite executar                    # micro + carga sobre o banco semeado
+    python -m benchmarks.suite executar --semear --produtos 2000 --saida base.json
+    python -m benchmarks.suite comparar base.json benchmarks/resultados/20250101-120000.json
+
+`comparar` mostra a variação do p50 de cada medida e termina com código 1
+se alguma piorar mais que a tolerância (padrão 10%).
+"""
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+PASTA_RESULTADOS = Path(__file__).resolve().parent.parent / "resultados"
+VERSAO_FORMATO = 1
+
+
+def estatisticas(tempos: list[float]) -> dict:
+    """Resumo de uma lista de durações (segundos), em milissegundos."""
+    ordenados = sorted(tempos)
+
+    def percentil(p):
+        return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] * 1000
+
+    return {
+        "n": len(ordenados),
+        "media_ms": round(statistics.fmean(ordenados) * 1000, 3),
+        "p50_ms": round(statistics.median(ordenados) * 1000, 3),
+        "p95_ms": round(percentil(0.95), 3),
+        "p99_ms": round(percentil(0.99), 3),
+        "max_ms": round(ordenados[-1] * 1000, 3),
+    }
+
+
+def _commit_git() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ambiente(engine) -> dict:
+    return {
+        "commit": _commit_git(),
+        "banco": engine.dialect.name,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "executado_em": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def salvar(resultado: dict, caminho: str | None = None) -> Path:
+    if caminho:
+        destino = Path(caminho)
+    else:
+        sufixo = f"-{resultado['ambiente']['commit']}" if resultado["ambiente"]["commit"] else ""
+        destino = PASTA_RESULTADOS / f"{datetime.now():%Y%m%d-%H%M%S}{sufixo}.json"
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+    return destino
+
+
+def _medidas(resultado: dict) -> dict[str, float]:
+    # nome -> p50 (ms) de cada microbenchmark e de cada rota da carga
+    medidas = {f"micro/{nome}": m["p50_ms"] for nome, m in resultado.get("micro", {}).items()}
+    medidas.update(
+        (f"carga/{rota}", m["p50_ms"]) for rota, m in resultado.get("carga", {}).get("rotas", {}).items()
+    )
+    return medidas
+
+def comparar(base: dict, novo: dict, tolerancia: float = 0.10) -> list[str]:
+    """Imprime a variação de cada p50 e retorna as medidas que pioraram além da tolerância."""
+    antes, depois = _medidas(base), _medidas(novo)
+    pioraram = []
+    print(f"base: {base['ambiente'].get('commit')}  novo: {novo['ambiente'].get('commit')}")
+    for chave in ("dados", "parametros"):
+        if base.get(chave) != novo.get(chave):
+            print(f"aviso: {chave} diferentes ({base.get(chave)} x {novo.get(chave)})")
+    if base["ambiente"].get("banco") != novo["ambiente"].get("banco"):
+        print(f"aviso: bancos diferentes ({base['ambiente'].get('banco')} x {novo['ambiente'].get('banco')})")
+    for nome in sorted(antes.keys() | depois.keys()):
+        if nome not in antes or nome not in depois:
+            print(f"{nome:<48} {'só na base' if nome in antes else 'nova':>28}")
+            continue
+        variacao = (depois[nome] - antes[nome]) / antes[nome] if antes[nome] else 0.0
+        marca = ""
+        if variacao > tolerancia:
+            pioraram.append(nome)
+            marca = "  <-- piorou"
+        print(f"{nome:<48} {antes[nome]:9.2f} -> {depois[nome]:9.2f} ms  {variacao:+7.1%}{marca}")
+
+    vazao_antes = base.get("carga", {}).get("vazao_rps")
+    vazao_depois = novo.get("carga", {}).get("vazao_rps")
+    if vazao_antes and vazao_depois:
+        print(f"{'carga/vazao':<48} {vazao_antes:9.1f} -> {vazao_depois:9.1f} req/s")
+    return pioraram
+
+
+def carregar(caminho: str) -> dict:
+    resultado = json.loads(Path(caminho).read_text(encoding="utf-8"))
+    if resultado.get("versao") != VERSAO_FORMATO:
+        sys.exit(f"{caminho}: formato {resultado.get('versao')} não suportado")
+    return resultado
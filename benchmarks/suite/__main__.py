@@ -0,0 +1,67 @@
+# benchmarks/suite/__main__.py
+import argparse
+
+from benchmarks.suite import VERSAO_FORMATO, ambiente, carregar, comparar, salvar
+from benchmarks.suite import carga, micro, semente
+
+parser = argparse.ArgumentParser(prog="python -m benchmarks.suite", description="Suíte de benchmarks da API.")
+comandos = parser.add_subparsers(dest="comando", required=True)
+
+def _argumentos_semente(subparser):
+    subparser.add_argument("--produtos", type=int, default=5000)
+    subparser.add_argument("--locais", type=int, default=1000)
+    subparser.add_argument("--movimentacoes", type=int, default=200_000)
+    subparser.add_argument("--dias", type=int, default=365)
+    subparser.add_argument("--semente", type=int, default=42)
+
+semear = comandos.add_parser("semear", help="apaga os dados e grava o armazém sintético")
+_argumentos_semente(semear)
+
+executar = comandos.add_parser("executar", help="microbenchmarks e teste de carga; grava o JSON")
+_argumentos_semente(executar)
+executar.add_argument("--semear", action="store_true", help="semeia antes de medir")
+executar.add_argument("--repeticoes", type=int, default=50, help="chamadas por microbenchmark")
+executar.add_argument("--filtro", help="só os microbenchmarks cujo nome contém este trecho")
+executar.add_argument("--coletores", type=int, default=32, help="clientes de coletor na carga")
+executar.add_argument("--relatorios", type=int, default=2, help="clientes de relatórios na carga")
+executar.add_argument("--duracao", type=float, default=20, help="segundos de carga (0 = sem carga)")
+executar.add_argument("--saida", help="arquivo JSON (padrão: benchmarks/resultados/<data>-<commit>.json)")
+
+comparar_args = comandos.add_parser("comparar", help="compara dois resultados (p50 de cada medida)")
+comparar_args.add_argument("base")
+comparar_args.add_argument("novo")
+comparar_args.add_argument("--tolerancia", type=float, default=0.10, help="piora aceita (padrão 0.10)")
+
+args = parser.parse_args()
+
+if args.comando == "comparar":
+    pioraram = comparar(carregar(args.base), carregar(args.novo), args.tolerancia)
+    raise SystemExit(1 if pioraram else 0)
+
+from database import engine
+from migracoes import preparar_schema
+
+preparar_schema(engine, verbose=False)
+if args.comando == "semear" or args.semear:
+    dados = semente.semear(args.produtos, args.locais, args.movimentacoes, args.dias, args.semente)
+    print(f"Semeado em {dados['segundos']}s: {dados}")
+    if args.comando == "semear":
+        raise SystemExit(0)
+
+amostra = semente.amostra()
+resultado = {
+    "versao": VERSAO_FORMATO,
+    "ambiente": ambiente(engine),
+    "dados": semente.contar(),
+    "parametros": {
+        "repeticoes": args.repeticoes,
+        "coletores": args.coletores,
+        "relatorios": args.relatorios,
+        "duracao_s": args.duracao,
+        "semente": args.semente,
+    },
+    "micro": micro.executar(amostra, args.repeticoes, args.semente, args.filtro),
+}
+if args.duracao > 0:
+    resultado["carga"] = carga.executar(amostra, args.coletores, args.relatorios, args.duracao, args.semente)
+print(f"Resultado: {salvar(resultado, args.saida)}")
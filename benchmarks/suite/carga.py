@@ -0,0 +1,126 @@
+# benchmarks/suite/carga.py
+"""
+Teste de carga em processo: o app de main.py recebe, via httpx
+(ASGITransport, sem rede), tráfego misto por um tempo fixo:
+
+- coletores: consultas de estoque por produto/local, movimentações,
+  busca de produtos e etiquetas, sem pausa entre as requisições;
+- relatórios: um ciclo pelos relatórios, em poucos clientes.
+
+Latências por rota (molde da URL) e vazão total, com as respostas fora de
+2xx contadas como erro (saídas recusadas por falta de saldo, 400, à parte).
+"""
+import asyncio
+import random
+import time
+from datetime import timedelta
+
+import httpx
+
+from benchmarks.suite import estatisticas
+
+# (rota, peso) das operações dos coletores
+OPERACOES_COLETOR = (
+    ("GET /locais_do_produto/{produto_id}", 30),
+    ("GET /produtos_por_local/{local_id}", 15),
+    ("POST /movimentacoes (entrada)", 15),
+    ("POST /movimentacoes (saida)", 10),
+    ("GET /produtos/busca", 15),
+    ("GET /qrcode/produto/{produto_id}", 10),
+    ("GET /qrcode/local/{local_id}", 5),
+)
+
+
+def _requisicao_coletor(rota: str, amostra, aleatorio: random.Random):
+    produto_id, local_id = aleatorio.choice(amostra.pares)
+    if rota.startswith("POST /movimentacoes"):
+        tipo = "saida" if rota.endswith("(saida)") else "entrada"
+        corpo = {"tipo": tipo, "produto_id": produto_id, "local_id": local_id, "quantidade": 1}
+        return "POST", "/movimentacoes", {"json": corpo}
+    if rota == "GET /produtos/busca":
+        return "GET", "/produtos/busca", {"params": {"q": aleatorio.choice(amostra.produtos).sku[:-2]}}
+    caminho = rota.split(" ", 1)[1].format(produto_id=produto_id, local_id=local_id)
+    return "GET", caminho, {}
+
+def _requisicoes_relatorio(amostra):
+    ultimo = amostra.ultimo_dia
+    return [
+        ("GET /relatorios/resumo-movimentacoes", "/relatorios/resumo-movimentacoes",
+         {"data_inicio": str(ultimo - timedelta(days=29)), "data_fim": str(ultimo)}),
+        ("GET /relatorios/movimentacoes", "/relatorios/movimentacoes",
+         {"data_inicio": str(ultimo), "data_fim": str(ultimo)}),
+        ("GET /relatorios/estoque-em/{data}", f"/relatorios/estoque-em/{ultimo - timedelta(days=7)}", {}),
+        ("GET /relatorios/inventario-por-local", "/relatorios/inventario-por-local", {}),
+        ("GET /relatorios/inventario-hierarquia", "/relatorios/inventario-hierarquia", {}),
+        ("GET /relatorios/estoque-geral", "/relatorios/estoque-geral", {}),
+        ("GET /estoque", "/estoque", {"limit": 1000}),
+    ]
+
+
+async def _executar(app, amostra, coletores: int, relatorios: int, duracao: float, semente: int) -> dict:
+    latencias: dict[str, list[float]] = {}
+    erros: dict[str, int] = {}
+    recusadas = 0
+    fim = time.perf_counter() + duracao
+
+    def registrar(rota, inicio, status):
+        nonlocal recusadas
+        latencias.setdefault(rota, []).append(time.perf_counter() - inicio)
+        if status == 400 and rota.endswith("(saida)"):
+            recusadas += 1
+        elif not 200 <= status < 300:
+            erros[rota] = erros.get(rota, 0) + 1
+
+    async def coletor(cliente, numero):
+        aleatorio = random.Random(semente * 1000 + numero)
+        rotas, pesos = zip(*OPERACOES_COLETOR)
+        while time.perf_counter() < fim:
+            rota = aleatorio.choices(rotas, pesos)[0]
+            metodo, caminho, opcoes = _requisicao_coletor(rota, amostra, aleatorio)
+            inicio = time.perf_counter()
+            resposta = await cliente.request(metodo, caminho, **opcoes)
+            registrar(rota, inicio, resposta.status_code)
+
+    async def usuario_relatorios(cliente, numero):
+        ciclo = _requisicoes_relatorio(amostra)
+        posicao = numero
+        while time.perf_counter() < fim:
+            rota, caminho, parametros = ciclo[posicao % len(ciclo)]
+            posicao += 1
+            inicio = time.perf_counter()
+            resposta = await cliente.get(caminho, params=parametros)
+            registrar(rota, inicio, resposta.status_code)
+
+    # Exceções do app viram 500 (contadas como erro) em vez de interromper a carga
+    transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://suite", timeout=None) as cliente:
+        inicio = time.perf_counter()
+        await asyncio.gather(
+            *(coletor(cliente, i) for i in range(coletores)),
+            *(usuario_relatorios(cliente, i) for i in range(relatorios)),
+        )
+        total = time.perf_counter() - inicio
+
+    requisicoes = sum(len(t) for t in latencias.values())
+    rotas = {
+        rota: {**estatisticas(tempos), "erros": erros.get(rota, 0)}
+        for rota, tempos in sorted(latencias.items())
+    }
+    return {
+        "duracao_s": round(total, 2),
+        "requisicoes": requisicoes,
+        "vazao_rps": round(requisicoes / total, 1),
+        "erros": sum(erros.values()),
+        "saidas_recusadas": recusadas,
+        "rotas": rotas,
+    }
+
+
+def executar(amostra, coletores: int = 32, relatorios: int = 2, duracao: float = 20, semente: int = 42) -> dict:
+    from main import app
+
+    resultado = asyncio.run(_executar(app, amostra, coletores, relatorios, duracao, semente))
+    for rota, m in resultado["rotas"].items():
+        print(f"{rota:<48} n {m['n']:6d}  p50 {m['p50_ms']:9.2f} ms  p99 {m['p99_ms']:9.2f} ms  erros {m['erros']}")
+    print(f"vazão: {resultado['vazao_rps']} req/s  erros: {resultado['erros']}  saídas recusadas: {resultado['saidas_recusadas']}")
+    return resultado
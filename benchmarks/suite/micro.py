@@ -0,0 +1,103 @@
+# benchmarks/suite/micro.py
+"""
+Microbenchmarks: cada função de crud.py e cada renderizador de etiqueta
+chamado isoladamente, em sessão nova a cada chamada (como uma requisição),
+com argumentos sorteados do armazém semeado.
+"""
+import random
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import crud, schemas
+from database import SessionLocal
+from benchmarks.suite import estatisticas
+
+AQUECIMENTO = 2
+# Relatórios que leem o estoque inteiro rodam menos vezes
+FRACAO_COMPLETOS = 0.2
+
+
+def _casos(amostra, aleatorio: random.Random):
+    """[(nome, chamada, usa_banco, completo)]; `chamada` recebe uma sessão (ou None, sem banco)."""
+
+    def par():
+        return aleatorio.choice(amostra.pares)
+
+    def dia():
+        return amostra.primeiro_dia + timedelta(days=aleatorio.randrange((amostra.ultimo_dia - amostra.primeiro_dia).days + 1))
+
+    def entrada():
+        produto_id, local_id = par()
+        return schemas.MovimentacaoCreate(tipo="entrada", produto_id=produto_id, local_id=local_id, quantidade=1)
+
+    def prefixo_sku():
+        return aleatorio.choice(amostra.produtos).sku[:-2].lower()
+
+    def palavra_com_erro():
+        palavra = aleatorio.choice(amostra.produtos).descricao.split()[0].lower()
+        posicao = aleatorio.randrange(1, len(palavra))
+        return palavra[:posicao] + palavra[posicao + 1:]
+
+    def etiqueta_rack(_):
+        local = aleatorio.choice(amostra.locais)
+        return _qrcode().renderizar_etiqueta_rack(local.codigo, local.descricao, local.rack_nivel, local.id)
+
+    def etiqueta_produto(_):
+        id_, sku, descricao = aleatorio.choice(amostra.produtos)
+        return _qrcode().renderizar_etiqueta_produto(
+            SimpleNamespace(id=id_, sku=sku, descricao=descricao, lote="L001", validade=date.today())
+        )
+
+    return [
+        ("get_estoque_por_produto", lambda db: crud.get_estoque_por_produto(db, par()[0]), True, False),
+        ("get_estoque_por_local", lambda db: crud.get_estoque_por_local(db, par()[1]), True, False),
+        ("get_estoque_plano (1000)", lambda db: crud.get_estoque_plano(db, limit=1000), True, False),
+        ("get_movimentacoes_filtradas (produto)",
+         lambda db: crud.get_movimentacoes_filtradas(db, produto_id=par()[0], limit=100), True, False),
+        ("buscar_produtos (prefixo)", lambda db: crud.buscar_produtos(db, prefixo_sku(), 20), True, False),
+        ("buscar_produtos (com erro)", lambda db: crud.buscar_produtos(db, palavra_com_erro(), 20), True, False),
+        ("create_movimentacao", lambda db: crud.create_movimentacao(db, entrada()), True, False),
+        ("create_movimentacoes_lote (50)",
+         lambda db: crud.create_movimentacoes_lote(db, [entrada() for _ in range(50)]), True, False),
+        ("relatorio_movimentacoes_por_periodo (1 dia)",
+         lambda db: crud.relatorio_movimentacoes_por_periodo(db, *(2 * [dia()])), True, False),
+        ("relatorio_resumo_movimentacoes (30 dias)",
+         lambda db: crud.relatorio_resumo_movimentacoes(db, amostra.ultimo_dia - timedelta(days=29), amostra.ultimo_dia), True, False),
+        ("relatorio_estoque_em", lambda db: crud.relatorio_estoque_em(db, dia()), True, True),
+        ("relatorio_estoque_geral", crud.relatorio_estoque_geral, True, True),
+        ("relatorio_inventario_por_local", crud.relatorio_inventario_por_local, True, True),
+        ("relatorio_inventario_hierarquia", crud.relatorio_inventario_hierarquia, True, False),
+        ("renderizar_etiqueta_rack", etiqueta_rack, False, False),
+        ("renderizar_etiqueta_produto", etiqueta_produto, False, False),
+    ]
+
+def _qrcode():
+    import qrcode_utils
+    return qrcode_utils
+
+
+def _medir(chamada, usa_banco: bool) -> float:
+    inicio = time.perf_counter()
+    if usa_banco:
+        with SessionLocal() as db:
+            chamada(db)
+    else:
+        chamada(None)
+    return time.perf_counter() - inicio
+
+
+def executar(amostra, repeticoes: int = 50, semente: int = 42, filtro: str | None = None) -> dict:
+    """Mede cada caso `repeticoes` vezes; retorna {nome: estatísticas}."""
+    aleatorio = random.Random(semente)
+    resultados = {}
+    for nome, chamada, usa_banco, completo in _casos(amostra, aleatorio):
+        if filtro and filtro not in nome:
+            continue
+        vezes = max(3, int(repeticoes * FRACAO_COMPLETOS)) if completo else repeticoes
+        for _ in range(AQUECIMENTO):
+            _medir(chamada, usa_banco)
+        tempos = [_medir(chamada, usa_banco) for _ in range(vezes)]
+        resultados[nome] = {**estatisticas(tempos), "ops_s": round(len(tempos) / sum(tempos), 1)}
+        print(f"{nome:<48} p50 {resultados[nome]['p50_ms']:9.2f} ms  p95 {resultados[nome]['p95_ms']:9.2f} ms")
+    return resultados
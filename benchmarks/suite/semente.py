@@ -0,0 +1,150 @@
+# benchmarks/suite/semente.py
+"""
+Armazém sintético reprodutível: a mesma semente gera os mesmos produtos,
+locais, saldos e movimentações em qualquer banco.
+
+Cada produto fica em 1 a 3 locais. As movimentações são distribuídas em
+ordem cronológica pelos últimos `dias` dias (até ontem), e uma saída só
+ocorre se houver saldo. O estoque final, o resumo diário e um snapshot
+no meio do período são gravados como a aplicação gravaria.
+"""
+import random
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import func, insert, select, text
+
+import busca_produtos, cache_catalogo, crud, models, particoes
+from database import SessionLocal, engine
+
+PALAVRAS = (
+    "Parafuso", "Porca", "Arruela", "Bucha", "Prego", "Rebite", "Abraçadeira", "Dobradiça",
+    "Cabo", "Conector", "Fita", "Luva", "Tubo", "Joelho", "Registro", "Válvula",
+)
+ACABAMENTOS = ("zincado", "inox", "galvanizado", "latão", "nylon", "aço carbono", "PVC")
+TABELAS = (
+    "movimentacoes", "movimentacoes_resumo_diario", "estoque_snapshots", "estoque", "produtos", "locais",
+)
+LOTE_INSERCAO = 5000
+
+
+def _limpar():
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text(f"TRUNCATE {', '.join(TABELAS)} RESTART IDENTITY CASCADE"))
+        else:
+            for tabela in TABELAS:
+                conn.execute(text(f"DELETE FROM {tabela}"))
+
+def _inserir(conn, tabela, linhas: list[dict]):
+    for inicio in range(0, len(linhas), LOTE_INSERCAO):
+        conn.execute(insert(tabela), linhas[inicio:inicio + LOTE_INSERCAO])
+
+
+def contar() -> dict:
+    with engine.connect() as conn:
+        return {
+            "produtos": conn.execute(select(func.count()).select_from(models.Produto)).scalar(),
+            "locais": conn.execute(select(func.count()).select_from(models.Local)).scalar(),
+            "estoque": conn.execute(select(func.count()).select_from(models.Estoque)).scalar(),
+            "movimentacoes": conn.execute(select(func.count()).select_from(models.Movimentacao)).scalar(),
+        }
+
+
+def amostra() -> SimpleNamespace:
+    """Pares de estoque, produtos, locais e período do banco semeado, para sortear argumentos."""
+    with SessionLocal() as db:
+        pares = db.execute(select(models.Estoque.produto_id, models.Estoque.local_id)).all()
+        periodo = db.execute(
+            select(func.min(models.Movimentacao.data_movimentacao), func.max(models.Movimentacao.data_movimentacao))
+        ).one()
+        produtos = db.execute(select(models.Produto.id, models.Produto.sku, models.Produto.descricao)).all()
+        locais = db.execute(select(models.Local)).scalars().all()
+    if not pares or periodo[0] is None:
+        raise SystemExit("Banco sem dados: rode `python -m benchmarks.suite semear` antes")
+    return SimpleNamespace(
+        pares=pares, produtos=produtos, locais=locais, primeiro_dia=periodo[0], ultimo_dia=periodo[1]
+    )
+
+
+def semear(produtos: int, locais: int, movimentacoes: int, dias: int = 365, semente: int = 42) -> dict:
+    """Apaga os dados e grava o armazém sintético. Retorna as contagens e o tempo gasto."""
+    aleatorio = random.Random(semente)
+    inicio_semente = time.perf_counter()
+    hoje = date.today()
+    primeiro_dia = hoje - timedelta(days=dias)
+
+    _limpar()
+    particoes.criar_particoes(engine, primeiro_dia.replace(day=1), hoje)
+    particoes.garantir_particoes(engine)
+
+    with engine.begin() as conn:
+        _inserir(conn, models.Produto.__table__, [
+            {
+                "sku": f"BENCH-{i:07d}",
+                "descricao": f"{aleatorio.choice(PALAVRAS)} {aleatorio.choice(ACABAMENTOS)} {aleatorio.randint(2, 64)}mm",
+                "lote": f"L{i % 100:03d}",
+                "validade": hoje + timedelta(days=aleatorio.randint(30, 900)),
+            }
+            for i in range(produtos)
+        ])
+        _inserir(conn, models.Local.__table__, [
+            {
+                "codigo": f"A{i % 4}-C{i // 4 % 40:02d}-R{i // 160:04d}",
+                "armazem": f"A{i % 4}",
+                "corredor": f"C{i // 4 % 40:02d}",
+                "rack_nivel": f"R{i // 160:04d}-N{i % 5}",
+                "descricao": f"Posição {i}",
+            }
+            for i in range(locais)
+        ])
+        ids_produtos = conn.execute(select(models.Produto.id).order_by(models.Produto.id)).scalars().all()
+        ids_locais = conn.execute(select(models.Local.id).order_by(models.Local.id)).scalars().all()
+
+        pares = sorted({
+            (produto_id, aleatorio.choice(ids_locais))
+            for produto_id in ids_produtos
+            for _ in range(aleatorio.randint(1, 3))
+        })
+        saldos = dict.fromkeys(pares, 0)
+        linhas = []
+        for k in range(movimentacoes):
+            par = aleatorio.choice(pares)
+            quantidade = aleatorio.randint(1, 20)
+            tipo = "saida" if saldos[par] >= quantidade and aleatorio.random() < 0.4 else "entrada"
+            saldos[par] += quantidade if tipo == "entrada" else -quantidade
+            linhas.append({
+                "tipo": tipo,
+                "quantidade": quantidade,
+                "produto_id": par[0],
+                "local_id": par[1],
+                "data_movimentacao": primeiro_dia + timedelta(days=k * dias // max(movimentacoes, 1)),
+            })
+        _inserir(conn, models.Movimentacao.__table__, linhas)
+
+        agora = datetime.utcnow()
+        _inserir(conn, models.Estoque.__table__, [
+            {"produto_id": p, "local_id": l, "quantidade": saldo, "atualizado_em": agora}
+            for (p, l), saldo in saldos.items()
+        ])
+
+    with SessionLocal() as db:
+        crud.recalcular_resumo_movimentacoes(db)
+        crud.criar_snapshot_estoque(db, hoje - timedelta(days=max(dias // 2, 1)))
+
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE"))
+
+    # As inserções em massa não passam pelos eventos do ORM, e os ids recomeçam
+    cache_catalogo.produtos.limpar()
+    cache_catalogo.locais.limpar()
+    busca_produtos.indice.sujo = True
+
+    return {
+        **contar(),
+        "dias": dias,
+        "semente": semente,
+        "segundos": round(time.perf_counter() - inicio_semente, 2),
+    }
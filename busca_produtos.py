@@ -0,0 +1,177 @@
+# busca_produtos.py
+"""
+Índice de prefixos em memória para /produtos/busca, usado quando o banco
+não tem os índices de trigramas (SQLite dos testes, PostgreSQL sem
+pg_trgm). Com eles, a busca é feita no banco (crud.buscar_produtos).
+
+O índice guarda, em listas ordenadas, o SKU e cada palavra da descrição
+(minúsculos); um prefixo vira um intervalo achado por bisect. É montado na
+primeira busca; produtos novos entram no commit, e alterações ou exclusões
+feitas pelo ORM fazem a próxima busca remontá-lo, assim como passar de
+BUSCA_INDICE_TTL (alterações de outros processos).
+
+Relevância (0 a 1, mesma escala da busca no banco):
+    1.0  SKU igual ao termo
+    0.9  SKU começa com o termo
+    0.8  uma palavra da descrição começa com o termo
+    <0.8 semelhança com um SKU ou palavra (erros de digitação), procurada
+         só entre as BUSCA_VIZINHOS chaves vizinhas do termo na ordem
+         alfabética: um erro no primeiro caractere pode não ser achado
+"""
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from difflib import SequenceMatcher
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+import models
+
+BUSCA_INDICE_TTL = float(os.getenv("BUSCA_INDICE_TTL", "300"))
+# Índice em memória: chaves comparadas por semelhança de cada lado do termo
+BUSCA_VIZINHOS = int(os.getenv("BUSCA_VIZINHOS", "500"))
+# Termos menores que isso só casam por prefixo (como os trigramas no banco)
+TAMANHO_MINIMO_SIMILARIDADE = 3
+SIMILARIDADE_MINIMA = 0.6
+
+COLUNAS = ("id", "sku", "descricao", "lote", "validade")
+
+
+def normalizar(texto: str) -> str:
+    return " ".join(texto.lower().split())
+
+
+class IndicePrefixos:
+    def __init__(self, ttl: float = BUSCA_INDICE_TTL):
+        self.ttl = ttl
+        self.sujo = True
+        self._montado_em = 0.0
+        self._lock = threading.Lock()
+        # Trocados juntos a cada montagem: as buscas leem sempre um estado completo
+        self._estado = ({}, [], [])  # (id -> linha, [(sku, id)], [(palavra, id)])
+
+    def _montar(self, db: Session):
+        produtos, skus, palavras = {}, [], []
+        colunas = [getattr(models.Produto, c) for c in COLUNAS]
+        for linha in db.execute(select(*colunas)):
+            produto = dict(zip(COLUNAS, linha))
+            produtos[produto["id"]] = produto
+            skus.append(_chave_sku(produto))
+            palavras.extend(_chaves_palavras(produto))
+        skus.sort()
+        palavras.sort()
+        self._estado = (produtos, skus, palavras)
+
+    def adicionar(self, produto: dict):
+        """Inclui um produto novo sem remontar o índice."""
+        with self._lock:
+            produtos, skus, palavras = self._estado
+            if produto["id"] in produtos:
+                return
+            produtos[produto["id"]] = produto
+            insort(skus, _chave_sku(produto))
+            for chave in _chaves_palavras(produto):
+                insort(palavras, chave)
+
+    def _atual(self, db: Session):
+        with self._lock:
+            if self.sujo or time.monotonic() - self._montado_em > self.ttl:
+                self.sujo = False  # antes de montar: uma alteração durante a montagem marca de novo
+                self._montado_em = time.monotonic()
+                self._montar(db)
+            return self._estado
+
+    def buscar(self, db: Session, termo: str, limite: int) -> list[dict]:
+        termo = normalizar(termo)
+        produtos, skus, palavras = self._atual(db)
+        encontrados: dict[int, float] = {}
+
+        def adicionar(id_, relevancia):
+            if len(encontrados) < limite and id_ not in encontrados:
+                encontrados[id_] = relevancia
+
+        # Prefixo do SKU (o igual vem primeiro na ordem)
+        for chave, id_ in _com_prefixo(skus, termo):
+            adicionar(id_, 1.0 if chave == termo else 0.9)
+            if len(encontrados) >= limite:
+                break
+
+        # Prefixo de uma palavra da descrição
+        if len(encontrados) < limite:
+            for _, id_ in _com_prefixo(palavras, termo):
+                adicionar(id_, 0.8)
+                if len(encontrados) >= limite:
+                    break
+
+        # Semelhança (erros de digitação): só entre as chaves vizinhas do termo
+        # na ordem alfabética, para o custo não crescer com o catálogo
+        if len(encontrados) < limite and len(termo) >= TAMANHO_MINIMO_SIMILARIDADE:
+            comparador = SequenceMatcher(b=termo)
+            semelhantes = []
+            for chaves in (skus, palavras):
+                posicao = bisect_left(chaves, (termo,))
+                for chave, id_ in chaves[max(posicao - BUSCA_VIZINHOS, 0):posicao + BUSCA_VIZINHOS]:
+                    comparador.set_seq1(chave)
+                    if comparador.quick_ratio() >= SIMILARIDADE_MINIMA and comparador.ratio() >= SIMILARIDADE_MINIMA:
+                        semelhantes.append((comparador.ratio(), chave, id_))
+            for razao, _, id_ in sorted(semelhantes, key=lambda item: (-item[0], item[1])):
+                adicionar(id_, round(0.8 * razao, 4))
+
+        ordenados = sorted(encontrados.items(), key=lambda item: -item[1])
+        return [{**produtos[id_], "relevancia": relevancia} for id_, relevancia in ordenados]
+
+
+def _chave_sku(produto: dict) -> tuple[str, int]:
+    return produto["sku"].lower(), produto["id"]
+
+def _chaves_palavras(produto: dict) -> list[tuple[str, int]]:
+    return [(p, produto["id"]) for p in set(normalizar(produto["descricao"]).split())]
+
+def _com_prefixo(chaves: list[tuple[str, int]], prefixo: str):
+    """(chave, id) das chaves que começam com `prefixo`, em ordem."""
+    for posicao in range(bisect_left(chaves, (prefixo,)), len(chaves)):
+        chave = chaves[posicao]
+        if not chave[0].startswith(prefixo):
+            break
+        yield chave
+
+
+indice = IndicePrefixos()
+
+
+# --- Atualização pelos eventos do ORM ---
+def _ao_inserir(mapper, connection, obj):
+    # Entra no índice só após o commit (um rollback descarta)
+    sessao = Session.object_session(obj)
+    if sessao is not None:
+        sessao.info.setdefault("_busca_produtos_novos", []).append({c: getattr(obj, c) for c in COLUNAS})
+
+def _ao_alterar(mapper, connection, obj):
+    indice.sujo = True
+    sessao = Session.object_session(obj)
+    if sessao is not None:
+        # De novo após o commit: uma montagem entre o flush e o commit não vê a alteração
+        sessao.info["_busca_produtos_sujo"] = True
+
+event.listen(models.Produto, "after_insert", _ao_inserir)
+for _evento in ("after_update", "after_delete"):
+    event.listen(models.Produto, _evento, _ao_alterar)
+
+@event.listens_for(Session, "after_commit")
+def _apos_commit(sessao):
+    if sessao.info.pop("_busca_produtos_sujo", False):
+        indice.sujo = True
+    for produto in sessao.info.pop("_busca_produtos_novos", ()):
+        indice.adicionar(produto)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _apos_rollback(sessao, transacao_anterior):
+    sessao.info.pop("_busca_produtos_sujo", None)
+    sessao.info.pop("_busca_produtos_novos", None)
+
+@event.listens_for(Session, "do_orm_execute")
+def _update_delete_em_massa(estado):
+    if (estado.is_update or estado.is_delete) and any(m.class_ is models.Produto for m in estado.all_mappers):
+        indice.sujo = True
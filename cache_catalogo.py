@@ -0,0 +1,170 @@
+# cache_catalogo.py
+"""
+Cache em memória dos catálogos (Produto e Local), consultados a cada
+movimentação e etiqueta e que quase nunca mudam.
+
+Leitura com carga sob demanda (read-through), tamanho limitado (LRU) e
+TTL. Inserções, alterações e exclusões feitas pelo ORM invalidam as
+entradas do registro no flush e de novo após o commit. O TTL limita por
+quanto tempo outros processos (vários workers) veem um registro antigo.
+
+Os registros guardados são cópias imutáveis (namedtuple) das colunas, não
+objetos do ORM: podem ser compartilhados entre sessões e threads.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+import models
+from metricas import Contador, registrar
+
+CATALOGO_TTL = float(os.getenv("CATALOGO_CACHE_TTL", "300"))
+CATALOGO_TAMANHO = int(os.getenv("CATALOGO_CACHE_TAMANHO", "10000"))
+CATALOGO_AQUECER = os.getenv("CATALOGO_AQUECER", "true").lower() in ("1", "true", "sim")
+
+CONSULTAS_CACHE = registrar(Contador(
+    "wms_catalogo_cache_total", "Consultas ao cache de catálogo (acerto/falha)", ("catalogo", "resultado")
+))
+
+
+def _tipo_registro(modelo):
+    return namedtuple(f"{modelo.__name__}Catalogo", [c.key for c in inspect(modelo).column_attrs])
+
+
+class CacheCatalogo:
+    """LRU com TTL de um catálogo, indexado por id e por uma chave natural (sku, codigo)."""
+
+    def __init__(self, modelo, campo_chave: str, tamanho: int = CATALOGO_TAMANHO, ttl: float = CATALOGO_TTL):
+        self.modelo = modelo
+        self.nome = modelo.__tablename__
+        self.campo_chave = campo_chave
+        self.tamanho = tamanho
+        self.ttl = ttl
+        self.acertos = 0
+        self.falhas = 0
+        self._registro = _tipo_registro(modelo)
+        self._entradas: OrderedDict[tuple, tuple] = OrderedDict()  # (campo, valor) -> (registro, expira_em)
+        self._lock = threading.Lock()
+
+    def congelar(self, obj):
+        return self._registro(*(getattr(obj, campo) for campo in self._registro._fields))
+
+    def consultar(self, campo: str, valor):
+        """Registro em cache (sem ir ao banco), ou None. Conta acerto/falha."""
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get((campo, valor))
+            if entrada is not None and entrada[1] > agora:
+                self._entradas.move_to_end((campo, valor))
+                self.acertos += 1
+                resultado = "acerto"
+            else:
+                if entrada is not None:
+                    del self._entradas[(campo, valor)]
+                entrada = None
+                self.falhas += 1
+                resultado = "falha"
+        CONSULTAS_CACHE.inc(catalogo=self.nome, resultado=resultado)
+        return entrada[0] if entrada else None
+
+    def guardar(self, obj):
+        """Guarda o objeto do ORM (por id e pela chave natural) e retorna o registro imutável."""
+        registro = self.congelar(obj)
+        expira_em = time.monotonic() + self.ttl
+        with self._lock:
+            for chave in (("id", registro.id), (self.campo_chave, getattr(registro, self.campo_chave))):
+                self._entradas[chave] = (registro, expira_em)
+                self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.tamanho:
+                self._entradas.popitem(last=False)
+        return registro
+
+    def invalidar(self, id_):
+        """Remove as entradas do registro `id_`, inclusive pela chave natural antiga."""
+        with self._lock:
+            for chave in [c for c, (r, _) in self._entradas.items() if r.id == id_]:
+                del self._entradas[chave]
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def obter(self, db: Session, campo: str, valor):
+        """Read-through: cache, senão uma query (que alimenta o cache). None se não existir."""
+        registro = self.consultar(campo, valor)
+        if registro is None:
+            obj = db.query(self.modelo).filter(getattr(self.modelo, campo) == valor).first()
+            if obj is not None:
+                registro = self.guardar(obj)
+        return registro
+
+    def ids_existentes(self, db: Session, ids) -> set:
+        """Dos `ids`, os que existem: os em cache sem ir ao banco, o resto numa query IN."""
+        existentes, faltantes = set(), set()
+        for id_ in ids:
+            (existentes if self.consultar("id", id_) is not None else faltantes).add(id_)
+        if faltantes:
+            for obj in db.query(self.modelo).filter(self.modelo.id.in_(faltantes)):
+                existentes.add(self.guardar(obj).id)
+        return existentes
+
+    def aquecer(self, db: Session) -> int:
+        """Carrega até `tamanho / 2` registros (cada um ocupa duas chaves). Retorna quantos."""
+        total = 0
+        for obj in db.query(self.modelo).order_by(self.modelo.id).limit(self.tamanho // 2):
+            self.guardar(obj)
+            total += 1
+        return total
+
+
+produtos = CacheCatalogo(models.Produto, "sku")
+locais = CacheCatalogo(models.Local, "codigo")
+_caches = {models.Produto: produtos, models.Local: locais}
+
+
+def aquecer(db: Session) -> dict:
+    """Pré-carrega os catálogos (chamado ao subir a API se CATALOGO_AQUECER)."""
+    return {cache.nome: cache.aquecer(db) for cache in _caches.values()}
+
+def estatisticas() -> dict:
+    return {
+        cache.nome: {"acertos": cache.acertos, "falhas": cache.falhas, "entradas": len(cache._entradas)}
+        for cache in _caches.values()
+    }
+
+
+# --- Invalidação pelos eventos do ORM ---
+def _ao_alterar(mapper, connection, obj):
+    cache = _caches[type(obj)]
+    cache.invalidar(obj.id)
+    # De novo após o commit: uma leitura concorrente entre o flush e o commit
+    # pode ter recolocado a versão antiga no cache
+    sessao = Session.object_session(obj)
+    if sessao is not None:
+        sessao.info.setdefault("_catalogo_invalidar", set()).add((type(obj), obj.id))
+
+for _modelo in _caches:
+    for _evento in ("after_insert", "after_update", "after_delete"):
+        event.listen(_modelo, _evento, _ao_alterar)
+
+@event.listens_for(Session, "after_commit")
+def _apos_commit(sessao):
+    for modelo, id_ in sessao.info.pop("_catalogo_invalidar", ()):
+        _caches[modelo].invalidar(id_)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _apos_rollback(sessao, transacao_anterior):
+    sessao.info.pop("_catalogo_invalidar", None)
+
+@event.listens_for(Session, "do_orm_execute")
+def _update_delete_em_massa(estado):
+    # query.update()/delete() e update()/delete() não passam pelos eventos de mapper
+    if estado.is_update or estado.is_delete:
+        for mapper in estado.all_mappers:
+            cache = _caches.get(mapper.class_)
+            if cache is not None:
+                cache.limpar()
@@ -0,0 +1,155 @@
+# cache_etiquetas.py
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from fastapi import Request, Response
+
+# Pasta do cache em disco e quantidade de PNGs mantidos em memória
+CACHE_DIR = os.getenv("ETIQUETAS_CACHE_DIR", ".cache/etiquetas")
+CACHE_TAMANHO = int(os.getenv("ETIQUETAS_CACHE_TAMANHO", "512"))
+# Limite da pasta em disco; ao passar dele, as etiquetas usadas há mais tempo
+# são apagadas até sobrar CACHE_DISCO_FOLGA do limite
+CACHE_DISCO_MB = float(os.getenv("ETIQUETAS_CACHE_DISCO_MB", "200"))
+CACHE_DISCO_FOLGA = 0.8
+
+logger = logging.getLogger("wms.etiquetas")
+
+# Altere ao mudar o desenho das etiquetas, para descartar as já renderizadas
+VERSAO_LAYOUT = "1"
+
+
+def chave_etiqueta(tipo: str, *campos) -> str:
+    """
+    Hash dos dados que aparecem na etiqueta. Se a linha de origem mudar
+    (sku, descrição, lote, validade, código...), a chave muda junto, então
+    uma etiqueta desatualizada nunca é servida.
+    """
+    dados = json.dumps([VERSAO_LAYOUT, tipo, *campos], default=str, ensure_ascii=False)
+    return hashlib.sha256(dados.encode()).hexdigest()
+
+
+# --- Cache em dois níveis: LRU em memória na frente do disco ---
+class CacheEtiquetas:
+    def __init__(self, pasta: str = CACHE_DIR, tamanho: int = CACHE_TAMANHO, disco_mb: float = CACHE_DISCO_MB):
+        self.pasta = Path(pasta)
+        self.tamanho = tamanho
+        self.disco_maximo = int(disco_mb * 1024 * 1024)
+        self._memoria: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disco_lock = threading.Lock()
+        self._bytes_disco = None  # estimativa do uso da pasta; medida na primeira gravação
+
+    def _caminho(self, chave: str) -> Path:
+        return self.pasta / chave[:2] / f"{chave}.png"
+
+    def _guardar_memoria(self, chave: str, png: bytes):
+        with self._lock:
+            self._memoria[chave] = png
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.tamanho:
+                self._memoria.popitem(last=False)
+
+    def consultar(self, chave: str) -> bytes | None:
+        """PNG já renderizado (memória, depois disco), ou None."""
+        with self._lock:
+            png = self._memoria.get(chave)
+            if png is not None:
+                self._memoria.move_to_end(chave)
+                return png
+        caminho = self._caminho(chave)
+        try:
+            png = caminho.read_bytes()
+            os.utime(caminho)  # mtime = último uso, para a limpeza apagar as menos usadas
+        except OSError:
+            return None
+        self._guardar_memoria(chave, png)
+        return png
+
+    def guardar(self, chave: str, png: bytes):
+        caminho = self._caminho(chave)
+        try:
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            temporario = caminho.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            temporario.write_bytes(png)
+            os.replace(temporario, caminho)  # escrita atômica
+        except OSError:
+            pass  # disco indisponível: segue só com a memória
+        else:
+            self._contar_disco(len(png))
+        self._guardar_memoria(chave, png)
+
+    # --- Limite do disco ---
+    def _arquivos_disco(self) -> list[tuple[float, int, Path]]:
+        arquivos = []
+        for caminho in self.pasta.glob("*/*.png"):
+            try:
+                info = caminho.stat()
+            except OSError:
+                continue  # apagado por outro processo
+            arquivos.append((info.st_mtime, info.st_size, caminho))
+        return arquivos
+
+    def _contar_disco(self, tamanho: int):
+        with self._disco_lock:
+            if self._bytes_disco is None:
+                self._bytes_disco = sum(t for _, t, _ in self._arquivos_disco())
+            else:
+                self._bytes_disco += tamanho
+            if self._bytes_disco > self.disco_maximo:
+                self._podar_disco()
+
+    def _podar_disco(self):
+        # Mede de novo (outros workers gravam na mesma pasta) e apaga as
+        # etiquetas usadas há mais tempo até sobrar a folga
+        arquivos = sorted(self._arquivos_disco())
+        total = sum(t for _, t, _ in arquivos)
+        alvo = self.disco_maximo * CACHE_DISCO_FOLGA
+        apagados = 0
+        for _, tamanho, caminho in arquivos:
+            if total <= alvo:
+                break
+            caminho.unlink(missing_ok=True)
+            total -= tamanho
+            apagados += 1
+        self._bytes_disco = total
+        logger.info("Cache de etiquetas em disco podado: %s arquivos apagados, %.1f MB restantes",
+                    apagados, total / 1024 / 1024)
+
+    def obter(self, chave: str, renderizar) -> bytes:
+        """Retorna o PNG da chave; só chama `renderizar()` se não estiver em memória nem em disco."""
+        png = self.consultar(chave)
+        if png is None:
+            png = renderizar()
+            self.guardar(chave, png)
+        return png
+
+    def limpar(self):
+        with self._lock:
+            self._memoria.clear()
+
+
+cache = CacheEtiquetas()
+
+
+# --- Resposta HTTP com ETag / If-None-Match ---
+def _etag_confere(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidatos = [e.strip().removeprefix("W/") for e in if_none_match.split(",")]
+    return "*" in candidatos or etag in candidatos
+
+def responder_etiqueta(request: Request, chave: str, renderizar) -> Response:
+    """
+    Envia o PNG da etiqueta com ETag. Se o cliente já tem a mesma versão
+    (If-None-Match), responde 304 sem renderizar nem transferir a imagem.
+    """
+    etag = f'"{chave}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_confere(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cache.obter(chave, renderizar), media_type="image/png", headers=headers)
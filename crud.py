@@ -1,15 +1,18 @@
 # crud.py
-from sqlalchemy.orm import relationship, Session
+from sqlalchemy.orm import relationship, Session, joinedload
 import models, schemas
+import busca_produtos, cache_catalogo, particoes
 from fastapi import HTTPException
 from datetime import datetime, date, timedelta
-from sqlalchemy import and_, func
+from sqlalchemy import and_, or_, func, tuple_, update, select, literal, true, delete, insert, cast, text, case, union_all, BigInteger, Date
+from sqlalchemy.exc import IntegrityError
 from models import Movimentacao, Produto, Local
+from paginacao import paginar, preparar_pagina, fechar_pagina, LIMITE_PADRAO
 
 
 # Produtos
-def get_produtos(db: Session):
-    return db.query(models.Produto).all()
+def get_produtos(db: Session, limit: int = LIMITE_PADRAO, cursor: str | None = None):
+    return paginar(db.query(models.Produto), [models.Produto.id], limit, cursor)
 
 def create_produto(db: Session, produto: schemas.ProdutoCreate):
     db_produto = models.Produto(**produto.model_dump())
@@ -18,9 +21,79 @@ def create_produto(db: Session, produto: schemas.ProdutoCreate):
     db.refresh(db_produto)
     return db_produto
 
+# Busca de produtos (/produtos/busca)
+_trigramas_por_banco: dict[str, bool] = {}
+
+def _tem_trigramas(db: Session) -> bool:
+    # Os índices GIN da migração 0006 só existem se o servidor tiver pg_trgm
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+    chave = str(bind.url)
+    if chave not in _trigramas_por_banco:
+        _trigramas_por_banco[chave] = db.execute(
+            text("SELECT to_regclass('ix_produtos_descricao_trgm') IS NOT NULL")
+        ).scalar()
+    return _trigramas_por_banco[chave]
+
+def _padrao_like(termo: str) -> str:
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def buscar_produtos(db: Session, termo: str, limite: int = 20) -> list[dict]:
+    """
+    Produtos cujo SKU ou descrição casam com `termo` (prefixo ou semelhança),
+    do mais para o menos relevante (escala em busca_produtos.py). No
+    PostgreSQL com pg_trgm usa os índices da migração 0006; nos demais
+    casos, o índice de prefixos em memória.
+    """
+    if not _tem_trigramas(db):
+        return busca_produtos.indice.buscar(db, termo, limite)
+
+    termo = busca_produtos.normalizar(termo)
+    padrao = _padrao_like(termo)
+    colunas = [getattr(Produto, c) for c in busca_produtos.COLUNAS]
+    sku_prefixo = func.lower(Produto.sku).collate("C")  # mesma expressão de ix_produtos_sku_prefixo
+    sku = func.lower(Produto.sku)
+    descricao = func.lower(Produto.descricao)
+
+    # 1. Prefixo do SKU: intervalo do índice btree, já em ordem (o igual vem primeiro)
+    consulta = select(*colunas).where(sku_prefixo.like(padrao + "%")).order_by(sku_prefixo).limit(limite)
+    encontrados = [
+        {**dict(zip(busca_produtos.COLUNAS, linha)), "relevancia": 1.0 if linha.sku.lower() == termo else 0.9}
+        for linha in db.execute(consulta)
+    ]
+    if len(encontrados) == limite or len(termo) < busca_produtos.TAMANHO_MINIMO_SIMILARIDADE:
+        return encontrados
+
+    # 2. Trecho ou semelhança (índices GIN de trigramas), do mais para o menos
+    # relevante: o LIMIT vem depois da ordenação (top-N), para um termo comum
+    # não cortar os melhores candidatos
+    palavra = or_(descricao.like(padrao + "%"), descricao.like("% " + padrao + "%"))
+    semelhanca = func.greatest(func.similarity(sku, termo), func.word_similarity(termo, descricao))
+    relevancia = case((palavra, 0.8), else_=0.8 * semelhanca)
+    consulta = (
+        select(*colunas, relevancia.label("relevancia"))
+        .where(
+            or_(
+                sku.like("%" + padrao + "%"),
+                sku.op("%")(termo),
+                descricao.like("%" + padrao + "%"),
+                literal(termo).op("<%")(descricao)
+            ),
+            ~sku_prefixo.like(padrao + "%")  # já vieram todos na etapa 1
+        )
+        .order_by(relevancia.desc(), Produto.sku)
+        .limit(limite - len(encontrados))
+    )
+    encontrados += [
+        {**dict(zip(busca_produtos.COLUNAS, linha[:-1])), "relevancia": round(float(linha.relevancia), 4)}
+        for linha in db.execute(consulta)
+    ]
+    return encontrados
+
 # Locais
-def get_locais(db: Session):
-    return db.query(models.Local).all()
+def get_locais(db: Session, limit: int = LIMITE_PADRAO, cursor: str | None = None):
+    return paginar(db.query(models.Local), [models.Local.id], limit, cursor)
 
 def create_local(db: Session, local: schemas.LocalCreate):
     db_local = models.Local(**local.model_dump())
@@ -30,98 +103,434 @@ def create_local(db: Session, local: schemas.LocalCreate):
     return db_local
 
 # Estoque
-def get_estoque(db: Session):
-    return db.query(models.Estoque).all()
+def get_estoque(db: Session, limit: int = LIMITE_PADRAO, cursor: str | None = None):
+    # produto e local vêm no mesmo SELECT (evita 2 queries extras por linha na serialização)
+    query = db.query(models.Estoque).options(
+        joinedload(models.Estoque.produto),
+        joinedload(models.Estoque.local)
+    )
+    return paginar(query, [models.Estoque.id], limit, cursor)
+
+# Estoque sem ORM (caminho rápido de /estoque, ver respostas.py)
+def select_estoque_plano():
+    """Colunas de estoque, produto e local numa tupla por linha, na forma de schemas.Estoque."""
+    return (
+        select(
+            models.Estoque.id, models.Estoque.produto_id, models.Estoque.local_id, models.Estoque.quantidade,
+            models.Estoque.atualizado_em, models.Produto.sku, models.Produto.descricao, models.Produto.lote, models.Produto.validade,
+            models.Local.codigo, models.Local.armazem, models.Local.corredor, models.Local.rack_nivel,
+            models.Local.descricao
+        )
+        .join(models.Produto, models.Estoque.produto_id == models.Produto.id)
+        .join(models.Local, models.Estoque.local_id == models.Local.id)
+    )
 
-def create_estoque(db: Session, estoque: schemas.EstoqueCreate):
-    db_estoque = models.Estoque(**estoque.model_dump())
-    db.add(db_estoque)
-    db.commit()
-    db.refresh(db_estoque)
-    return db_estoque
+def estoque_plano(linhas) -> list[dict]:
+    return [
+        {
+            "produto_id": produto_id,
+            "local_id": local_id,
+            "quantidade": quantidade,
+            "id": id_,
+            "atualizado_em": atualizado_em,
+            "produto": {"sku": sku, "descricao": descricao, "lote": lote, "validade": validade, "id": produto_id},
+            "local": {
+                "codigo": codigo, "armazem": armazem, "corredor": corredor,
+                "rack_nivel": rack_nivel, "descricao": descricao_local, "id": local_id
+            },
+        }
+        for (id_, produto_id, local_id, quantidade, atualizado_em, sku, descricao, lote, validade,
+             codigo, armazem, corredor, rack_nivel, descricao_local) in linhas
+    ]
 
-def popular_estoque(db: Session, produtos_ids: list[int], locais_ids: list[int], quantidade_default: int = 10):
-    for produto_id in produtos_ids:
-        for local_id in locais_ids:
-            exists = db.query(models.Estoque).filter_by(
-                produto_id=produto_id, local_id=local_id
-            ).first()
-            if not exists:
-                db_estoque = models.Estoque(
-                    produto_id=produto_id,
-                    local_id=local_id,
-                    quantidade=quantidade_default
-                )
-                db.add(db_estoque)
+def get_estoque_plano(db: Session, limit: int = LIMITE_PADRAO, cursor: str | None = None):
+    stmt = preparar_pagina(select_estoque_plano(), [models.Estoque.id], limit, cursor)
+    linhas, proximo_cursor = fechar_pagina(db.execute(stmt).all(), [models.Estoque.id], limit)
+    return estoque_plano(linhas), proximo_cursor
+
+def get_estoque_por_local(db: Session, local_id: int):
+    return (
+        db.query(models.Estoque)
+        .options(joinedload(models.Estoque.produto), joinedload(models.Estoque.local))
+        .filter(models.Estoque.local_id == local_id)
+        .all()
+    )
+
+def get_estoque_por_produto(db: Session, produto_id: int):
+    return (
+        db.query(models.Estoque)
+        .options(joinedload(models.Estoque.local))
+        .filter(models.Estoque.produto_id == produto_id)
+        .all()
+    )
+
+# Limite de parâmetros por comando nas versões antigas do SQLite
+SQLITE_MAXIMO_VARIAVEIS = 999
+
+def popular_estoque(
+    db: Session,
+    quantidade_default: int = 10,
+    armazem: str | None = None,
+    prefixo_sku: str | None = None,
+    produtos_ids: list[int] | None = None,
+    locais_ids: list[int] | None = None
+):
+    """
+    Semeia o estoque com o produto cartesiano produtos x locais num único
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING, gerado no próprio banco.
+    Pares já existentes são mantidos. Filtros opcionais limitam a semeadura a
+    um armazém, a um prefixo de SKU ou a listas de ids. Cada saldo criado
+    ganha uma movimentação de ajuste (_stmts_ajustes), na mesma transação.
+    Retorna a quantidade de linhas criadas.
+    """
+    agora = datetime.utcnow()
+    origem = select(
+        models.Produto.id,
+        models.Local.id,
+        literal(quantidade_default),
+        literal(agora)
+    ).select_from(models.Produto).join(models.Local, true())
+
+    if armazem:
+        origem = origem.where(models.Local.armazem == armazem)
+    if prefixo_sku:
+        origem = origem.where(models.Produto.sku.startswith(prefixo_sku, autoescape=True))
+    if produtos_ids is not None:
+        origem = origem.where(models.Produto.id.in_(produtos_ids))
+    if locais_ids is not None:
+        origem = origem.where(models.Local.id.in_(locais_ids))
+    # WHERE explícito: o SQLite exige para não confundir ON CONFLICT com um JOIN
+    origem = origem.where(true())
+
+    stmt = _insert(db, models.Estoque).from_select(
+        ["produto_id", "local_id", "quantidade", "atualizado_em"], origem
+    ).on_conflict_do_nothing(index_elements=[models.Estoque.produto_id, models.Estoque.local_id])
+
+    if db.get_bind().dialect.name == "postgresql":
+        # Um só comando: os ajustes saem do RETURNING da própria inserção (CTEs de escrita)
+        criados = stmt.returning(
+            models.Estoque.produto_id, models.Estoque.local_id, models.Estoque.quantidade
+        ).cte("criados")
+        movimentacoes, resumo = _stmts_ajustes(db, criados, agora.date())
+        total = db.execute(
+            select(func.count()).select_from(criados)
+            .add_cte(movimentacoes.cte("ajustes"), resumo.cte("ajustes_resumo"))
+        ).scalar()
+    else:
+        # SQLite: os ajustes saem dos ids devolvidos pelo RETURNING, em blocos
+        # abaixo do limite de variáveis por comando
+        ids = db.execute(stmt.returning(models.Estoque.id)).scalars().all()
+        total = len(ids)
+        for inicio in range(0, total, SQLITE_MAXIMO_VARIAVEIS):
+            criados = select(models.Estoque.produto_id, models.Estoque.local_id, models.Estoque.quantidade).where(
+                models.Estoque.id.in_(ids[inicio:inicio + SQLITE_MAXIMO_VARIAVEIS])
+            ).subquery()
+            for ajuste in _stmts_ajustes(db, criados, agora.date()):
+                db.execute(ajuste)
     db.commit()
+    return total
 
 def create_estoque(db: Session, estoque: schemas.EstoqueCreate):
     if estoque.quantidade < 0:
-        raise ValueError("Quantidade não pode ser negativa")
-    db_estoque = models.Estoque(**estoque.model_dump())
+        raise HTTPException(status_code=400, detail="Quantidade não pode ser negativa")
+    produto = cache_catalogo.produtos.obter(db, "id", estoque.produto_id)
+    local = cache_catalogo.locais.obter(db, "id", estoque.local_id)
+    if not produto or not local:
+        raise HTTPException(status_code=404, detail="Produto ou local não encontrado")
+
+    agora = datetime.utcnow()
+    db_estoque = models.Estoque(**estoque.model_dump(), atualizado_em=agora)
     db.add(db_estoque)
+    try:
+        db.flush()
+    except IntegrityError:
+        # uq_estoque_produto_local: o saldo do par já existe (inclusive criado em paralelo)
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Já existe estoque deste produto neste local (use /movimentacoes)")
+    saldo = select(
+        literal(estoque.produto_id).label("produto_id"),
+        literal(estoque.local_id).label("local_id"),
+        literal(estoque.quantidade).label("quantidade")
+    ).subquery()
+    for ajuste in _stmts_ajustes(db, saldo, agora.date()):
+        db.execute(ajuste)
     db.commit()
     db.refresh(db_estoque)
     return db_estoque
 
+# Etiquetas em lote
+ETIQUETAS_LOTE_MAXIMO = 5000
+
+def get_locais_para_etiquetas(db: Session, ids=None, armazem=None, corredor=None):
+    query = db.query(models.Local)
+    if ids:
+        query = query.filter(models.Local.id.in_(ids))
+    if armazem:
+        query = query.filter(models.Local.armazem == armazem)
+    if corredor:
+        query = query.filter(models.Local.corredor == corredor)
+    return query.order_by(models.Local.codigo).limit(ETIQUETAS_LOTE_MAXIMO).all()
+
+def get_produtos_para_etiquetas(db: Session, ids=None, prefixo_sku=None):
+    query = db.query(models.Produto)
+    if ids:
+        query = query.filter(models.Produto.id.in_(ids))
+    if prefixo_sku:
+        query = query.filter(models.Produto.sku.startswith(prefixo_sku, autoescape=True))
+    return query.order_by(models.Produto.sku).limit(ETIQUETAS_LOTE_MAXIMO).all()
+
+# --- Escritas atômicas de estoque ---
+def _insert(db: Session, tabela):
+    """INSERT do dialeto em uso (PostgreSQL ou SQLite), com suporte a ON CONFLICT."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(tabela)
+
+def _stmt_somar_estoque(db: Session, produto_id: int, local_id: int, quantidade: int, agora: datetime):
+    # INSERT ... ON CONFLICT (produto_id, local_id) DO UPDATE SET quantidade = quantidade + :q
+    stmt = _insert(db, models.Estoque).values(
+        produto_id=produto_id,
+        local_id=local_id,
+        quantidade=quantidade,
+        atualizado_em=agora
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[models.Estoque.produto_id, models.Estoque.local_id],
+        set_={
+            "quantidade": models.Estoque.quantidade + stmt.excluded.quantidade,
+            "atualizado_em": stmt.excluded.atualizado_em,
+        }
+    )
+
+def _stmt_subtrair_estoque(produto_id: int, local_id: int, quantidade: int, agora: datetime):
+    # UPDATE ... SET quantidade = quantidade - :q WHERE quantidade >= :q RETURNING id
+    return (
+        update(models.Estoque)
+        .where(
+            models.Estoque.produto_id == produto_id,
+            models.Estoque.local_id == local_id,
+            models.Estoque.quantidade >= quantidade
+        )
+        .values(quantidade=models.Estoque.quantidade - quantidade, atualizado_em=agora)
+        .returning(models.Estoque.id)
+        .execution_options(synchronize_session=False)
+    )
+
+def _stmt_somar_resumo(db: Session, linhas: list[dict]):
+    # Upsert no resumo diário: soma quantidade e contagem nas chaves já existentes.
+    # Linhas: {produto_id, local_id, tipo, dia, quantidade_total, movimentacoes}
+    stmt = _insert(db, models.MovimentacaoResumoDiario).values(linhas)
+    return stmt.on_conflict_do_update(
+        index_elements=[
+            models.MovimentacaoResumoDiario.produto_id,
+            models.MovimentacaoResumoDiario.local_id,
+            models.MovimentacaoResumoDiario.tipo,
+            models.MovimentacaoResumoDiario.dia,
+        ],
+        set_={
+            "quantidade_total": models.MovimentacaoResumoDiario.quantidade_total + stmt.excluded.quantidade_total,
+            "movimentacoes": models.MovimentacaoResumoDiario.movimentacoes + stmt.excluded.movimentacoes,
+        }
+    )
+
+def _linha_resumo(movimentacao: schemas.MovimentacaoCreate, agora: datetime) -> dict:
+    return {
+        "produto_id": movimentacao.produto_id,
+        "local_id": movimentacao.local_id,
+        "tipo": movimentacao.tipo,
+        "dia": agora.date(),
+        "quantidade_total": movimentacao.quantidade,
+        "movimentacoes": 1,
+    }
+
+def _stmts_ajustes(db: Session, origem, dia: date):
+    """
+    Comandos que registram como movimentações do tipo "ajuste" (quantidade
+    com sinal) as escritas diretas no saldo, feitas fora de /movimentacoes,
+    e as somam no resumo diário. Sem elas, a reconstrução do estoque em
+    datas passadas (relatorio_estoque_em e os snapshots) enxergaria esse
+    saldo desde sempre. `origem`: select/CTE com produto_id, local_id e quantidade.
+    """
+    movimentacoes = insert(models.Movimentacao).from_select(
+        ["tipo", "quantidade", "produto_id", "local_id", "data_movimentacao"],
+        select(literal("ajuste"), origem.c.quantidade, origem.c.produto_id, origem.c.local_id, literal(dia, Date))
+        .where(origem.c.quantidade != 0)
+    )
+    # O WHERE também evita que o SQLite confunda o ON CONFLICT com um JOIN
+    resumo = _insert(db, models.MovimentacaoResumoDiario).from_select(
+        ["produto_id", "local_id", "tipo", "dia", "quantidade_total", "movimentacoes"],
+        select(origem.c.produto_id, origem.c.local_id, literal("ajuste"), literal(dia, Date), origem.c.quantidade, literal(1))
+        .where(origem.c.quantidade != 0)
+    )
+    resumo = resumo.on_conflict_do_update(
+        index_elements=[
+            models.MovimentacaoResumoDiario.produto_id,
+            models.MovimentacaoResumoDiario.local_id,
+            models.MovimentacaoResumoDiario.tipo,
+            models.MovimentacaoResumoDiario.dia,
+        ],
+        set_={
+            "quantidade_total": models.MovimentacaoResumoDiario.quantidade_total + resumo.excluded.quantidade_total,
+            "movimentacoes": models.MovimentacaoResumoDiario.movimentacoes + resumo.excluded.movimentacoes,
+        }
+    )
+    return movimentacoes, resumo
+
 # Movimentações
 def create_movimentacao(db: Session, movimentacao: schemas.MovimentacaoCreate):
-    # 1. Verifica se produto e local existem
-    produto = db.query(models.Produto).filter(models.Produto.id == movimentacao.produto_id).first()
-    local = db.query(models.Local).filter(models.Local.id == movimentacao.local_id).first()
+    # 1. Verifica se produto e local existem (cache de catálogo, sem ida ao banco)
+    produto = cache_catalogo.produtos.obter(db, "id", movimentacao.produto_id)
+    local = cache_catalogo.locais.obter(db, "id", movimentacao.local_id)
     if not produto or not local:
         raise HTTPException(status_code=404, detail="Produto ou local não encontrado")
 
-    # 2. Busca o registro de estoque correspondente
-    estoque = db.query(models.Estoque).filter(
-        models.Estoque.produto_id == movimentacao.produto_id,
-        models.Estoque.local_id == movimentacao.local_id
-    ).first()
-
-    # Se não existe, cria um novo (somente se for entrada)
-    if not estoque:
-        if movimentacao.tipo == "entrada":
-            estoque = models.Estoque(
-                produto_id=movimentacao.produto_id,
-                local_id=movimentacao.local_id,
-                quantidade=0
-            )
-            db.add(estoque)
-        else:
-            raise HTTPException(status_code=400, detail="Estoque não encontrado para saída")
+    if movimentacao.tipo not in ("entrada", "saida"):
+        raise HTTPException(status_code=400, detail="Tipo de movimentação inválido (use 'entrada' ou 'saida')")
 
-    # 3. Atualiza a quantidade
+    # 2. Cria o registro de movimentação (antes de tocar no saldo, para que o
+    #    bloqueio da linha de estoque dure só até o commit)
+    agora = datetime.utcnow()
+    # A coluna é Date: guarda só a data, para o objeto ser igual ao que o banco devolve
+    db_mov = models.Movimentacao(**movimentacao.model_dump(), data_movimentacao=agora.date())
+    db.add(db_mov)
+    db.flush()
+
+    # 3. Atualiza a quantidade com um único comando atômico no banco, sem ler
+    #    o saldo para o Python (evita perda de atualização concorrente)
     if movimentacao.tipo == "entrada":
-        estoque.quantidade += movimentacao.quantidade
-    elif movimentacao.tipo == "saida":
-        if estoque.quantidade < movimentacao.quantidade:
-            raise HTTPException(status_code=400, detail="Quantidade insuficiente em estoque")
-        estoque.quantidade -= movimentacao.quantidade
+        db.execute(_stmt_somar_estoque(db, movimentacao.produto_id, movimentacao.local_id, movimentacao.quantidade, agora))
     else:
-        raise HTTPException(status_code=400, detail="Tipo de movimentação inválido (use 'entrada' ou 'saida')")
+        atualizado = db.execute(
+            _stmt_subtrair_estoque(movimentacao.produto_id, movimentacao.local_id, movimentacao.quantidade, agora)
+        ).scalar()
+        if atualizado is None:
+            existe = db.query(models.Estoque.id).filter(
+                models.Estoque.produto_id == movimentacao.produto_id,
+                models.Estoque.local_id == movimentacao.local_id
+            ).first()
+            db.rollback()
+            if not existe:
+                raise HTTPException(status_code=400, detail="Estoque não encontrado para saída")
+            raise HTTPException(status_code=400, detail="Quantidade insuficiente em estoque")
+
+    # 4. Resumo diário, na mesma transação
+    db.execute(_stmt_somar_resumo(db, [_linha_resumo(movimentacao, agora)]))
 
-    # 4. Cria o registro de movimentação
-    db_mov = models.Movimentacao(**movimentacao.model_dump())
-    db.add(db_mov)
     db.commit()
     db.refresh(db_mov)
-    db.refresh(estoque)
 
     return db_mov
 
-def get_movimentacoes(db: Session):
-    return db.query(models.Movimentacao).order_by(models.Movimentacao.data_movimentacao.desc()).all()
+# Movimentações em lote
+LOTE_MAXIMO = 5000
+
+def create_movimentacoes_lote(db: Session, movimentacoes: list[schemas.MovimentacaoCreate]):
+    """
+    Registra várias movimentações numa única transação.
+
+    Produtos, locais e estoques são carregados com uma query cada (IN), as
+    quantidades são aplicadas em memória na ordem recebida e tudo é gravado
+    num único flush/commit. O custo em idas ao banco é fixo por lote, em vez
+    das ~7 por item de create_movimentacao. Itens inválidos não interrompem o
+    lote: retornam sucesso=False com o motivo.
+    """
+    if len(movimentacoes) > LOTE_MAXIMO:
+        raise HTTPException(status_code=400, detail=f"Lote excede o máximo de {LOTE_MAXIMO} movimentações")
+
+    # 1. Verificações de existência baseadas em conjuntos
+    produtos_ids = {m.produto_id for m in movimentacoes}
+    locais_ids = {m.local_id for m in movimentacoes}
+    pares = {(m.produto_id, m.local_id) for m in movimentacoes}
+
+    produtos_existentes = cache_catalogo.produtos.ids_existentes(db, produtos_ids)
+    locais_existentes = cache_catalogo.locais.ids_existentes(db, locais_ids)
+    # Cria (sem sobrescrever) as linhas de estoque que receberão entradas, para
+    # que lotes concorrentes disputem o mesmo registro em vez de duplicá-lo
+    pares_entrada = {
+        (m.produto_id, m.local_id) for m in movimentacoes
+        if m.tipo == "entrada" and m.produto_id in produtos_existentes and m.local_id in locais_existentes
+    }
+    if pares_entrada:
+        db.execute(
+            _insert(db, models.Estoque)
+            .values([{"produto_id": p, "local_id": l, "quantidade": 0} for p, l in sorted(pares_entrada)])
+            .on_conflict_do_nothing(index_elements=[models.Estoque.produto_id, models.Estoque.local_id])
+        )
 
-def get_movimentacoes_filtradas(
-    db: Session,
-    tipo: str | None = None,
-    produto_id: int | None = None,
-    local_id: int | None = None,
-    data_inicio: datetime | None = None,
-    data_fim: datetime | None = None
-):
-    query = db.query(models.Movimentacao)
+    estoques = {
+        (e.produto_id, e.local_id): e
+        for e in db.query(models.Estoque)
+        .filter(tuple_(models.Estoque.produto_id, models.Estoque.local_id).in_(pares))
+        .order_by(models.Estoque.produto_id, models.Estoque.local_id)  # ordem fixa de bloqueio
+        .with_for_update()
+    } if pares else {}
+
+    # 2. Aplica as quantidades por (produto_id, local_id), na ordem recebida
+    agora = datetime.utcnow()
+    resultados = []
+    registros = []
+    resumo = {}
+    for indice, movimentacao in enumerate(movimentacoes):
+        chave = (movimentacao.produto_id, movimentacao.local_id)
+        estoque = estoques.get(chave)
+        erro = None
+
+        if movimentacao.produto_id not in produtos_existentes or movimentacao.local_id not in locais_existentes:
+            erro = "Produto ou local não encontrado"
+        elif movimentacao.tipo == "entrada":
+            estoque.quantidade += movimentacao.quantidade
+        elif movimentacao.tipo == "saida":
+            if not estoque:
+                erro = "Estoque não encontrado para saída"
+            elif estoque.quantidade < movimentacao.quantidade:
+                erro = "Quantidade insuficiente em estoque"
+            else:
+                estoque.quantidade -= movimentacao.quantidade
+        else:
+            erro = "Tipo de movimentação inválido (use 'entrada' ou 'saida')"
+
+        if erro:
+            resultados.append({"indice": indice, "sucesso": False, "erro": erro})
+            continue
+
+        estoque.atualizado_em = agora
+        db_mov = models.Movimentacao(**movimentacao.model_dump(), data_movimentacao=agora.date())
+        registros.append(db_mov)
+        resultados.append({"indice": indice, "sucesso": True, "movimentacao": db_mov})
+
+        linha = _linha_resumo(movimentacao, agora)
+        chave_resumo = (linha["produto_id"], linha["local_id"], linha["tipo"], linha["dia"])
+        if chave_resumo in resumo:
+            resumo[chave_resumo]["quantidade_total"] += linha["quantidade_total"]
+            resumo[chave_resumo]["movimentacoes"] += 1
+        else:
+            resumo[chave_resumo] = linha
+
+    # 3. Grava tudo de uma vez (resumo em ordem de chave, como o estoque)
+    db.add_all(registros)
+    db.flush()
+    if resumo:
+        db.execute(_stmt_somar_resumo(db, [resumo[c] for c in sorted(resumo)]))
+    # Serializa antes do commit para não recarregar cada objeto expirado
+    for resultado in resultados:
+        if resultado["sucesso"]:
+            resultado["movimentacao"] = schemas.Movimentacao.model_validate(resultado["movimentacao"])
+    db.commit()
+
+    return resultados
+
+def get_movimentacoes(db: Session, limit: int = LIMITE_PADRAO, cursor: str | None = None):
+    # Mais recentes primeiro, usando o índice (data_movimentacao, id)
+    return paginar(
+        db.query(models.Movimentacao),
+        [models.Movimentacao.data_movimentacao, models.Movimentacao.id],
+        limit, cursor, desc=True
+    )
 
+def filtrar_movimentacoes(query, tipo=None, produto_id=None, local_id=None, data_inicio=None, data_fim=None):
+    # Serve tanto para Query (síncrono) quanto para select() (crud_async)
     if tipo:
         query = query.filter(models.Movimentacao.tipo == tipo)
     if produto_id:
@@ -132,43 +541,58 @@ def get_movimentacoes_filtradas(
         query = query.filter(models.Movimentacao.data_movimentacao >= data_inicio)
     if data_fim:
         query = query.filter(models.Movimentacao.data_movimentacao <= data_fim)
+    return query
 
-    return query.order_by(models.Movimentacao.data_movimentacao.desc()).all()
+def get_movimentacoes_filtradas(
+    db: Session,
+    tipo: str | None = None,
+    produto_id: int | None = None,
+    local_id: int | None = None,
+    data_inicio: datetime | None = None,
+    data_fim: datetime | None = None,
+    limit: int = LIMITE_PADRAO,
+    cursor: str | None = None
+):
+    query = filtrar_movimentacoes(db.query(models.Movimentacao), tipo, produto_id, local_id, data_inicio, data_fim)
+    return paginar(
+        query,
+        [models.Movimentacao.data_movimentacao, models.Movimentacao.id],
+        limit, cursor, desc=True
+    )
 
-# --- Relatório de estoque geral ---
-def relatorio_estoque_geral(db: Session):
-    resultados = (
+# --- Formatação das linhas de relatório ---
+def linha_relatorio(r):
+    """Converte uma linha (Row) de relatório em dicionário, formatando datas."""
+    linha = dict(r._mapping)
+    for chave, valor in linha.items():
+        if isinstance(valor, (datetime, date)):
+            linha[chave] = valor.strftime("%Y-%m-%d %H:%M:%S")
+    return linha
+
+
+def relatorio_resumo_movimentacoes(db: Session, data_inicio: date | None = None, data_fim: date | None = None):
+    """
+    Total por produto e tipo, lido do resumo diário (movimentacoes_resumo_diario):
+    o custo depende do número de combinações produto/local/tipo/dia, não do
+    histórico de movimentações. Datas opcionais limitam o período (inclusivas).
+    """
+    resumo = models.MovimentacaoResumoDiario
+    query = (
         db.query(
             models.Produto.descricao.label("produto"),
-            models.Local.codigo.label("local"),
-            models.Estoque.quantidade.label("quantidade")
+            resumo.tipo.label("tipo"),
+            cast(func.sum(resumo.quantidade_total), BigInteger).label("total")
         )
-        .join(models.Produto, models.Estoque.produto_id == models.Produto.id)
-        .join(models.Local, models.Estoque.local_id == models.Local.id)
-        .order_by(models.Produto.descricao, models.Local.codigo)
-        .all()
+        .join(models.Produto, resumo.produto_id == models.Produto.id)
     )
+    if data_inicio:
+        query = query.filter(resumo.dia >= data_inicio)
+    if data_fim:
+        query = query.filter(resumo.dia <= data_fim)
 
-    # Converter cada linha (Row) em dicionário
-    return [
-        {
-            "produto": r.produto,
-            "local": r.local,
-            "quantidade": r.quantidade
-        }
-        for r in resultados
-    ]
-
-
-def relatorio_resumo_movimentacoes(db: Session):
     resultados = (
-        db.query(
-            models.Produto.descricao.label("produto"),
-            models.Movimentacao.tipo.label("tipo"),
-            func.sum(models.Movimentacao.quantidade).label("total")
-        )
-        .join(models.Produto, models.Movimentacao.produto_id == models.Produto.id)
-        .group_by(models.Produto.descricao, models.Movimentacao.tipo)
+        query
+        .group_by(models.Produto.descricao, resumo.tipo)
         .order_by(models.Produto.descricao)
         .all()
     )
@@ -178,47 +602,218 @@ def relatorio_resumo_movimentacoes(db: Session):
         for r in resultados
     ]
 
+def _inicio_historico(db: Session) -> date | None:
+    """
+    Primeiro dia ainda presente em `movimentacoes`: o início da partição
+    mensal mais antiga anexada (PostgreSQL) ou a data mais antiga. Os dias
+    anteriores foram arquivados (particoes.py) e só existem no resumo.
+    """
+    inicios = [db.query(func.min(models.Movimentacao.data_movimentacao)).scalar()]
+    conn = db.connection()
+    if particoes.particionada(conn):
+        inicios.append(particoes.inicio_particoes(conn))
+    inicios = [d for d in inicios if d is not None]
+    return min(inicios) if inicios else None
+
+def recalcular_resumo_movimentacoes(db: Session, data_inicio: date | None = None, data_fim: date | None = None) -> int:
+    """
+    Reconstrói o resumo diário a partir de `movimentacoes` (todo o histórico,
+    ou só os dias do período). Retorna quantas linhas de resumo foram gravadas.
+
+    O período nunca começa antes do histórico ainda presente
+    (_inicio_historico): os totais dos meses arquivados ficam no resumo, que
+    é a única cópia deles.
+    """
+    resumo = models.MovimentacaoResumoDiario
+    if db.get_bind().dialect.name == "postgresql":
+        # Movimentações concorrentes esperam o fim do recálculo para somar no resumo
+        db.execute(text("LOCK TABLE movimentacoes_resumo_diario IN EXCLUSIVE MODE"))
+    inicio_historico = _inicio_historico(db)
+    if inicio_historico is None:
+        db.commit()
+        return 0  # nada em movimentacoes: o resumo (arquivado ou vazio) fica como está
+    data_inicio = max(data_inicio, inicio_historico) if data_inicio else inicio_historico
+
+    apagar = delete(resumo)
+    origem = select(
+        models.Movimentacao.produto_id,
+        models.Movimentacao.local_id,
+        models.Movimentacao.tipo,
+        models.Movimentacao.data_movimentacao,
+        func.sum(models.Movimentacao.quantidade),
+        func.count()
+    ).where(models.Movimentacao.produto_id.is_not(None), models.Movimentacao.local_id.is_not(None))
+    if data_inicio:
+        apagar = apagar.where(resumo.dia >= data_inicio)
+        origem = origem.where(models.Movimentacao.data_movimentacao >= data_inicio)
+    if data_fim:
+        apagar = apagar.where(resumo.dia <= data_fim)
+        origem = origem.where(models.Movimentacao.data_movimentacao <= data_fim)
+    origem = origem.group_by(
+        models.Movimentacao.produto_id,
+        models.Movimentacao.local_id,
+        models.Movimentacao.tipo,
+        models.Movimentacao.data_movimentacao
+    )
 
-# Estoque por produto
-def relatorio_estoque_por_produto(db: Session, produto_id: int):
-    resultados = (
+    db.execute(apagar)
+    gravadas = db.execute(
+        insert(resumo).from_select(
+            ["produto_id", "local_id", "tipo", "dia", "quantidade_total", "movimentacoes"], origem
+        )
+    ).rowcount
+    db.commit()
+    return gravadas
+
+
+# --- Estoque em uma data (snapshots) ---
+def _saldo_resumo():
+    # Saídas subtraem; entradas e ajustes (já com sinal) somam
+    resumo = models.MovimentacaoResumoDiario
+    return case((resumo.tipo == "saida", -resumo.quantidade_total), else_=resumo.quantidade_total)
+
+def _saldo_entre(inicio: date | None, fim: date | None, sinal: int, produto_id=None, local_id=None):
+    """Saldo líquido por produto/local dos dias em (inicio, fim], lido do resumo diário."""
+    resumo = models.MovimentacaoResumoDiario
+    stmt = select(
+        resumo.produto_id.label("produto_id"),
+        resumo.local_id.label("local_id"),
+        (sinal * func.sum(_saldo_resumo())).label("quantidade")
+    )
+    if inicio is not None:
+        stmt = stmt.where(resumo.dia > inicio)
+    if fim is not None:
+        stmt = stmt.where(resumo.dia <= fim)
+    if produto_id:
+        stmt = stmt.where(resumo.produto_id == produto_id)
+    if local_id:
+        stmt = stmt.where(resumo.local_id == local_id)
+    return stmt.group_by(resumo.produto_id, resumo.local_id)
+
+def criar_snapshot_estoque(db: Session, dia: date) -> int:
+    """
+    Grava o saldo de cada produto/local ao fim de `dia` (que precisa já ter
+    terminado): estoque atual menos as movimentações dos dias seguintes, num
+    único comando. Refazer o mesmo dia substitui o snapshot. Retorna as linhas gravadas.
+    """
+    if dia >= datetime.utcnow().date():
+        raise ValueError("O snapshot só pode ser de um dia já encerrado")
+
+    posteriores = _saldo_entre(dia, None, 1).subquery()
+    origem = (
+        select(
+            literal(dia, Date),
+            models.Estoque.produto_id,
+            models.Estoque.local_id,
+            func.coalesce(models.Estoque.quantidade, 0) - func.coalesce(posteriores.c.quantidade, 0)
+        )
+        .outerjoin(posteriores, and_(
+            posteriores.c.produto_id == models.Estoque.produto_id,
+            posteriores.c.local_id == models.Estoque.local_id
+        ))
+        .where(models.Estoque.produto_id.is_not(None), models.Estoque.local_id.is_not(None))
+    )
+
+    db.execute(delete(models.EstoqueSnapshot).where(models.EstoqueSnapshot.dia == dia))
+    gravadas = db.execute(
+        insert(models.EstoqueSnapshot).from_select(["dia", "produto_id", "local_id", "quantidade"], origem)
+    ).rowcount
+    db.commit()
+    return gravadas
+
+def _base_estoque_em(db: Session, dia: date):
+    """
+    Escolhe o ponto de partida mais próximo de `dia`: o último snapshot até
+    ele (avançando), o primeiro depois dele ou o estoque atual (recuando).
+    Retorna (dia_base, avancar); dia_base None indica o estoque atual.
+    """
+    hoje = datetime.utcnow().date()
+    anterior = db.query(func.max(models.EstoqueSnapshot.dia)).filter(models.EstoqueSnapshot.dia <= dia).scalar()
+    posterior = db.query(func.min(models.EstoqueSnapshot.dia)).filter(models.EstoqueSnapshot.dia > dia).scalar()
+
+    distancia_posterior = ((posterior or hoje) - dia).days
+    if anterior is not None and (dia - anterior).days <= distancia_posterior:
+        return anterior, True
+    return posterior, False
+
+def relatorio_estoque_em(db: Session, dia: date, produto_id: int | None = None, local_id: int | None = None):
+    """
+    Saldo por produto/local ao fim de `dia`. Parte do snapshot mais próximo e
+    aplica só as movimentações (resumo diário) entre o snapshot e a data, então
+    o custo é limitado pelo intervalo entre snapshots, não pelo histórico.
+    """
+    if dia >= datetime.utcnow().date():
+        base, avancar = None, False
+        dia = datetime.utcnow().date()
+    else:
+        base, avancar = _base_estoque_em(db, dia)
+
+    if base is None:
+        saldo_base = select(
+            models.Estoque.produto_id.label("produto_id"),
+            models.Estoque.local_id.label("local_id"),
+            func.coalesce(models.Estoque.quantidade, 0).label("quantidade")
+        )
+        filtro_produto, filtro_local = models.Estoque.produto_id, models.Estoque.local_id
+    else:
+        snapshot = models.EstoqueSnapshot
+        saldo_base = select(
+            snapshot.produto_id.label("produto_id"),
+            snapshot.local_id.label("local_id"),
+            snapshot.quantidade.label("quantidade")
+        ).where(snapshot.dia == base)
+        filtro_produto, filtro_local = snapshot.produto_id, snapshot.local_id
+    if produto_id:
+        saldo_base = saldo_base.where(filtro_produto == produto_id)
+    if local_id:
+        saldo_base = saldo_base.where(filtro_local == local_id)
+
+    # Avançando: soma os dias (base, dia]. Recuando: desfaz os dias (dia, base]
+    if avancar:
+        ajuste = _saldo_entre(base, dia, 1, produto_id, local_id)
+    else:
+        ajuste = _saldo_entre(dia, base, -1, produto_id, local_id)
+
+    partes = union_all(saldo_base, ajuste).subquery()
+    quantidade = cast(func.sum(partes.c.quantidade), BigInteger)
+    query = (
         db.query(
+            partes.c.produto_id,
             models.Produto.descricao.label("produto"),
+            partes.c.local_id,
             models.Local.codigo.label("local"),
-            models.Estoque.quantidade.label("quantidade")
+            quantidade.label("quantidade")
         )
-        .join(models.Produto, models.Estoque.produto_id == models.Produto.id)
-        .join(models.Local, models.Estoque.local_id == models.Local.id)
-        .filter(models.Produto.id == produto_id)
-        .all()
+        .join(models.Produto, partes.c.produto_id == models.Produto.id)
+        .join(models.Local, partes.c.local_id == models.Local.id)
+        .group_by(partes.c.produto_id, models.Produto.descricao, partes.c.local_id, models.Local.codigo)
+        .having(func.sum(partes.c.quantidade) != 0)
+        .order_by(models.Local.codigo, models.Produto.descricao)
     )
+    return [linha_relatorio(r) for r in query]
 
-    return [
-        {"produto": r.produto, "local": r.local, "quantidade": r.quantidade}
-        for r in resultados
-    ]
 
 # Movimentações por data
-def relatorio_movimentacoes_por_periodo(db: Session, data_inicio, data_fim):
-    # Converte para datetime se vier como string
+def _intervalo_periodo(data_inicio, data_fim):
+    # Converte para date se vier como string
     if isinstance(data_inicio, str):
-        data_inicio = datetime.strptime(data_inicio, "%Y-%m-%d")
-    else:
-        data_inicio = datetime.combine(data_inicio, datetime.min.time())
+        data_inicio = datetime.strptime(data_inicio, "%Y-%m-%d").date()
+    elif isinstance(data_inicio, datetime):
+        data_inicio = data_inicio.date()
 
     if isinstance(data_fim, str):
-        data_fim = datetime.strptime(data_fim, "%Y-%m-%d")
-    else:
-        data_fim = datetime.combine(data_fim, datetime.min.time())
-
-    # Inclui todo o último dia
-    data_fim = data_fim + timedelta(days=1) - timedelta(microseconds=1)
-
-    # Debug
-    print("Data início:", data_inicio, type(data_inicio))
-    print("Data fim:", data_fim, type(data_fim))
-
-    query = (
+        data_fim = datetime.strptime(data_fim, "%Y-%m-%d").date()
+    elif isinstance(data_fim, datetime):
+        data_fim = data_fim.date()
+
+    # Intervalo semiaberto [inicio, dia seguinte ao fim): inclui todo o último
+    # dia e compara date com date, o que permite ao PostgreSQL podar as
+    # partições mensais fora do período
+    return data_inicio, data_fim + timedelta(days=1)
+
+def query_relatorio_movimentacoes_por_periodo(db: Session, data_inicio, data_fim):
+    data_inicio, data_fim = _intervalo_periodo(data_inicio, data_fim)
+    return (
         db.query(
             Movimentacao.id,
             Movimentacao.tipo,
@@ -229,28 +824,17 @@ def relatorio_movimentacoes_por_periodo(db: Session, data_inicio, data_fim):
         )
         .join(Produto, Movimentacao.produto_id == Produto.id)
         .join(Local, Movimentacao.local_id == Local.id)
-        .filter(Movimentacao.data_movimentacao.between(data_inicio, data_fim))
+        .filter(Movimentacao.data_movimentacao >= data_inicio, Movimentacao.data_movimentacao < data_fim)
         .order_by(Movimentacao.data_movimentacao)
     )
 
-    resultados = query.all()
-
-    # Converter para lista de dicionários
-    return [
-        {
-            "id": r.id,
-            "tipo": r.tipo,
-            "produto": r.produto,
-            "quantidade": r.quantidade,
-            "local": r.local,
-            "data": r.data.strftime("%Y-%m-%d %H:%M:%S")
-        }
-        for r in resultados
-    ]
+def relatorio_movimentacoes_por_periodo(db: Session, data_inicio, data_fim):
+    query = query_relatorio_movimentacoes_por_periodo(db, data_inicio, data_fim)
+    return [linha_relatorio(r) for r in query]
 
 # --- Relatório de estoque geral ---
-def relatorio_estoque_geral(db: Session):
-    resultados = (
+def query_relatorio_estoque_geral(db: Session):
+    return (
         db.query(
             models.Produto.descricao.label("produto"),
             models.Local.codigo.label("local"),
@@ -259,17 +843,10 @@ def relatorio_estoque_geral(db: Session):
         .join(models.Produto, models.Estoque.produto_id == models.Produto.id)
         .join(models.Local, models.Estoque.local_id == models.Local.id)
         .order_by(models.Produto.descricao, models.Local.codigo)
-        .all()
     )
 
-    return [
-        {
-            "produto": r.produto,
-            "local": r.local,
-            "quantidade": r.quantidade
-        }
-        for r in resultados
-    ]
+def relatorio_estoque_geral(db: Session):
+    return [linha_relatorio(r) for r in query_relatorio_estoque_geral(db)]
 
 # --- Relatório de estoque por produto ---
 def relatorio_estoque_por_produto(db: Session, produto_id: int):
@@ -295,8 +872,8 @@ def relatorio_estoque_por_produto(db: Session, produto_id: int):
         for r in resultados
     ]
 
-def relatorio_inventario_por_local(db: Session):
-    resultados = (
+def query_relatorio_inventario_por_local(db: Session):
+    return (
         db.query(
             models.Local.codigo.label("local"),
             models.Produto.descricao.label("produto"),
@@ -305,17 +882,94 @@ def relatorio_inventario_por_local(db: Session):
         .join(models.Produto, models.Estoque.produto_id == models.Produto.id)
         .join(models.Local, models.Estoque.local_id == models.Local.id)
         .order_by(models.Local.codigo, models.Produto.descricao)
-        .all()
     )
 
-    return [
-        {"local": r.local, "produto": r.produto, "quantidade": r.quantidade}
-        for r in resultados
-    ]
+def relatorio_inventario_por_local(db: Session):
+    return [linha_relatorio(r) for r in query_relatorio_inventario_por_local(db)]
+
+# --- Inventário por hierarquia (armazém > corredor > rack/nível) ---
+NIVEIS_HIERARQUIA = ("armazem", "corredor", "rack_nivel")
+
+def relatorio_inventario_hierarquia(
+    db: Session,
+    armazem: str | None = None,
+    corredor: str | None = None,
+    rack_nivel: str | None = None,
+    nivel: str | None = None
+):
+    """
+    Totais de estoque por armazém, corredor e rack/nível, agregados no banco
+    (ROLLUP no PostgreSQL, UNION ALL de GROUP BY nos demais): uma linha por
+    subtotal, com `nivel` indicando qual ("total" para o total geral).
+
+    Os filtros descem na hierarquia: com `armazem`, os totais são do armazém
+    e dos seus corredores; com `corredor` também, dos racks/níveis dele.
+    `nivel` é o nível mais detalhado retornado (padrão: o logo abaixo do
+    filtro mais profundo, e no mínimo "corredor"). Só entram saldos positivos.
+    """
+    filtros = {"armazem": armazem, "corredor": corredor, "rack_nivel": rack_nivel}
+    profundidade_filtro = max((i + 1 for i, n in enumerate(NIVEIS_HIERARQUIA) if filtros[n]), default=0)
+    if nivel is None:
+        profundidade = min(max(profundidade_filtro + 1, 2), len(NIVEIS_HIERARQUIA))
+    else:
+        profundidade = NIVEIS_HIERARQUIA.index(nivel) + 1
+        if profundidade < profundidade_filtro:
+            raise HTTPException(status_code=400, detail="nivel deve ser igual ou abaixo do filtro mais detalhado")
+
+    colunas = [getattr(models.Local, n) for n in NIVEIS_HIERARQUIA[:profundidade]]
+    # Níveis filtrados ficam fixos no agrupamento; só os de baixo ganham subtotais
+    fixas, rollup = colunas[:profundidade_filtro], colunas[profundidade_filtro:]
+
+    def agregado(agrupadas, agrupamento):
+        query = (
+            select(
+                *[c if c.key in agrupadas else literal(None, c.type).label(c.key) for c in colunas],
+                agrupamento.label("agrupamento"),
+                func.count(func.distinct(models.Estoque.local_id)).label("locais"),
+                func.count(func.distinct(models.Estoque.produto_id)).label("produtos"),
+                cast(func.sum(models.Estoque.quantidade), BigInteger).label("quantidade")
+            )
+            .join(models.Local, models.Estoque.local_id == models.Local.id)
+            .where(models.Estoque.quantidade > 0)
+        )
+        for nome, valor in filtros.items():
+            if valor:
+                query = query.where(getattr(models.Local, nome) == valor)
+        return query
+
+    if db.get_bind().dialect.name == "postgresql":
+        # GROUPING(...) marca com 1 cada coluna que virou subtotal (bit mais alto = armazém)
+        query = agregado(NIVEIS_HIERARQUIA, func.grouping(*colunas)).group_by(*fixas, func.rollup(*rollup))
+    else:
+        # Sem ROLLUP: um GROUP BY por conjunto de agrupamento
+        conjuntos = [colunas[:k] for k in range(len(colunas), profundidade_filtro - 1, -1)]
+        query = union_all(*[
+            agregado({c.key for c in conjunto}, literal((1 << (len(colunas) - len(conjunto))) - 1)).group_by(*conjunto)
+            for conjunto in conjuntos
+        ])
+
+    linhas = []
+    for r in db.execute(query):
+        agrupadas = len(colunas) - bin(r.agrupamento).count("1")
+        linha = {c.key: getattr(r, c.key) for c in colunas}
+        linha.update(
+            nivel=NIVEIS_HIERARQUIA[agrupadas - 1] if agrupadas else "total",
+            locais=r.locais, produtos=r.produtos, quantidade=r.quantidade or 0
+        )
+        linhas.append((agrupadas, linha))
+
+    # Cada subtotal logo depois dos seus detalhes; o total geral por último
+    def chave(item):
+        agrupadas, linha = item
+        return [
+            (i >= agrupadas, linha[c.key] is None, linha[c.key] or "")
+            for i, c in enumerate(colunas)
+        ]
+    return [linha for _, linha in sorted(linhas, key=chave)]
 
 # --- Relatórios de movimentações específicas
-def relatorio_operacoes(db: Session):
-    resultados = (
+def query_relatorio_operacoes(db: Session):
+    return (
         db.query(
             models.Movimentacao.tipo.label("operacao"),
             models.Produto.descricao.label("produto"),
@@ -323,17 +977,10 @@ def relatorio_operacoes(db: Session):
             models.Movimentacao.quantidade.label("quantidade"),
             models.Movimentacao.data_movimentacao.label("data")
         )
+        .join(models.Produto, models.Movimentacao.produto_id == models.Produto.id)
+        .join(models.Local, models.Movimentacao.local_id == models.Local.id)
         .order_by(models.Movimentacao.data_movimentacao)
-        .all()
     )
 
-    return [
-        {
-            "operacao": r.operacao,
-            "produto": r.produto,
-            "local": r.local,
-            "quantidade": r.quantidade,
-            "data": r.data.strftime("%Y-%m-%d %H:%M:%S")
-        }
-        for r in resultados
-    ]
+def relatorio_operacoes(db: Session):
+    return [linha_relatorio(r) for r in query_relatorio_operacoes(db)]
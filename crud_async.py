@@ -0,0 +1,73 @@
+# crud_async.py
+# Versões assíncronas (AsyncSession) das funções de crud.py usadas nos
+# endpoints de maior tráfego: consultas de estoque e movimentações.
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+import crud, models, schemas
+from paginacao import preparar_pagina, fechar_pagina, LIMITE_PADRAO
+
+
+# Estoque
+async def get_estoque(db: AsyncSession, limit: int = LIMITE_PADRAO, cursor: str | None = None):
+    stmt = select(models.Estoque).options(
+        joinedload(models.Estoque.produto),
+        joinedload(models.Estoque.local)
+    )
+    stmt = preparar_pagina(stmt, [models.Estoque.id], limit, cursor)
+    itens = (await db.execute(stmt)).scalars().all()
+    return fechar_pagina(itens, [models.Estoque.id], limit)
+
+async def get_estoque_plano(db: AsyncSession, limit: int = LIMITE_PADRAO, cursor: str | None = None):
+    # Caminho rápido: tuplas direto para dicts, sem objetos do ORM
+    stmt = preparar_pagina(crud.select_estoque_plano(), [models.Estoque.id], limit, cursor)
+    linhas, proximo_cursor = fechar_pagina((await db.execute(stmt)).all(), [models.Estoque.id], limit)
+    return crud.estoque_plano(linhas), proximo_cursor
+
+async def get_estoque_por_local(db: AsyncSession, local_id: int):
+    stmt = (
+        select(models.Estoque)
+        .options(joinedload(models.Estoque.produto), joinedload(models.Estoque.local))
+        .filter(models.Estoque.local_id == local_id)
+    )
+    return (await db.execute(stmt)).scalars().all()
+
+async def get_estoque_por_produto(db: AsyncSession, produto_id: int):
+    stmt = (
+        select(models.Estoque)
+        .options(joinedload(models.Estoque.local))
+        .filter(models.Estoque.produto_id == produto_id)
+    )
+    return (await db.execute(stmt)).scalars().all()
+
+
+# Movimentações
+# As escritas (movimentação, saldo e resumo diário) rodam sobre a conexão
+# assíncrona pelas funções de crud.py, sem uma segunda cópia da lógica
+async def create_movimentacao(db: AsyncSession, movimentacao: schemas.MovimentacaoCreate):
+    return await db.run_sync(crud.create_movimentacao, movimentacao)
+
+async def create_movimentacoes_lote(db: AsyncSession, movimentacoes: list[schemas.MovimentacaoCreate]):
+    return await db.run_sync(crud.create_movimentacoes_lote, movimentacoes)
+
+async def get_movimentacoes(db: AsyncSession, limit: int = LIMITE_PADRAO, cursor: str | None = None):
+    return await get_movimentacoes_filtradas(db, limit=limit, cursor=cursor)
+
+async def get_movimentacoes_filtradas(
+    db: AsyncSession,
+    tipo: str | None = None,
+    produto_id: int | None = None,
+    local_id: int | None = None,
+    data_inicio: datetime | None = None,
+    data_fim: datetime | None = None,
+    limit: int = LIMITE_PADRAO,
+    cursor: str | None = None
+):
+    colunas = [models.Movimentacao.data_movimentacao, models.Movimentacao.id]
+    stmt = crud.filtrar_movimentacoes(select(models.Movimentacao), tipo, produto_id, local_id, data_inicio, data_fim)
+    stmt = preparar_pagina(stmt, colunas, limit, cursor, desc=True)
+    itens = (await db.execute(stmt)).scalars().all()
+    return fechar_pagina(itens, colunas, limit)
@@ -1,9 +1,15 @@
 # database.py
+import logging
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
+import metricas
+
 # Carrega variáveis do arquivo .env
 load_dotenv()
 
@@ -13,15 +19,19 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME", "wms")
 
-# URL de conexão com PostgreSQL
-SQLALCHEMY_DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# Log de cada comando SQL no terminal: só para debug, custa throughput
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "sim")
+
+# URL de conexão com PostgreSQL (DATABASE_URL, se definida, tem precedência)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # Criação do engine e sessão
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    echo=True,  # Mostra os logs SQL no terminal (útil para debug)
+    echo=DB_ECHO,  # Mostra os logs SQL no terminal (DB_ECHO=true no .env)
     future=True # Compatibilidade com SQLAlchemy 2.0
 )
+metricas.instrumentar_engine(engine, "principal")
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
@@ -32,4 +42,115 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --- Réplica de leitura ---
+# Relatórios, listas do catálogo e etiquetas leem da réplica (get_db_leitura);
+# escritas e movimentações ficam no primário. Sem REPLICA_DATABASE_URL, tudo
+# vai para o primário. A réplica é usada enquanto responde e o atraso dela
+# não passa de REPLICA_ATRASO_MAXIMO; a verificação é refeita a cada
+# REPLICA_VERIFICACAO_INTERVALO segundos, não a cada requisição.
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+REPLICA_ATRASO_MAXIMO = float(os.getenv("REPLICA_ATRASO_MAXIMO", "5"))
+REPLICA_VERIFICACAO_INTERVALO = float(os.getenv("REPLICA_VERIFICACAO_INTERVALO", "2"))
+REPLICA_TIMEOUT_CONEXAO = int(os.getenv("REPLICA_TIMEOUT_CONEXAO", "2"))
+
+logger = logging.getLogger("wms.database")
+
+# Atraso em segundos de uma réplica PostgreSQL (streaming); 0 se for um primário
+# ou se já reproduziu tudo o que recebeu (primário sem escritas recentes)
+SQL_ATRASO_REPLICA = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+engine_replica = None
+if REPLICA_DATABASE_URL:
+    engine_replica = create_engine(
+        REPLICA_DATABASE_URL,
+        echo=DB_ECHO,
+        pool_pre_ping=True,
+        connect_args={"connect_timeout": REPLICA_TIMEOUT_CONEXAO} if REPLICA_DATABASE_URL.startswith("postgresql") else {}
+    )
+    metricas.instrumentar_engine(engine_replica, "replica")
+
+_replica_lock = threading.Lock()
+_replica_estado = {"verificada_em": float("-inf"), "motivo": None}  # motivo None = utilizável
+
+def _atraso_replica(conn) -> float | None:
+    if conn.dialect.name != "postgresql":
+        return 0.0  # sem replicação a medir (ex.: dois arquivos SQLite em testes)
+    atraso = conn.execute(SQL_ATRASO_REPLICA).scalar()
+    return None if atraso is None else float(atraso)
+
+def _verificar_replica() -> str | None:
+    """Retorna None se a réplica pode ser usada, ou o motivo para não usar."""
+    try:
+        with engine_replica.connect() as conn:
+            atraso = _atraso_replica(conn)
+    except SQLAlchemyError as exc:
+        metricas.marcar_atraso_replica(None)
+        logger.warning("Réplica de leitura indisponível, usando o primário: %s", exc)
+        return "indisponivel"
+    metricas.marcar_atraso_replica(atraso)
+    if atraso is None or atraso > REPLICA_ATRASO_MAXIMO:
+        logger.warning("Réplica de leitura atrasada (%s s), usando o primário", atraso)
+        return "atrasada"
+    return None
+
+def engine_leitura():
+    """Engine para leituras que toleram REPLICA_ATRASO_MAXIMO segundos de atraso."""
+    if engine_replica is None:
+        return engine
+    if time.monotonic() - _replica_estado["verificada_em"] >= REPLICA_VERIFICACAO_INTERVALO:
+        with _replica_lock:
+            # Só uma thread verifica; as outras usam o resultado dela
+            if time.monotonic() - _replica_estado["verificada_em"] >= REPLICA_VERIFICACAO_INTERVALO:
+                _replica_estado["motivo"] = _verificar_replica()
+                _replica_estado["verificada_em"] = time.monotonic()
+    if _replica_estado["motivo"] is not None:
+        metricas.REPLICA_DESVIOS.inc(motivo=_replica_estado["motivo"])
+        return engine
+    return engine_replica
+
+def SessionLeitura():
+    return SessionLocal(bind=engine_leitura())
+
+def get_db_leitura():
+    db = SessionLeitura()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# --- Caminho assíncrono (asyncpg) ---
+def _url_assincrona(url: str) -> str:
+    # Mesmo banco do engine síncrono, trocando apenas o driver
+    for sincrono, assincrono in (("postgresql+psycopg2://", "postgresql+asyncpg://"),
+                                 ("postgresql://", "postgresql+asyncpg://"),
+                                 ("sqlite://", "sqlite+aiosqlite://")):
+        if url.startswith(sincrono):
+            return assincrono + url[len(sincrono):]
+    return url
+
+SQLALCHEMY_ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _url_assincrona(SQLALCHEMY_DATABASE_URL)
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    # Criado sob demanda: scripts e comandos síncronos não precisam do asyncpg instalado
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        _async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL, echo=engine.echo)
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+        metricas.instrumentar_engine(_async_engine.sync_engine, "async")
+    return _async_engine
+
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
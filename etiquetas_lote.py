@@ -0,0 +1,141 @@
+# etiquetas_lote.py
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from io import BytesIO
+from types import SimpleNamespace
+
+from fastapi.responses import StreamingResponse
+
+from cache_etiquetas import cache, chave_etiqueta
+from metricas import ETIQUETA_SEGUNDOS
+
+# Processos de renderização (padrão: um por CPU)
+ETIQUETAS_PROCESSOS = int(os.getenv("ETIQUETAS_PROCESSOS", "0")) or os.cpu_count() or 1
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _obter_executor() -> ProcessPoolExecutor:
+    # Criado sob demanda: workers que nunca imprimem etiquetas em lote não sobem processos
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=ETIQUETAS_PROCESSOS)
+        return _executor
+
+
+# --- Itens de lote ---
+# Nome no ZIP: o id o torna único (códigos como "A/1" e "A_1" dariam o mesmo nome)
+def _nome_arquivo(prefixo: str, id_, codigo) -> str:
+    return f"{prefixo}_{id_}_{codigo}.png".replace("/", "_").replace("\\", "_")
+
+def item_local(local) -> dict:
+    rack_nivel = getattr(local, "rack_nivel", "") or ""
+    return {
+        "nome": _nome_arquivo("local", local.id, local.codigo),
+        "chave": chave_etiqueta("rack", local.codigo, local.descricao, rack_nivel, local.id),
+        "tipo": "rack",
+        "dados": (local.codigo, local.descricao, rack_nivel, local.id),
+    }
+
+def item_produto(produto) -> dict:
+    return {
+        "nome": _nome_arquivo("produto", produto.id, produto.sku),
+        "chave": chave_etiqueta("produto", produto.id, produto.sku, produto.descricao, produto.lote, produto.validade),
+        "tipo": "produto",
+        "dados": (produto.id, produto.sku, produto.descricao, produto.lote, produto.validade),
+    }
+
+def _renderizar(tipo: str, dados: tuple) -> tuple[bytes, float]:
+    # Executa no processo filho: recebe só tipos simples (serializáveis). A
+    # duração volta junto com o PNG, pois as métricas do filho não são expostas.
+    # qrcode e PIL só são importados aqui e em _gerar_pdf: a API sobe sem eles
+    from qrcode_utils import renderizar_etiqueta_produto, renderizar_etiqueta_rack
+
+    inicio = time.perf_counter()
+    if tipo == "rack":
+        png = renderizar_etiqueta_rack(*dados)
+    else:
+        id_, sku, descricao, lote, validade = dados
+        png = renderizar_etiqueta_produto(
+            SimpleNamespace(id=id_, sku=sku, descricao=descricao, lote=lote, validade=validade)
+        )
+    return png, time.perf_counter() - inicio
+
+
+def renderizar_lote(itens: list[dict], usar_cache: bool = True):
+    """
+    Gera (nome, png) de cada item, na ordem recebida, assim que cada um fica
+    pronto. Os que não estão no cache são distribuídos no pool de processos
+    de uma vez, e a renderização segue em paralelo enquanto os primeiros são
+    enviados.
+    """
+    executor = None
+    fila = []
+    for item in itens:
+        png = cache.consultar(item["chave"]) if usar_cache else None
+        if png is None:
+            executor = executor or _obter_executor()
+            png = executor.submit(_renderizar, item["tipo"], item["dados"])
+        fila.append((item, png))
+
+    for item, png in fila:
+        if isinstance(png, Future):
+            png, duracao = png.result()
+            ETIQUETA_SEGUNDOS.observar(duracao, tipo=item["tipo"])
+            if usar_cache:
+                cache.guardar(item["chave"], png)
+        yield item["nome"], png
+
+
+# --- Saída: ZIP em streaming ou PDF de várias páginas ---
+class _BufferStreaming:
+    """Destino de escrita não posicionável: o ZIP é esvaziado a cada etiqueta."""
+    def __init__(self):
+        self._partes = []
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self) -> bytes:
+        dados = b"".join(self._partes)
+        self._partes.clear()
+        return dados
+
+def _gerar_zip(itens: list[dict]):
+    buffer = _BufferStreaming()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as arquivo_zip:
+        for nome, png in renderizar_lote(itens):
+            arquivo_zip.writestr(nome, png)  # PNG já é comprimido
+            yield buffer.esvaziar()
+    yield buffer.esvaziar()
+
+def _gerar_pdf(itens: list[dict]) -> bytes:
+    from PIL import Image
+
+    paginas = [Image.open(BytesIO(png)).convert("RGB") for _, png in renderizar_lote(itens)]
+    buf = BytesIO()
+    paginas[0].save(buf, format="PDF", save_all=True, append_images=paginas[1:])
+    return buf.getvalue()
+
+def responder_lote(itens: list[dict], formato: str, nome: str):
+    if formato == "pdf":
+        # O PDF só fecha com todas as páginas; a renderização continua paralela
+        return StreamingResponse(
+            BytesIO(_gerar_pdf(itens)),
+            media_type="application/pdf",
+            headers={"Content-Disposition": f'attachment; filename="{nome}.pdf"'},
+        )
+    return StreamingResponse(
+        _gerar_zip(itens),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{nome}.zip"'},
+    )
@@ -0,0 +1,208 @@
+# exportacao.py
+import csv
+import gzip
+import importlib.util
+import json
+from io import StringIO
+from itertools import islice
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Numeric
+
+from crud import linha_relatorio
+from database import SessionLeitura
+
+FORMATOS_STREAMING = ("csv", "ndjson")
+TAMANHO_LOTE = 1000  # linhas buscadas por ida ao cursor do servidor
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Parquet depende do pyarrow (opcional), importado só ao gravar o primeiro arquivo
+PARQUET_DISPONIVEL = importlib.util.find_spec("pyarrow") is not None
+LINHAS_POR_GRUPO_PARQUET = 64 * 1024
+
+
+# --- Geradores de linhas ---
+def _gerar_csv(colunas, linhas):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(colunas)
+    yield buffer.getvalue()  # cabeçalho sai imediatamente
+
+    pendentes = 0
+    buffer.seek(0)
+    buffer.truncate()
+    for linha in linhas:
+        writer.writerow(linha[c] for c in colunas)
+        pendentes += 1
+        if pendentes >= TAMANHO_LOTE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pendentes = 0
+    if pendentes:
+        yield buffer.getvalue()
+
+def _gerar_ndjson(colunas, linhas):
+    lote = []
+    for linha in linhas:
+        lote.append(json.dumps(linha, ensure_ascii=False, default=str))
+        if len(lote) >= TAMANHO_LOTE:
+            yield "\n".join(lote) + "\n"
+            lote = []
+    if lote:
+        yield "\n".join(lote) + "\n"
+
+
+# --- Resposta em streaming ---
+def stream_relatorio(nome: str, formato: str, construtor_query, *args):
+    """
+    Executa a query do relatório com cursor no servidor (yield_per/stream_results)
+    e envia as linhas ao cliente conforme chegam, em CSV ou NDJSON.
+
+    A sessão é aberta dentro do gerador, pois precisa continuar viva enquanto
+    a resposta é transmitida (após o retorno do endpoint).
+    """
+    def gerar():
+        db = SessionLeitura()
+        try:
+            query = construtor_query(db, *args).yield_per(TAMANHO_LOTE)
+            colunas = [c["name"] for c in query.column_descriptions]
+            linhas = (linha_relatorio(r) for r in query)
+            if formato == "csv":
+                yield from _gerar_csv(colunas, linhas)
+            else:
+                yield from _gerar_ndjson(colunas, linhas)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        gerar(),
+        media_type=MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome}.{formato}"'},
+    )
+
+
+# --- Gravação em arquivo (relatórios em segundo plano) ---
+def gravar_csv_gzip(query, caminho) -> int:
+    """
+    Grava as linhas da query em CSV com gzip, no formato do streaming
+    (datas como em linha_relatorio). Retorna quantas linhas.
+    """
+    query = query.yield_per(TAMANHO_LOTE)
+    descricoes = query.column_descriptions
+    # Só as colunas de data passam por conversão; o resto vai direto da tupla
+    datas = [i for i, d in enumerate(descricoes) if isinstance(d["type"], (Date, DateTime))]
+    total = 0
+    with gzip.open(caminho, "wt", encoding="utf-8", newline="", compresslevel=6) as arquivo:
+        writer = csv.writer(arquivo)
+        writer.writerow(d["name"] for d in descricoes)
+        for r in query:
+            if datas:
+                r = list(r)
+                for i in datas:
+                    if r[i] is not None:
+                        r[i] = r[i].strftime("%Y-%m-%d %H:%M:%S")
+            writer.writerow(r)
+            total += 1
+    return total
+
+
+def _tipo_arrow(pa, tipo_sql):
+    # Tipos das colunas da query; None = inferido do primeiro lote
+    if isinstance(tipo_sql, Integer):
+        return pa.int64()
+    if isinstance(tipo_sql, DateTime):
+        return pa.timestamp("us")
+    if isinstance(tipo_sql, Date):
+        return pa.date32()
+    if isinstance(tipo_sql, (Float, Numeric)):
+        return pa.float64()
+    if isinstance(tipo_sql, Boolean):
+        return pa.bool_()
+    if hasattr(tipo_sql, "length"):
+        return pa.string()
+    return None
+
+def lotes_arrow(query, tamanho_lote: int = TAMANHO_LOTE):
+    """
+    RecordBatches do pyarrow com as linhas da query, `tamanho_lote` por vez,
+    todos com o mesmo schema (tipos das colunas da query; datas nativas).
+    """
+    import pyarrow as pa
+
+    query = query.yield_per(tamanho_lote)
+    descricoes = query.column_descriptions
+    tipos = [_tipo_arrow(pa, d["type"]) for d in descricoes]
+    schema = None
+    linhas = iter(query)
+    while lote := list(islice(linhas, tamanho_lote)):
+        colunas = list(zip(*lote))
+        if schema is None:
+            campos = []
+            for descricao, tipo, valores in zip(descricoes, tipos, colunas):
+                if tipo is None:
+                    tipo = pa.array(valores).type
+                    tipo = pa.string() if pa.types.is_null(tipo) else tipo
+                campos.append(pa.field(descricao["name"], tipo))
+            schema = pa.schema(campos)
+        yield pa.record_batch([pa.array(v, type=f.type) for v, f in zip(colunas, schema)], schema=schema)
+
+def esquema_arrow_vazio(query):
+    """Schema das colunas da query sem depender de linhas (resultado vazio)."""
+    import pyarrow as pa
+
+    return pa.schema([
+        pa.field(d["name"], _tipo_arrow(pa, d["type"]) or pa.string()) for d in query.column_descriptions
+    ])
+
+
+class EscritorParquet:
+    """
+    Arquivo Parquet (zstd) gravado lote a lote. Os lotes são acumulados até
+    LINHAS_POR_GRUPO_PARQUET linhas por row group: lotes pequenos comprimem mal.
+    """
+
+    def __init__(self, caminho, schema):
+        import pyarrow.parquet as pq
+
+        self._escritor = pq.ParquetWriter(caminho, schema, compression="zstd")
+        self._pendentes = []
+        self.linhas = 0
+
+    def _gravar_pendentes(self):
+        import pyarrow as pa
+
+        self._escritor.write_table(pa.Table.from_batches(self._pendentes))
+        self._pendentes.clear()
+
+    def escrever(self, lote):
+        self._pendentes.append(lote)
+        self.linhas += lote.num_rows
+        if sum(l.num_rows for l in self._pendentes) >= LINHAS_POR_GRUPO_PARQUET:
+            self._gravar_pendentes()
+
+    def fechar(self):
+        if self._pendentes:
+            self._gravar_pendentes()
+        self._escritor.close()
+
+
+def gravar_parquet(query, caminho) -> int:
+    """Grava as linhas da query em Parquet, lote a lote. Retorna quantas linhas."""
+    escritor = None
+    try:
+        for lote in lotes_arrow(query):
+            if escritor is None:
+                escritor = EscritorParquet(caminho, lote.schema)
+            escritor.escrever(lote)
+        if escritor is None:
+            # Sem linhas: arquivo válido só com as colunas
+            escritor = EscritorParquet(caminho, esquema_arrow_vazio(query))
+    finally:
+        if escritor is not None:
+            escritor.fechar()
+    return escritor.linhas
@@ -0,0 +1,307 @@
+# exportacao_movimentacoes.py
+"""
+Exportação colunar de movimentacoes (com os atributos do produto e do
+local) para análise: Arrow/Parquet em vez de JSON.
+
+- GET /movimentacoes/exportar?desde_id=N&lacunas=... responde um stream
+  Arrow IPC com as movimentações de id > N e as das lacunas, lote a lote.
+  Os headers X-Watermark (último id incluído) e X-Lacunas (ids ainda
+  faltando, como "3-3,10-12") vão de volta em desde_id e lacunas na
+  próxima sincronização.
+- Este script grava Parquet particionado por mês (`<pasta>/mes=AAAA-MM/`,
+  lido por pandas.read_parquet ou pyarrow.dataset). A cada execução, só as
+  movimentações acima do watermark salvo em `<pasta>/_watermark.json`, e
+  as lacunas anotadas nele, são lidas e gravadas como uma nova parte em
+  cada mês tocado.
+
+O watermark é o maior id exportado, mas uma movimentação com id menor pode
+aparecer depois: a transação dela ainda estava aberta durante a exportação.
+Por isso as últimas EXPORTACAO_MARGEM_IDS abaixo do watermark são lidas de
+novo na sincronização seguinte: só os ids que faltavam nesse trecho
+(lacunas), que o script guarda no watermark e o stream devolve em
+X-Lacunas, então nenhuma linha sai duas vezes. Uma lacuna que fica abaixo
+da margem é dada como transação desfeita. Requer pyarrow.
+
+Uso (a partir da raiz do projeto):
+    python exportacao_movimentacoes.py                       # incremental em exportacao/movimentacoes
+    python exportacao_movimentacoes.py --pasta /dados/wms/movimentacoes
+    python exportacao_movimentacoes.py --completo            # apaga as partes e exporta tudo
+"""
+import argparse
+import json
+import os
+import re
+import time
+from io import BytesIO
+from pathlib import Path
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLeitura
+from exportacao import EscritorParquet, esquema_arrow_vazio, lotes_arrow
+
+PASTA_EXPORTACAO = os.getenv("EXPORTACAO_MOVIMENTACOES_DIR", "exportacao/movimentacoes")
+# Linhas por RecordBatch lido do banco
+EXPORTACAO_LOTE = int(os.getenv("EXPORTACAO_LOTE", "50000"))
+# Ids abaixo do watermark lidos de novo, para as transações que estavam abertas
+EXPORTACAO_MARGEM_IDS = int(os.getenv("EXPORTACAO_MARGEM_IDS", "10000"))
+
+ARQUIVO_WATERMARK = "_watermark.json"
+PADRAO_PARTE = re.compile(r"^parte-(\d{12})-(\d{12})(-\d+)?\.parquet(\.tmp)?$")
+MEDIA_TYPE_ARROW = "application/vnd.apache.arrow.stream"
+
+
+def query_movimentacoes(db: Session, desde_id: int, ate_id: int, lacunas=(), excluir=()):
+    """
+    Movimentações com id em (desde_id, ate_id] ou em um dos intervalos
+    [primeiro, último] de `lacunas`, fora dos de `excluir`, em ordem de id,
+    com produto e local.
+    """
+    m, p, l = models.Movimentacao, models.Produto, models.Local
+    return (
+        db.query(
+            m.id,
+            m.data_movimentacao,
+            m.tipo,
+            m.quantidade,
+            m.produto_id,
+            p.sku,
+            p.descricao.label("produto"),
+            p.lote,
+            p.validade,
+            m.local_id,
+            l.codigo.label("local"),
+            l.armazem,
+            l.corredor,
+            l.rack_nivel
+        )
+        .outerjoin(p, m.produto_id == p.id)
+        .outerjoin(l, m.local_id == l.id)
+        .filter(or_(m.id.between(desde_id + 1, ate_id), *(m.id.between(a, b) for a, b in lacunas)))
+        .filter(*(~m.id.between(a, b) for a, b in excluir))
+        .order_by(m.id)
+    )
+
+def ultimo_id(db: Session) -> int:
+    return db.query(func.max(models.Movimentacao.id)).scalar() or 0
+
+
+class Lacunas:
+    """
+    Ids dos intervalos lidos que não vieram na exportação, a partir dos ids
+    de cada lote (em ordem crescente): transações ainda abertas ou desfeitas.
+    """
+
+    def __init__(self, intervalos):
+        self.intervalos = sorted(intervalos)  # [primeiro, último], disjuntos
+        self.anterior = self.intervalos[0][0] - 1 if self.intervalos else 0
+        self.faltando: list[list[int]] = []
+
+    def _faltam(self, primeiro: int, ultimo: int):
+        for a, b in self.intervalos:
+            a, b = max(a, primeiro), min(b, ultimo)
+            if a <= b:
+                self.faltando.append([a, b])
+
+    def registrar(self, ids):
+        import numpy as np
+
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        anteriores = np.concatenate(([self.anterior], ids[:-1]))
+        for k in np.flatnonzero(ids - anteriores > 1):
+            self._faltam(int(anteriores[k]) + 1, int(ids[k]) - 1)
+        self.anterior = int(ids[-1])
+
+    def fechar(self) -> list[list[int]]:
+        if self.intervalos:
+            self._faltam(self.anterior + 1, self.intervalos[-1][1])
+        return self.faltando
+
+
+# --- Stream Arrow IPC (endpoint) ---
+def ler_lacunas(texto: str | None, desde_id: int) -> list[list[int]]:
+    """
+    Intervalos de X-Lacunas ("3-3,10-12") recebidos de volta. Só os dentro
+    da margem abaixo de desde_id são relidos. ValueError se malformado.
+    """
+    lacunas = []
+    for trecho in filter(None, (texto or "").split(",")):
+        primeiro, separador, ultimo = trecho.strip().partition("-")
+        if not separador or not primeiro.isdigit() or not ultimo.isdigit() or int(primeiro) > int(ultimo):
+            raise ValueError(f"Lacuna inválida: {trecho!r} (use primeiro-último, separados por vírgula)")
+        a, b = max(int(primeiro), desde_id - EXPORTACAO_MARGEM_IDS + 1), min(int(ultimo), desde_id)
+        if a <= b:
+            lacunas.append([a, b])
+    lacunas.sort()
+    if any(anterior[1] >= atual[0] for anterior, atual in zip(lacunas, lacunas[1:])):
+        raise ValueError("Lacunas sobrepostas")
+    return lacunas
+
+def _lacunas_recentes(db: Session, intervalos: list[list[int]], ate_id: int) -> list[list[int]]:
+    """Ids que faltam em `intervalos` dentro da margem abaixo de ate_id."""
+    margem = ate_id - EXPORTACAO_MARGEM_IDS
+    intervalos = [[max(a, margem + 1), b] for a, b in intervalos if b > margem]
+    faltando = Lacunas(intervalos)
+    if intervalos:
+        m = models.Movimentacao
+        faltando.registrar(db.scalars(
+            select(m.id).where(or_(*(m.id.between(a, b) for a, b in intervalos))).order_by(m.id)
+        ).all())
+    return faltando.fechar()
+
+def stream_arrow(desde_id: int, lacunas: list[list[int]] = ()) -> StreamingResponse:
+    """
+    Resposta com as movimentações de id > desde_id e das `lacunas` em Arrow
+    IPC (stream), enviada conforme os lotes saem do banco. O limite
+    superior e as novas lacunas (no máximo EXPORTACAO_MARGEM_IDS ids
+    lidos) são fixados antes de começar, para X-Watermark e X-Lacunas
+    valerem para o que foi enviado: um id que chega depois disso fica
+    para a próxima sincronização, não vai duas vezes.
+    """
+    lacunas = list(lacunas)
+    with SessionLeitura() as db:
+        ate_id = max(ultimo_id(db), desde_id)
+        intervalos = lacunas + ([[desde_id + 1, ate_id]] if ate_id > desde_id else [])
+        faltando = _lacunas_recentes(db, intervalos, ate_id)
+
+    def gerar():
+        import pyarrow as pa
+
+        buffer = BytesIO()
+        escritor = None
+        with SessionLeitura() as db:
+            query = query_movimentacoes(db, desde_id, ate_id, lacunas, faltando)
+            for lote in lotes_arrow(query, EXPORTACAO_LOTE):
+                if escritor is None:
+                    escritor = pa.ipc.new_stream(buffer, lote.schema)
+                escritor.write_batch(lote)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if escritor is None:
+                escritor = pa.ipc.new_stream(buffer, esquema_arrow_vazio(query))
+        escritor.close()
+        yield buffer.getvalue()
+
+    return StreamingResponse(
+        gerar(),
+        media_type=MEDIA_TYPE_ARROW,
+        headers={
+            "X-Watermark": str(ate_id),
+            "X-Lacunas": ",".join(f"{a}-{b}" for a, b in faltando),
+            "Content-Disposition": f'attachment; filename="movimentacoes-{desde_id + 1}-{ate_id}.arrows"',
+        },
+    )
+
+
+# --- Parquet particionado por mês (script) ---
+def ler_watermark(pasta) -> dict:
+    try:
+        return json.loads((Path(pasta) / ARQUIVO_WATERMARK).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {"ultimo_id": 0, "lacunas": []}
+
+def _gravar_watermark(pasta: Path, dados: dict):
+    destino = pasta / ARQUIVO_WATERMARK
+    temporario = destino.with_suffix(".tmp")
+    temporario.write_text(json.dumps(dados, indent=2), encoding="utf-8")
+    os.replace(temporario, destino)  # escrita atômica: só depois de todas as partes
+
+def _partes(pasta: Path):
+    """(caminho, primeiro id, execução ou None nas partes antigas, se é .tmp) de cada parte."""
+    for caminho in pasta.glob("mes=*/parte-*"):
+        m = PADRAO_PARTE.match(caminho.name)
+        if m:
+            yield caminho, int(m.group(1)), int(m.group(3)[1:]) if m.group(3) else None, bool(m.group(4))
+
+def exportar_parquet(pasta: str = PASTA_EXPORTACAO, completo: bool = False) -> dict:
+    """
+    Grava em `pasta` as movimentações acima do watermark e as das lacunas
+    anotadas nele (todas, com `completo`), uma parte por mês tocado, e
+    avança o watermark.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    inicio = time.perf_counter()
+    pasta = Path(pasta)
+    pasta.mkdir(parents=True, exist_ok=True)
+    watermark = {} if completo else ler_watermark(pasta)
+    desde_id = int(watermark.get("ultimo_id", 0))
+    lacunas = watermark.get("lacunas", [])
+    execucao = watermark.get("execucao", 0) + 1
+    # Partes de execuções depois da última registrada no watermark foram
+    # interrompidas (ou todas, com --completo). As que só releram lacunas
+    # começam abaixo do watermark, então a decisão é pela execução, não
+    # pelo primeiro id; este só vale para as partes sem número de execução.
+    for caminho, primeiro_id, execucao_parte, temporaria in list(_partes(pasta)):
+        if temporaria or (primeiro_id > desde_id if execucao_parte is None else execucao_parte >= execucao):
+            caminho.unlink()
+
+    with SessionLeitura() as db:
+        ate_id = max(ultimo_id(db), desde_id)
+        meses: dict[str, EscritorParquet] = {}
+        intervalos = lacunas + ([[desde_id + 1, ate_id]] if ate_id > desde_id else [])
+        primeiro_id = intervalos[0][0] if intervalos else desde_id + 1
+        nome_parte = f"parte-{primeiro_id:012d}-{ate_id:012d}-{execucao}.parquet"
+        faltando = Lacunas(intervalos)
+        try:
+            if intervalos:
+                for lote in lotes_arrow(query_movimentacoes(db, desde_id, ate_id, lacunas), EXPORTACAO_LOTE):
+                    faltando.registrar(lote.column("id").to_numpy())
+                    chaves = pc.strftime(pc.cast(lote.column("data_movimentacao"), pa.timestamp("s")), "%Y-%m")
+                    for mes in pc.unique(chaves).to_pylist():
+                        if mes not in meses:
+                            (pasta / f"mes={mes}").mkdir(exist_ok=True)
+                            meses[mes] = EscritorParquet(pasta / f"mes={mes}" / f"{nome_parte}.tmp", lote.schema)
+                        meses[mes].escrever(lote.filter(pc.equal(chaves, mes)))
+        finally:
+            for escritor in meses.values():
+                escritor.fechar()
+
+    # Partes completas: renomeia e só então avança o watermark
+    for mes in meses:
+        os.replace(pasta / f"mes={mes}" / f"{nome_parte}.tmp", pasta / f"mes={mes}" / nome_parte)
+    linhas_por_mes = {mes: escritor.linhas for mes, escritor in sorted(meses.items())}
+    # Só as lacunas dentro da margem são relidas; as mais antigas foram desfeitas
+    margem = ate_id - EXPORTACAO_MARGEM_IDS
+    lacunas = [[max(a, margem + 1), b] for a, b in faltando.fechar() if b > margem]
+    resumo = {
+        "desde_id": desde_id,
+        "ultimo_id": ate_id,
+        "linhas": sum(linhas_por_mes.values()),
+        "meses": linhas_por_mes,
+        "lacunas": sum(b - a + 1 for a, b in lacunas),
+        "segundos": round(time.perf_counter() - inicio, 2),
+    }
+    _gravar_watermark(pasta, {
+        "ultimo_id": ate_id,
+        "lacunas": lacunas,
+        "execucao": execucao,
+        "exportado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pasta", default=PASTA_EXPORTACAO)
+    parser.add_argument("--completo", action="store_true", help="ignora o watermark e exporta tudo de novo")
+    args = parser.parse_args()
+
+    resumo = exportar_parquet(args.pasta, args.completo)
+    for mes, linhas in resumo["meses"].items():
+        print(f"mes={mes}: {linhas} linhas")
+    print(
+        f"Exportadas {resumo['linhas']} movimentações (ids {resumo['desde_id'] + 1} a {resumo['ultimo_id']}) "
+        f"em {resumo['segundos']} s; watermark: {resumo['ultimo_id']}, {resumo['lacunas']} ids a reler"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# jobs_relatorios.py
+"""
+Relatórios pesados em segundo plano (POST /relatorios/jobs).
+
+A requisição só cria o job: um pool local de threads executa a query do
+relatório (crud.query_relatorio_*), lida em lotes da réplica de leitura se
+houver, e grava o resultado em disco como CSV com gzip ou Parquet (pyarrow,
+opcional). O cliente consulta GET /relatorios/jobs/{id} até o status
+"concluido" e baixa o arquivo em GET /relatorios/jobs/{id}/arquivo.
+
+- pedidos iguais (relatório, formato e parâmetros) enquanto um deles está
+  na fila ou executando recebem o mesmo job;
+- um resultado concluído é reaproveitado por RELATORIOS_JOBS_TTL segundos;
+  depois disso o job some e o arquivo é apagado.
+
+O estado de cada job também vai para um JSON ao lado do arquivo, então
+qualquer worker do uvicorn que use a mesma pasta responde à consulta. A
+deduplicação e a fila são por processo.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+
+import crud
+from database import SessionLeitura
+from exportacao import PARQUET_DISPONIVEL, gravar_csv_gzip, gravar_parquet
+from metricas import Medidor, registrar
+
+RELATORIOS_JOBS_DIR = os.getenv("RELATORIOS_JOBS_DIR", ".cache/relatorios")
+RELATORIOS_JOBS_WORKERS = int(os.getenv("RELATORIOS_JOBS_WORKERS", "2"))
+RELATORIOS_JOBS_TTL = float(os.getenv("RELATORIOS_JOBS_TTL", "3600"))
+
+logger = logging.getLogger("wms.relatorios_jobs")
+
+# nome -> (construtor da query, parâmetros obrigatórios na ordem do construtor)
+RELATORIOS = {
+    "movimentacoes": (crud.query_relatorio_movimentacoes_por_periodo, ("data_inicio", "data_fim")),
+    "estoque-geral": (crud.query_relatorio_estoque_geral, ()),
+    "inventario-por-local": (crud.query_relatorio_inventario_por_local, ()),
+    "operacoes": (crud.query_relatorio_operacoes, ()),
+}
+# formato -> (extensão, gravador, media type)
+FORMATOS = {
+    "csv": (".csv.gz", gravar_csv_gzip, "application/gzip"),
+    "parquet": (".parquet", gravar_parquet, "application/vnd.apache.parquet"),
+}
+EM_ANDAMENTO = ("pendente", "executando")
+ID_VALIDO = re.compile(r"[0-9a-f]{32}")
+
+
+class Job:
+    def __init__(self, relatorio: str, formato: str, parametros: dict, chave: str):
+        self.id = uuid.uuid4().hex
+        self.relatorio = relatorio
+        self.formato = formato
+        self.parametros = parametros
+        self.chave = chave
+        self.status = "pendente"
+        self.criado_em = datetime.utcnow()
+        self.iniciado_em = None
+        self.concluido_em = None
+        self.linhas = None
+        self.tamanho_bytes = None
+        self.erro = None
+
+    @property
+    def nome_arquivo(self) -> str:
+        return f"{self.relatorio}-{self.id}{FORMATOS[self.formato][0]}"
+
+    @property
+    def media_type(self) -> str:
+        return FORMATOS[self.formato][2]
+
+    def expirado(self) -> bool:
+        return (
+            self.concluido_em is not None
+            and (datetime.utcnow() - self.concluido_em).total_seconds() > RELATORIOS_JOBS_TTL
+        )
+
+    def como_dict(self) -> dict:
+        return {
+            "id": self.id, "relatorio": self.relatorio, "formato": self.formato,
+            "parametros": self.parametros, "chave": self.chave, "status": self.status,
+            "criado_em": self.criado_em, "iniciado_em": self.iniciado_em, "concluido_em": self.concluido_em,
+            "linhas": self.linhas, "tamanho_bytes": self.tamanho_bytes, "erro": self.erro,
+        }
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "Job":
+        job = cls.__new__(cls)
+        for campo, valor in dados.items():
+            if campo.endswith("_em") and valor is not None:
+                valor = datetime.fromisoformat(valor)
+            setattr(job, campo, valor)
+        return job
+
+
+class FilaRelatorios:
+    def __init__(self, pasta: str = RELATORIOS_JOBS_DIR, workers: int = RELATORIOS_JOBS_WORKERS):
+        self.pasta = Path(pasta)
+        self.workers = workers
+        self._jobs: dict[str, Job] = {}
+        self._por_chave: dict[str, str] = {}  # chave do pedido -> id do job em andamento ou concluído
+        self._futuros = {}  # id do job -> Future da execução, até ela começar
+        self._lock = threading.Lock()
+        self._executor = None
+
+    # --- Arquivos ---
+    def caminho(self, job: Job) -> Path:
+        return self.pasta / job.nome_arquivo
+
+    def _caminho_estado(self, job_id: str) -> Path:
+        return self.pasta / f"{job_id}.json"
+
+    def _gravar_estado(self, job: Job):
+        destino = self._caminho_estado(job.id)
+        temporario = destino.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        temporario.write_text(json.dumps(job.como_dict(), default=str), encoding="utf-8")
+        os.replace(temporario, destino)
+
+    def _apagar_arquivos(self, job: Job):
+        for caminho in (self.caminho(job), self._caminho_estado(job.id)):
+            caminho.unlink(missing_ok=True)
+
+    # --- Pedidos ---
+    def solicitar(self, relatorio: str, formato: str, **parametros) -> Job:
+        """Job do pedido: um igual em andamento ou concluído dentro do TTL, ou um novo na fila."""
+        if relatorio not in RELATORIOS:
+            raise ValueError(f"Relatório desconhecido: {relatorio}")
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato desconhecido: {formato}")
+        if formato == "parquet" and not PARQUET_DISPONIVEL:
+            raise ValueError("Formato parquet requer o pacote pyarrow instalado no servidor")
+        _, obrigatorios = RELATORIOS[relatorio]
+        faltando = [p for p in obrigatorios if parametros.get(p) is None]
+        if faltando:
+            raise ValueError(f"Parâmetros obrigatórios para {relatorio}: {', '.join(faltando)}")
+        parametros = {p: parametros[p] for p in obrigatorios}
+        if parametros.get("data_inicio") and parametros["data_inicio"] > parametros["data_fim"]:
+            raise ValueError("data_inicio deve ser anterior ou igual a data_fim")
+
+        chave = hashlib.sha256(
+            json.dumps([relatorio, formato, parametros], default=str, sort_keys=True).encode()
+        ).hexdigest()
+        self.limpar_expirados()
+        with self._lock:
+            existente = self._jobs.get(self._por_chave.get(chave))
+            if existente is not None and (
+                existente.status in EM_ANDAMENTO
+                or (existente.status == "concluido" and self.caminho(existente).exists())
+            ):
+                return existente
+
+            job = Job(relatorio, formato, parametros, chave)
+            self.pasta.mkdir(parents=True, exist_ok=True)
+            self._gravar_estado(job)
+            self._jobs[job.id] = job
+            self._por_chave[chave] = job.id
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="relatorios-jobs")
+            self._futuros[job.id] = self._executor.submit(self._executar, job)
+        return job
+
+    def consultar(self, job_id: str) -> Job | None:
+        """Job deste processo ou, pelo JSON em disco, de outro worker. None se não existir ou expirou."""
+        if not ID_VALIDO.fullmatch(job_id):
+            return None
+        job = self._jobs.get(job_id)
+        if job is None:
+            try:
+                job = Job.de_dict(json.loads(self._caminho_estado(job_id).read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                return None
+        return None if job.expirado() else job
+
+    # --- Execução ---
+    def _executar(self, job: Job):
+        construtor, obrigatorios = RELATORIOS[job.relatorio]
+        _, gravar, _ = FORMATOS[job.formato]
+        destino = self.caminho(job)
+        temporario = destino.with_suffix(".tmp")
+        with self._lock:
+            self._futuros.pop(job.id, None)
+        job.status, job.iniciado_em = "executando", datetime.utcnow()
+        self._gravar_estado(job)
+        inicio = time.perf_counter()
+        try:
+            argumentos = [date.fromisoformat(str(job.parametros[p])) for p in obrigatorios]
+            with SessionLeitura() as db:
+                job.linhas = gravar(construtor(db, *argumentos), temporario)
+            os.replace(temporario, destino)
+            job.tamanho_bytes = destino.stat().st_size
+            job.status = "concluido"
+            logger.info("Relatório %s (%s) gerado: %s linhas em %.1f s",
+                        job.relatorio, job.id, job.linhas, time.perf_counter() - inicio)
+        except Exception as e:
+            logger.exception("Falha no relatório %s (%s)", job.relatorio, job.id)
+            temporario.unlink(missing_ok=True)
+            job.status, job.erro = "erro", str(e)
+            with self._lock:
+                # Um novo pedido igual tenta de novo em vez de receber o erro
+                if self._por_chave.get(job.chave) == job.id:
+                    del self._por_chave[job.chave]
+        finally:
+            job.concluido_em = datetime.utcnow()
+            self._gravar_estado(job)
+
+    def limpar_expirados(self):
+        """Esquece os jobs concluídos há mais de RELATORIOS_JOBS_TTL e apaga os arquivos deles.
+
+        Na pasta, os JSON de jobs ainda pendentes ou executando são mantidos
+        mesmo antigos: a execução pode durar mais que o TTL, aqui ou em outro
+        worker, e a consulta do status não pode sumir no meio dela.
+        """
+        with self._lock:
+            expirados = [job for job in self._jobs.values() if job.expirado()]
+            for job in expirados:
+                del self._jobs[job.id]
+                if self._por_chave.get(job.chave) == job.id:
+                    del self._por_chave[job.chave]
+        for job in expirados:
+            self._apagar_arquivos(job)
+        # Sobras de outros processos ou de execuções anteriores
+        limite = time.time() - RELATORIOS_JOBS_TTL
+        try:
+            antigos = [c for c in self.pasta.iterdir() if c.suffix != ".tmp" and c.stat().st_mtime < limite]
+        except OSError:
+            return
+        for caminho in antigos:
+            if caminho.suffix == ".json" and self._em_andamento(caminho):
+                continue
+            caminho.unlink(missing_ok=True)
+
+    def _em_andamento(self, caminho_estado: Path) -> bool:
+        job = self._jobs.get(caminho_estado.stem)
+        if job is not None:
+            return job.status in EM_ANDAMENTO
+        try:
+            return json.loads(caminho_estado.read_text(encoding="utf-8")).get("status") in EM_ANDAMENTO
+        except (OSError, ValueError):
+            return False
+
+    def contagem(self) -> dict[str, int]:
+        contagem = dict.fromkeys(("pendente", "executando", "concluido", "erro"), 0)
+        for job in list(self._jobs.values()):
+            contagem[job.status] += 1
+        return contagem
+
+    def encerrar(self):
+        """Para o pool ao desligar a API; jobs na fila são descartados e ficam com status "erro"."""
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        with self._lock:
+            cancelados = [self._jobs[job_id] for job_id, futuro in list(self._futuros.items()) if futuro.cancelled()]
+            for job in cancelados:
+                job.status, job.erro = "erro", "Cancelado: a API foi encerrada antes da execução"
+                job.concluido_em = datetime.utcnow()
+                if self._por_chave.get(job.chave) == job.id:
+                    del self._por_chave[job.chave]
+            self._futuros.clear()
+        for job in cancelados:
+            self._gravar_estado(job)
+
+
+fila = FilaRelatorios()
+
+registrar(Medidor(
+    "wms_relatorios_jobs", "Jobs de relatório deste processo por status",
+    ("status",), lambda: [((status,), total) for status, total in fila.contagem().items()]
+))
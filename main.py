@@ -1,188 +1,440 @@
-from fastapi import FastAPI, Depends, HTTPException, APIRouter
+import time
+
+_INICIO_IMPORT = time.perf_counter()  # antes dos demais imports: mede o import inteiro
+
+import os
+import threading
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, PlainTextResponse
 from sqlalchemy.orm import Session
-import models, schemas, crud
-from database import engine, Base, get_db
-from fastapi import Query, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+import models, schemas, crud, crud_async, cache_catalogo, jobs_relatorios, respostas
+from database import engine, SessionLocal, get_db, get_db_leitura, get_async_db
 from datetime import datetime, date
-from crud import relatorio_resumo_movimentacoes
-from database import get_db
-from qrcode_utils import gerar_qr_code_local, gerar_qr_code_produto, gerar_etiqueta_qr_rack
+from exportacao import PARQUET_DISPONIVEL, stream_relatorio
+from exportacao_movimentacoes import ler_lacunas, stream_arrow as stream_movimentacoes_arrow
+from paginacao import LIMITE_PADRAO, LIMITE_MAXIMO, definir_link_proximo
+from cache_etiquetas import chave_etiqueta, responder_etiqueta
+from etiquetas_lote import item_local, item_produto, responder_lote
+from metricas import MiddlewareMetricas, exportar as exportar_metricas, marcar_inicializacao
+from particoes import garantir_particoes
+from snapshots_estoque import iniciar_agendador as iniciar_snapshots_estoque
+
+# O schema é criado/migrado por `python -m migracoes`, não ao importar a API.
+# Em desenvolvimento, SCHEMA_AUTOMATICO=true faz o mesmo ao subir.
+SCHEMA_AUTOMATICO = os.getenv("SCHEMA_AUTOMATICO", "false").lower() in ("1", "true", "sim")
 
-Base.metadata.create_all(bind=engine)
 
-router = APIRouter(prefix="/relatorios", tags=["Relatórios"])
+# --- Inicialização ---
+def _preparar_em_segundo_plano():
+    # Partições futuras e aquecimento do cache não bloqueiam o worker de ficar
+    # pronto: até terminarem, as datas novas caem na partição padrão e o cache
+    # é preenchido sob demanda
+    garantir_particoes(engine)
+    if cache_catalogo.CATALOGO_AQUECER:
+        with SessionLocal() as db:
+            cache_catalogo.aquecer(db)
+    marcar_inicializacao("aquecido", time.perf_counter() - _INICIO_IMPORT)
 
-app = FastAPI(title="WMS API")
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    if SCHEMA_AUTOMATICO:
+        from migracoes import preparar_schema
+        preparar_schema(engine, verbose=False)
+    threading.Thread(target=_preparar_em_segundo_plano, name="preparar-api", daemon=True).start()
+    parar_snapshots = iniciar_snapshots_estoque()  # só se SNAPSHOT_INTERVALO_HORAS estiver definido
+    marcar_inicializacao("pronto", time.perf_counter() - _INICIO_IMPORT)
+    yield
+    if parar_snapshots is not None:
+        parar_snapshots.set()
+    jobs_relatorios.fila.encerrar()
+
+app = FastAPI(title="WMS API", lifespan=ciclo_de_vida)
+app.add_middleware(MiddlewareMetricas)
 
 # Raiz
 @app.get("/")
 def root():
     return {"mensagem": "🚀 API WMS rodando com sucesso!"}
 
+# Saúde (readiness): não consulta o banco
+@app.get("/saude", include_in_schema=False)
+def saude():
+    return {"status": "ok"}
+
+# Métricas (Prometheus)
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(exportar_metricas(), media_type="text/plain; version=0.0.4")
+
 # Produtos
 @app.get("/produtos", response_model=list[schemas.Produto])
-def listar_produtos(db: Session = Depends(get_db)):
-    return crud.get_produtos(db)
+def listar_produtos(
+    request: Request,
+    response: Response,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = Query(None, description="Cursor opaco da próxima página (header Link)"),
+    db: Session = Depends(get_db_leitura)
+):
+    produtos, proximo_cursor = crud.get_produtos(db, limit=limit, cursor=cursor)
+    definir_link_proximo(request, response, proximo_cursor, limit)
+    return produtos
+
+@app.get("/produtos/busca", response_model=list[schemas.ProdutoBusca])
+def buscar_produtos(
+    q: str = Query(..., min_length=1, max_length=100, description="Início ou trecho do SKU ou da descrição"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db_leitura)
+):
+    return crud.buscar_produtos(db, q, limit)
 
 @app.post("/produtos", response_model=schemas.Produto)
 def criar_produto(produto: schemas.ProdutoCreate, db: Session = Depends(get_db)):
-    db_produto = db.query(models.Produto).filter(models.Produto.sku == produto.sku).first()
+    db_produto = cache_catalogo.produtos.obter(db, "sku", produto.sku)
     if db_produto:
         raise HTTPException(status_code=400, detail="Produto com esse SKU já existe")
     return crud.create_produto(db, produto)
 
 # Locais
 @app.get("/locais", response_model=list[schemas.Local])
-def listar_locais(db: Session = Depends(get_db)):
-    return crud.get_locais(db)
+def listar_locais(
+    request: Request,
+    response: Response,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = Query(None, description="Cursor opaco da próxima página (header Link)"),
+    db: Session = Depends(get_db_leitura)
+):
+    locais, proximo_cursor = crud.get_locais(db, limit=limit, cursor=cursor)
+    definir_link_proximo(request, response, proximo_cursor, limit)
+    return locais
 
 @app.post("/locais", response_model=schemas.Local)
 def criar_local(local: schemas.LocalCreate, db: Session = Depends(get_db)):
-    db_local = db.query(models.Local).filter(models.Local.codigo == local.codigo).first()
+    db_local = cache_catalogo.locais.obter(db, "codigo", local.codigo)
     if db_local:
         raise HTTPException(status_code=400, detail="Local já existe")
     return crud.create_local(db, local)
 
 # Estoque
 @app.get("/estoque", response_model=list[schemas.Estoque])
-def listar_estoque(db: Session = Depends(get_db)):
-    return crud.get_estoque(db)
+async def listar_estoque(
+    request: Request,
+    response: Response,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = Query(None, description="Cursor opaco da próxima página (header Link)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if not respostas.VALIDAR_RESPOSTAS:
+        # Caminho rápido: sem ORM nem validação pelo response_model
+        estoque, proximo_cursor = await crud_async.get_estoque_plano(db, limit=limit, cursor=cursor)
+        response = respostas.RespostaJSONRapida(estoque)
+        definir_link_proximo(request, response, proximo_cursor, limit)
+        return response
+    estoque, proximo_cursor = await crud_async.get_estoque(db, limit=limit, cursor=cursor)
+    definir_link_proximo(request, response, proximo_cursor, limit)
+    return estoque
 
 @app.post("/estoque", response_model=schemas.Estoque)
 def criar_estoque(estoque: schemas.EstoqueCreate, db: Session = Depends(get_db)):
     return crud.create_estoque(db, estoque)
 
 @app.get("/produtos_por_local/{local_id}", response_model=list[schemas.Estoque])
-def produtos_por_local(local_id: int, db: Session = Depends(get_db)):
-    estoque_local = db.query(models.Estoque).filter(models.Estoque.local_id == local_id).all()
+async def produtos_por_local(local_id: int, db: AsyncSession = Depends(get_async_db)):
+    estoque_local = await crud_async.get_estoque_por_local(db, local_id)
     if not estoque_local:
         raise HTTPException(status_code=404, detail="Nenhum produto encontrado nesse local")
     return estoque_local
 
 
 @app.post("/popular_estoque")
-def popular_estoque_teste(db: Session = Depends(get_db)):
-    produtos = db.query(models.Produto).all()
-    locais = db.query(models.Local).all()
-    if not produtos or not locais:
+def popular_estoque_teste(
+    quantidade: int = Query(20, ge=0, description="Quantidade inicial de cada par produto/local"),
+    armazem: str | None = Query(None, description="Semeia apenas os locais deste armazém"),
+    prefixo_sku: str | None = Query(None, description="Semeia apenas produtos cujo SKU começa com este prefixo"),
+    db: Session = Depends(get_db)
+):
+    if not db.query(models.Produto.id).first() or not db.query(models.Local.id).first():
         raise HTTPException(status_code=400, detail="Crie produtos e locais antes de popular estoque")
-    
-    produtos_ids = [p.id for p in produtos]
-    locais_ids = [l.id for l in locais]
 
-    crud.popular_estoque(db, produtos_ids, locais_ids, quantidade_default=20)
-    return {"mensagem": "Estoque populado com sucesso!"}
+    criados = crud.popular_estoque(db, quantidade_default=quantidade, armazem=armazem, prefixo_sku=prefixo_sku)
+    return {"mensagem": "Estoque populado com sucesso!", "criados": criados}
 
 @app.get("/locais_do_produto/{produto_id}", response_model=list[schemas.EstoqueProdutoOut])
-def locais_do_produto(produto_id: int, db: Session = Depends(get_db)):
-    estoque_produto = db.query(models.Estoque).filter(models.Estoque.produto_id == produto_id).all()
+async def locais_do_produto(produto_id: int, db: AsyncSession = Depends(get_async_db)):
+    estoque_produto = await crud_async.get_estoque_por_produto(db, produto_id)
     if not estoque_produto:
         raise HTTPException(status_code=404, detail="Produto não encontrado em nenhum local")
     return estoque_produto
 
 # Movimentações
 @app.get("/movimentacoes", response_model=list[schemas.Movimentacao])
-def listar_movimentacoes(db: Session = Depends(get_db)):
-    return crud.get_movimentacoes(db)
+async def listar_movimentacoes(
+    request: Request,
+    response: Response,
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = Query(None, description="Cursor opaco da próxima página (header Link)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    movimentacoes, proximo_cursor = await crud_async.get_movimentacoes(db, limit=limit, cursor=cursor)
+    definir_link_proximo(request, response, proximo_cursor, limit)
+    return movimentacoes
 
 @app.post("/movimentacoes", response_model=schemas.Movimentacao)
-def registrar_movimentacao(movimentacao: schemas.MovimentacaoCreate, db: Session = Depends(get_db)):
-    return crud.create_movimentacao(db, movimentacao)
+async def registrar_movimentacao(movimentacao: schemas.MovimentacaoCreate, db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.create_movimentacao(db, movimentacao)
+
+@app.post("/movimentacoes/lote", response_model=list[schemas.MovimentacaoLoteResultado])
+async def registrar_movimentacoes_lote(
+    movimentacoes: list[schemas.MovimentacaoCreate],
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await crud_async.create_movimentacoes_lote(db, movimentacoes)
+
+@app.get("/movimentacoes/exportar")
+def exportar_movimentacoes(
+    desde_id: int = Query(0, ge=0, description="Último id já recebido (X-Watermark da exportação anterior)"),
+    lacunas: str | None = Query(None, description="Ids que faltavam (X-Lacunas da exportação anterior), ex.: 3-3,10-12")
+):
+    # Stream Arrow IPC com produto e local; sincronização incremental pelo X-Watermark e X-Lacunas
+    if not PARQUET_DISPONIVEL:
+        raise HTTPException(status_code=400, detail="Exportação Arrow requer o pacote pyarrow instalado no servidor")
+    try:
+        intervalos = ler_lacunas(lacunas, desde_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return stream_movimentacoes_arrow(desde_id, intervalos)
 
 @app.get("/movimentacoes/filtrar", response_model=list[schemas.Movimentacao])
-def filtrar_movimentacoes(
-    tipo: str | None = Query(None, description="entrada ou saida"),
+async def filtrar_movimentacoes(
+    request: Request,
+    response: Response,
+    tipo: str | None = Query(None, description="entrada, saida ou ajuste"),
     produto_id: int | None = Query(None),
     local_id: int | None = Query(None),
     data_inicio: datetime | None = Query(None, description="Formato: YYYY-MM-DDTHH:MM:SS"),
     data_fim: datetime | None = Query(None, description="Formato: YYYY-MM-DDTHH:MM:SS"),
-    db: Session = Depends(get_db)
+    limit: int = Query(LIMITE_PADRAO, ge=1, le=LIMITE_MAXIMO),
+    cursor: str | None = Query(None, description="Cursor opaco da próxima página (header Link)"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    movimentacoes = crud.get_movimentacoes_filtradas(
+    movimentacoes, proximo_cursor = await crud_async.get_movimentacoes_filtradas(
         db,
         tipo=tipo,
         produto_id=produto_id,
         local_id=local_id,
         data_inicio=data_inicio,
-        data_fim=data_fim
+        data_fim=data_fim,
+        limit=limit,
+        cursor=cursor
     )
     if not movimentacoes:
         raise HTTPException(status_code=404, detail="Nenhuma movimentação encontrada com os filtros aplicados")
+    definir_link_proximo(request, response, proximo_cursor, limit)
     return movimentacoes
 
 @app.get("/relatorios/estoque-geral")
-def estoque_geral(db: Session = Depends(get_db)):
-    relatorio = crud.relatorio_estoque_geral(db)
-    return relatorio
+def estoque_geral(
+    formato: str | None = Query(None, alias="format", pattern="^(csv|ndjson)$", description="Exportação em streaming: csv ou ndjson"),
+    db: Session = Depends(get_db_leitura)
+):
+    if formato:
+        return stream_relatorio("estoque-geral", formato, crud.query_relatorio_estoque_geral)
+    return respostas.responder_relatorio(crud.query_relatorio_estoque_geral(db))
 
 @app.get("/relatorios/resumo-movimentacoes")
-def relatorio_resumo_movimentacoes_endpoint(db: Session = Depends(get_db)):
-    return crud.relatorio_resumo_movimentacoes(db)
+def relatorio_resumo_movimentacoes_endpoint(
+    data_inicio: date | None = Query(None, description="Formato: YYYY-MM-DD (opcional)"),
+    data_fim: date | None = Query(None, description="Formato: YYYY-MM-DD (opcional)"),
+    db: Session = Depends(get_db_leitura)
+):
+    return crud.relatorio_resumo_movimentacoes(db, data_inicio, data_fim)
 
 @app.get("/relatorios/estoque-produto/{produto_id}")
-def relatorio_estoque_produto(produto_id: int, db: Session = Depends(get_db)):
+def relatorio_estoque_produto(produto_id: int, db: Session = Depends(get_db_leitura)):
     return crud.relatorio_estoque_por_produto(db, produto_id)
 
 @app.get("/relatorios/movimentacoes")
 def relatorio_movimentacoes_periodo(
     data_inicio: date,
     data_fim: date,
-    db: Session = Depends(get_db)
+    formato: str | None = Query(None, alias="format", pattern="^(csv|ndjson)$", description="Exportação em streaming: csv ou ndjson"),
+    db: Session = Depends(get_db_leitura)
 ):
-    return crud.relatorio_movimentacoes_por_periodo(db, data_inicio, data_fim)
+    if formato:
+        return stream_relatorio(
+            "movimentacoes", formato, crud.query_relatorio_movimentacoes_por_periodo, data_inicio, data_fim
+        )
+    return respostas.responder_relatorio(crud.query_relatorio_movimentacoes_por_periodo(db, data_inicio, data_fim))
 
-@app.get("/relatorios/resumo-movimentacoes")
-def relatorio_resumo_movimentacoes(db: Session = Depends(get_db)):
-    return crud.relatorio_resumo_movimentacoes(db)
+@app.get("/relatorios/inventario-por-local")
+def inventario_por_local(
+    formato: str | None = Query(None, alias="format", pattern="^(csv|ndjson)$", description="Exportação em streaming: csv ou ndjson"),
+    db: Session = Depends(get_db_leitura)
+):
+    if formato:
+        return stream_relatorio("inventario-por-local", formato, crud.query_relatorio_inventario_por_local)
+    return respostas.responder_relatorio(crud.query_relatorio_inventario_por_local(db))
 
-@app.get("/relatorios/movimentacoes")
-def relatorio_movimentacoes_periodo(
-    data_inicio: date,
-    data_fim: date,
-    db: Session = Depends(get_db)
+@app.get("/relatorios/inventario-hierarquia")
+def inventario_hierarquia(
+    armazem: str | None = Query(None, description="Detalha os corredores do armazém"),
+    corredor: str | None = Query(None, description="Detalha os racks/níveis do corredor"),
+    rack_nivel: str | None = Query(None),
+    nivel: str | None = Query(None, pattern="^(armazem|corredor|rack_nivel)$", description="Nível mais detalhado retornado"),
+    db: Session = Depends(get_db_leitura)
 ):
+    return crud.relatorio_inventario_hierarquia(db, armazem, corredor, rack_nivel, nivel)
+
+# --- Relatórios em segundo plano (jobs) ---
+def _resposta_job(request: Request, job) -> schemas.RelatorioJob:
+    resposta = schemas.RelatorioJob.model_validate(job)
+    if job.status == "concluido":
+        resposta.arquivo = str(request.url_for("baixar_job_relatorio", job_id=job.id))
+    return resposta
+
+@app.post("/relatorios/jobs", response_model=schemas.RelatorioJob, status_code=202)
+def criar_job_relatorio(pedido: schemas.RelatorioJobCreate, request: Request, response: Response):
     try:
-        resultado = crud.relatorio_movimentacoes_por_periodo(db, data_inicio, data_fim)
-        return resultado
-    except Exception as e:
-        import traceback
-        traceback_str = traceback.format_exc()
-        return {"erro": str(e), "traceback": traceback_str}
-
-# --- Relatório estoque geral ---
-@app.get("/relatorios/estoque-geral")
-def estoque_geral(db: Session = Depends(get_db)):
-    return crud.relatorio_estoque_geral(db)
+        job = jobs_relatorios.fila.solicitar(
+            pedido.relatorio, pedido.formato, data_inicio=pedido.data_inicio, data_fim=pedido.data_fim
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    response.headers["Location"] = str(request.url_for("consultar_job_relatorio", job_id=job.id))
+    return _resposta_job(request, job)
 
-# --- Relatório estoque por produto ---
-@app.get("/relatorios/estoque-produto/{produto_id}")
-def estoque_produto(produto_id: int, db: Session = Depends(get_db)):
-    return crud.relatorio_estoque_por_produto(db, produto_id)
+@app.get("/relatorios/jobs/{job_id}", response_model=schemas.RelatorioJob)
+def consultar_job_relatorio(job_id: str, request: Request):
+    job = jobs_relatorios.fila.consultar(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    return _resposta_job(request, job)
 
-@app.get("/relatorios/inventario-por-local")
-def inventario_por_local(db: Session = Depends(get_db)):
-    return crud.relatorio_inventario_por_local(db)
+@app.get("/relatorios/jobs/{job_id}/arquivo")
+def baixar_job_relatorio(job_id: str):
+    job = jobs_relatorios.fila.consultar(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado ou expirado")
+    if job.status != "concluido":
+        raise HTTPException(status_code=409, detail=f"Relatório ainda não disponível (status: {job.status})")
+    return FileResponse(jobs_relatorios.fila.caminho(job), media_type=job.media_type, filename=job.nome_arquivo)
+
+# --- Estoque em uma data (snapshot mais próximo + movimentações do intervalo) ---
+@app.get("/relatorios/estoque-em/{data}")
+def relatorio_estoque_em(
+    data: date,
+    produto_id: int | None = Query(None),
+    local_id: int | None = Query(None),
+    db: Session = Depends(get_db_leitura)
+):
+    return crud.relatorio_estoque_em(db, data, produto_id=produto_id, local_id=local_id)
 
 # --- Relatórios de movimentações específicas
 @app.get("/relatorios/operacoes")
-def relatorio_operacoes_endpoint(db: Session = Depends(get_db)):
-    return crud.relatorio_operacoes(db)
+def relatorio_operacoes_endpoint(
+    formato: str | None = Query(None, alias="format", pattern="^(csv|ndjson)$", description="Exportação em streaming: csv ou ndjson"),
+    db: Session = Depends(get_db_leitura)
+):
+    if formato:
+        return stream_relatorio("operacoes", formato, crud.query_relatorio_operacoes)
+    return respostas.responder_relatorio(crud.query_relatorio_operacoes(db))
+
+# --- Análises de estoque (ABC, giro, cobertura) ---
+def _analise():
+    # NumPy carregado na primeira análise, não ao subir a API
+    import analise_estoque
+    return analise_estoque
+
+@app.get("/analises/estoque")
+def analise_estoque_endpoint(
+    dias: int = Query(90, ge=1, le=365, description="Período analisado, terminando hoje"),
+    classe: str | None = Query(None, pattern="^[ABC]$", description="Classe ABC"),
+    cobertura_maxima: float | None = Query(None, ge=0, description="Só SKUs com até N dias de cobertura"),
+    ordenar: str = Query("saidas", pattern="^(saidas|giro|cobertura)$"),
+    limit: int = Query(100, ge=1, le=LIMITE_MAXIMO),
+    db: Session = Depends(get_db_leitura)
+):
+    return respostas.RespostaJSONRapida(
+        _analise().listar(db, dias, classe=classe, cobertura_maxima=cobertura_maxima, ordenar=ordenar, limite=limit)
+    )
+
+@app.get("/analises/abc")
+def analise_abc_endpoint(
+    dias: int = Query(90, ge=1, le=365, description="Período analisado, terminando hoje"),
+    db: Session = Depends(get_db_leitura)
+):
+    return _analise().resumo_abc(db, dias)
 
 # --- QR Code Local ---
+def _qrcode():
+    # qrcode e PIL carregados na primeira etiqueta, não ao subir a API
+    import qrcode_utils
+    return qrcode_utils
+
+
+def _obter_catalogo(cache, db: Session, campo: str, valor):
+    # Um cadastro recém-feito pode ainda não ter chegado à réplica: na falta, confere no primário
+    registro = cache.obter(db, campo, valor)
+    if registro is None and db.get_bind() is not engine:
+        with SessionLocal() as primario:
+            registro = cache.obter(primario, campo, valor)
+    return registro
+
 @app.get("/qrcode/local/{local_id}")
-def endpoint_qrcode_local(local_id: int, db: Session = Depends(get_db)):
-    local = db.query(models.Local).filter(models.Local.id == local_id).first()
+def endpoint_qrcode_local(local_id: int, request: Request, db: Session = Depends(get_db_leitura)):
+    local = _obter_catalogo(cache_catalogo.locais, db, "id", local_id)
     if not local:
         raise HTTPException(status_code=404, detail="Local não encontrado")
-    # Gerar etiqueta QR Code usando a função correta
-    return gerar_etiqueta_qr_rack(local.codigo, local.descricao, getattr(local, "rack_nivel", ""), local.id)
+    rack_nivel = getattr(local, "rack_nivel", "")
+    # Gerar etiqueta QR Code usando a função correta (com cache e ETag)
+    chave = chave_etiqueta("rack", local.codigo, local.descricao, rack_nivel, local.id)
+    return responder_etiqueta(
+        request, chave,
+        lambda: _qrcode().renderizar_etiqueta_rack(local.codigo, local.descricao, rack_nivel, local.id)
+    )
 
 @app.get("/qrcode/produto/{produto_id}")
-def endpoint_qrcode_produto(produto_id: int, db: Session = Depends(get_db)):
-    produto = db.query(models.Produto).filter(models.Produto.id == produto_id).first()
+def endpoint_qrcode_produto(produto_id: int, request: Request, db: Session = Depends(get_db_leitura)):
+    produto = _obter_catalogo(cache_catalogo.produtos, db, "id", produto_id)
     if not produto:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
     
-    # Usa a função de etiqueta de produto (com SKU, descrição e ID)
-    return gerar_qr_code_produto(produto)
+    # Usa a etiqueta de produto (com SKU, descrição e ID), em cache pelo conteúdo
+    chave = chave_etiqueta("produto", produto.id, produto.sku, produto.descricao, produto.lote, produto.validade)
+    return responder_etiqueta(request, chave, lambda: _qrcode().renderizar_etiqueta_produto(produto))
+
+# --- Etiquetas em lote (ZIP em streaming ou PDF) ---
+@app.post("/qrcode/locais/lote")
+def endpoint_qrcode_locais_lote(filtro: schemas.EtiquetasLocaisLote, db: Session = Depends(get_db_leitura)):
+    if not (filtro.ids or filtro.armazem or filtro.corredor):
+        raise HTTPException(status_code=400, detail="Informe ids, armazem ou corredor")
+    locais = crud.get_locais_para_etiquetas(db, filtro.ids, filtro.armazem, filtro.corredor)
+    if not locais:
+        raise HTTPException(status_code=404, detail="Nenhum local encontrado")
+    return responder_lote([item_local(l) for l in locais], filtro.formato, "etiquetas_locais")
+
+@app.post("/qrcode/produtos/lote")
+def endpoint_qrcode_produtos_lote(filtro: schemas.EtiquetasProdutosLote, db: Session = Depends(get_db_leitura)):
+    if not (filtro.ids or filtro.prefixo_sku):
+        raise HTTPException(status_code=400, detail="Informe ids ou prefixo_sku")
+    produtos = crud.get_produtos_para_etiquetas(db, filtro.ids, filtro.prefixo_sku)
+    if not produtos:
+        raise HTTPException(status_code=404, detail="Nenhum produto encontrado")
+    return responder_lote([item_produto(p) for p in produtos], filtro.formato, "etiquetas_produtos")
+
+
+# --- Rotas duplicadas ---
+def _verificar_rotas_duplicadas(app: FastAPI):
+    # Com o mesmo método e caminho, só a primeira rota registrada responde
+    vistas = set()
+    for rota in app.routes:
+        for metodo in getattr(rota, "methods", None) or ():
+            chave = (metodo, rota.path)
+            if chave in vistas:
+                raise RuntimeError(f"Rota registrada duas vezes: {metodo} {rota.path}")
+            vistas.add(chave)
 
+_verificar_rotas_duplicadas(app)
+marcar_inicializacao("import", time.perf_counter() - _INICIO_IMPORT)
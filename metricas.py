@@ -0,0 +1,292 @@
+# metricas.py
+"""
+Métricas no formato de texto do Prometheus, expostas em GET /metrics.
+
+- latência por rota (middleware ASGI)
+- queries SQL e tempo de SQL por requisição (eventos do SQLAlchemy)
+- espera no checkout do pool de conexões e ocupação do pool
+- tempo de renderização das etiquetas
+- tempo de inicialização do processo (import até pronto)
+- atraso da réplica de leitura e leituras desviadas para o primário
+
+Os valores ficam na memória do processo: com vários workers do uvicorn,
+cada um expõe os seus (o Prometheus agrega pelo label `instance`).
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+
+from sqlalchemy import event
+
+# Limites dos buckets (segundos)
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_ESPERA_POOL = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+BUCKETS_QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+# --- Tipos de métrica ---
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _formatar_labels(nomes, valores, extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, labels: tuple = ()):
+        self.nome, self.ajuda, self.labels = nome, ajuda, labels
+        self._valores: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valor: float = 1, **labels):
+        chave = tuple(labels.get(l, "") for l in self.labels)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def linhas(self):
+        with self._lock:
+            itens = list(self._valores.items())
+        for chave, valor in itens:
+            yield f"{self.nome}{_formatar_labels(self.labels, chave)} {valor}"
+
+class Medidor:
+    """Gauge calculado na hora da coleta, a partir de uma função."""
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, labels: tuple, coletar):
+        self.nome, self.ajuda, self.labels = nome, ajuda, labels
+        self._coletar = coletar
+
+    def linhas(self):
+        for chave, valor in self._coletar():
+            yield f"{self.nome}{_formatar_labels(self.labels, chave)} {valor}"
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, labels: tuple = (), buckets: tuple = BUCKETS_LATENCIA):
+        self.nome, self.ajuda, self.labels = nome, ajuda, labels
+        self.buckets = tuple(buckets)
+        self._series: dict[tuple, list] = {}  # chave -> [contagens por bucket..., soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **labels):
+        chave = tuple(labels.get(l, "") for l in self.labels)
+        posicao = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [0] * (len(self.buckets) + 2)
+            if posicao < len(self.buckets):
+                serie[posicao] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    def linhas(self):
+        with self._lock:
+            itens = [(chave, list(serie)) for chave, serie in self._series.items()]
+        for chave, serie in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, serie):
+                acumulado += contagem
+                yield self._linha_bucket(chave, limite, acumulado)
+            yield self._linha_bucket(chave, "+Inf", serie[-1])
+            yield f"{self.nome}_sum{_formatar_labels(self.labels, chave)} {serie[-2]}"
+            yield f"{self.nome}_count{_formatar_labels(self.labels, chave)} {serie[-1]}"
+
+    def _linha_bucket(self, chave, limite, contagem) -> str:
+        labels = _formatar_labels(self.labels, chave, f'le="{limite}"')
+        return f"{self.nome}_bucket{labels} {contagem}"
+
+
+def cronometrar(histograma: Histograma, **labels):
+    """Decorator: observa no histograma a duração de cada chamada da função."""
+    def decorar(funcao):
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                histograma.observar(time.perf_counter() - inicio, **labels)
+        return medida
+    return decorar
+
+
+_registro = []
+
+def registrar(metrica):
+    _registro.append(metrica)
+    return metrica
+
+def exportar() -> str:
+    """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+    saida = []
+    for metrica in _registro:
+        saida.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+        saida.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+        saida.extend(metrica.linhas())
+    return "\n".join(saida) + "\n"
+
+
+# --- Métricas da aplicação ---
+REQUISICAO_SEGUNDOS = registrar(Histograma(
+    "wms_http_requisicao_segundos", "Latência das requisições HTTP por rota",
+    ("metodo", "rota", "status")
+))
+SQL_QUERIES_REQUISICAO = registrar(Histograma(
+    "wms_sql_queries_por_requisicao", "Quantidade de comandos SQL por requisição",
+    ("rota",), BUCKETS_QUERIES
+))
+SQL_SEGUNDOS_REQUISICAO = registrar(Histograma(
+    "wms_sql_segundos_por_requisicao", "Tempo total em SQL por requisição", ("rota",)
+))
+SQL_QUERIES = registrar(Contador(
+    "wms_sql_queries_total", "Comandos SQL executados", ("engine",)
+))
+SQL_SEGUNDOS = registrar(Contador(
+    "wms_sql_segundos_total", "Tempo acumulado em SQL", ("engine",)
+))
+POOL_ESPERA_SEGUNDOS = registrar(Histograma(
+    "wms_pool_espera_checkout_segundos", "Espera para obter uma conexão do pool",
+    ("engine",), BUCKETS_ESPERA_POOL
+))
+ETIQUETA_SEGUNDOS = registrar(Histograma(
+    "wms_etiqueta_renderizacao_segundos", "Tempo de renderização de uma etiqueta", ("tipo",)
+))
+
+
+# --- SQL por requisição ---
+# Lista [queries, segundos] da requisição corrente; os eventos do SQLAlchemy
+# somam nela (o contexto é copiado para o threadpool e para o greenlet do asyncpg)
+_sql_requisicao: ContextVar[list | None] = ContextVar("_sql_requisicao", default=None)
+
+_engines = {}
+
+def instrumentar_engine(engine, nome: str):
+    """Registra os eventos de SQL e a medição de espera no pool de um engine síncrono."""
+    if nome in _engines:
+        return
+    _engines[nome] = engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get("_metricas_inicio")
+        if not inicios:
+            return
+        duracao = time.perf_counter() - inicios.pop()
+        SQL_QUERIES.inc(engine=nome)
+        SQL_SEGUNDOS.inc(duracao, engine=nome)
+        acumulado = _sql_requisicao.get()
+        if acumulado is not None:
+            acumulado[0] += 1
+            acumulado[1] += duracao
+
+    # O pool não tem evento "antes do checkout": a espera é medida em volta de
+    # Engine.raw_connection, o método público pelo qual cada Connection obtém a
+    # sua do pool (tests/test_metricas.py confere que a medição acontece)
+    obter_original = engine.raw_connection
+
+    @wraps(obter_original)
+    def raw_connection_medida(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return obter_original(*args, **kwargs)
+        finally:
+            POOL_ESPERA_SEGUNDOS.observar(time.perf_counter() - inicio, engine=nome)
+
+    engine.raw_connection = raw_connection_medida
+
+def _estado_pools():
+    for nome, engine in list(_engines.items()):
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            continue
+        tamanho, em_uso = pool.size(), pool.checkedout()
+        yield (nome, "tamanho"), tamanho
+        yield (nome, "em_uso"), em_uso
+        yield (nome, "ociosas"), pool.checkedin()
+        yield (nome, "overflow"), max(pool.overflow(), 0)
+        yield (nome, "saturacao"), round(em_uso / tamanho, 4) if tamanho else 0
+
+registrar(Medidor(
+    "wms_pool_conexoes", "Estado do pool de conexões (saturacao = em uso / tamanho; acima de 1 usa overflow)",
+    ("engine", "estado"), _estado_pools
+))
+
+
+# --- Inicialização ---
+# etapa -> segundos desde o início do import de main (import, pronto)
+_inicializacao: dict[str, float] = {}
+
+def marcar_inicializacao(etapa: str, segundos: float):
+    _inicializacao[etapa] = round(segundos, 4)
+
+registrar(Medidor(
+    "wms_inicializacao_segundos", "Tempo desde o início do import da API até cada etapa da inicialização",
+    ("etapa",), lambda: [((etapa,), segundos) for etapa, segundos in list(_inicializacao.items())]
+))
+
+
+# --- Réplica de leitura ---
+# Última medição do atraso da réplica (database._verificar_replica, chamada por engine_leitura)
+_replica: dict[str, float] = {}
+
+def marcar_atraso_replica(segundos: float | None):
+    if segundos is None:
+        _replica.pop("atraso", None)
+    else:
+        _replica["atraso"] = round(segundos, 3)
+
+registrar(Medidor(
+    "wms_replica_atraso_segundos", "Atraso da réplica de leitura na última verificação",
+    (), lambda: [((), _replica["atraso"])] if "atraso" in _replica else []
+))
+REPLICA_DESVIOS = registrar(Contador(
+    "wms_replica_desvios_total", "Sessões de leitura enviadas ao primário", ("motivo",)
+))
+
+
+# --- Middleware ASGI ---
+class MiddlewareMetricas:
+    """Mede cada requisição HTTP até o último byte da resposta (inclui streaming)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        acumulado = [0, 0.0]
+        token = _sql_requisicao.set(acumulado)
+        inicio = time.perf_counter()
+
+        async def send_medido(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, send_medido)
+        finally:
+            _sql_requisicao.reset(token)
+            duracao = time.perf_counter() - inicio
+            # Usa o molde da rota (/produtos/{id}) para não criar uma série por URL
+            rota = getattr(scope.get("route"), "path", None) or "nao_encontrada"
+            REQUISICAO_SEGUNDOS.observar(duracao, metodo=scope["method"], rota=rota, status=status)
+            SQL_QUERIES_REQUISICAO.observar(acumulado[0], rota=rota)
+            SQL_SEGUNDOS_REQUISICAO.observar(acumulado[1], rota=rota)
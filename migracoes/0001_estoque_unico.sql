@@ -0,0 +1,17 @@
+-- Restrição única de estoque por (produto_id, local_id), exigida pelo
+-- ON CONFLICT de create_movimentacao e popular_estoque.
+
+-- Consolida saldos duplicados no registro mais antigo antes de criar a restrição
+UPDATE estoque
+SET quantidade = (
+    SELECT sum(d.quantidade) FROM estoque d
+    WHERE d.produto_id = estoque.produto_id AND d.local_id = estoque.local_id
+)
+WHERE id IN (
+    SELECT min(id) FROM estoque GROUP BY produto_id, local_id HAVING count(*) > 1
+);
+
+DELETE FROM estoque
+WHERE id NOT IN (SELECT min(id) FROM estoque GROUP BY produto_id, local_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_estoque_produto_local ON estoque (produto_id, local_id);
@@ -0,0 +1,12 @@
+-- Índices compostos das consultas quentes (ver models.py)
+
+-- Estoque por local (/produtos_por_local); por produto já é atendido por uq_estoque_produto_local
+CREATE INDEX IF NOT EXISTS ix_estoque_local_id ON estoque (local_id);
+
+-- Paginação keyset de /movimentacoes e filtros por período
+CREATE INDEX IF NOT EXISTS ix_movimentacoes_data_id ON movimentacoes (data_movimentacao, id);
+
+-- Filtros de get_movimentacoes_filtradas, já na ordem da paginação
+CREATE INDEX IF NOT EXISTS ix_movimentacoes_produto_data ON movimentacoes (produto_id, data_movimentacao, id);
+CREATE INDEX IF NOT EXISTS ix_movimentacoes_local_data ON movimentacoes (local_id, data_movimentacao, id);
+CREATE INDEX IF NOT EXISTS ix_movimentacoes_tipo_data ON movimentacoes (tipo, data_movimentacao, id);
@@ -0,0 +1,22 @@
+-- Resumo diário de movimentações (ver models.MovimentacaoResumoDiario)
+CREATE TABLE IF NOT EXISTS movimentacoes_resumo_diario (
+    produto_id INTEGER NOT NULL REFERENCES produtos (id),
+    local_id INTEGER NOT NULL REFERENCES locais (id),
+    tipo VARCHAR NOT NULL,
+    dia DATE NOT NULL,
+    quantidade_total BIGINT NOT NULL DEFAULT 0,
+    movimentacoes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (produto_id, local_id, tipo, dia)
+);
+
+CREATE INDEX IF NOT EXISTS ix_movimentacoes_resumo_dia ON movimentacoes_resumo_diario (dia);
+
+-- Carga inicial a partir do histórico. Recalcula do zero: a tabela pode já
+-- ter sido criada vazia pelo create_all e recebido movimentações novas
+DELETE FROM movimentacoes_resumo_diario;
+
+INSERT INTO movimentacoes_resumo_diario (produto_id, local_id, tipo, dia, quantidade_total, movimentacoes)
+SELECT produto_id, local_id, tipo, data_movimentacao, SUM(quantidade), COUNT(*)
+FROM movimentacoes
+WHERE produto_id IS NOT NULL AND local_id IS NOT NULL
+GROUP BY produto_id, local_id, tipo, data_movimentacao;
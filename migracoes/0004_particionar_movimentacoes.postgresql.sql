@@ -0,0 +1,69 @@
+-- Particionamento mensal de movimentacoes por data_movimentacao (ver particoes.py).
+-- A tabela é recriada como particionada e os dados são copiados numa única
+-- transação: em bases grandes, aplique numa janela de manutenção.
+
+ALTER TABLE movimentacoes RENAME TO movimentacoes_legado;
+
+-- A chave primária de uma tabela particionada precisa conter a coluna de partição
+CREATE TABLE movimentacoes (
+    id INTEGER NOT NULL DEFAULT nextval('movimentacoes_id_seq'),
+    tipo VARCHAR NOT NULL,
+    quantidade INTEGER NOT NULL,
+    produto_id INTEGER REFERENCES produtos (id),
+    local_id INTEGER REFERENCES locais (id),
+    data_movimentacao DATE NOT NULL,
+    PRIMARY KEY (id, data_movimentacao)
+) PARTITION BY RANGE (data_movimentacao);
+
+-- Recebe datas sem partição mensal; criar_particoes_movimentacoes esvazia o mês ao criá-lo
+CREATE TABLE movimentacoes_padrao PARTITION OF movimentacoes DEFAULT;
+
+-- Cria as partições mensais (movimentacoes_AAAA_MM) que faltam entre as duas datas.
+-- Linhas do mês que estiverem na partição padrão são movidas para a nova partição.
+CREATE OR REPLACE FUNCTION criar_particoes_movimentacoes(inicio DATE, fim DATE) RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    mes DATE := date_trunc('month', inicio)::date;
+    proximo DATE;
+    nome TEXT;
+    criadas INTEGER := 0;
+BEGIN
+    -- Vários workers podem chamar ao subir: um por vez
+    PERFORM pg_advisory_xact_lock(hashtext('criar_particoes_movimentacoes'));
+    WHILE mes <= fim LOOP
+        proximo := (mes + interval '1 month')::date;
+        nome := 'movimentacoes_' || to_char(mes, 'YYYY_MM');
+        IF to_regclass(nome) IS NULL THEN
+            EXECUTE 'CREATE TABLE ' || quote_ident(nome)
+                || ' (LIKE movimentacoes INCLUDING DEFAULTS INCLUDING CONSTRAINTS)';
+            EXECUTE 'WITH movidas AS (DELETE FROM movimentacoes_padrao'
+                || ' WHERE data_movimentacao >= $1 AND data_movimentacao < $2 RETURNING *)'
+                || ' INSERT INTO ' || quote_ident(nome) || ' SELECT * FROM movidas'
+                USING mes, proximo;
+            EXECUTE 'ALTER TABLE movimentacoes ATTACH PARTITION ' || quote_ident(nome)
+                || ' FOR VALUES FROM (' || quote_literal(mes) || ') TO (' || quote_literal(proximo) || ')';
+            criadas := criadas + 1;
+        END IF;
+        mes := proximo;
+    END LOOP;
+    RETURN criadas;
+END;
+$$;
+
+-- Meses do histórico existente e os próximos três
+SELECT criar_particoes_movimentacoes(
+    COALESCE((SELECT MIN(data_movimentacao) FROM movimentacoes_legado), CURRENT_DATE),
+    (CURRENT_DATE + interval '3 months')::date
+);
+
+INSERT INTO movimentacoes (id, tipo, quantidade, produto_id, local_id, data_movimentacao)
+SELECT id, tipo, quantidade, produto_id, local_id, data_movimentacao FROM movimentacoes_legado;
+
+ALTER SEQUENCE movimentacoes_id_seq OWNED BY movimentacoes.id;
+DROP TABLE movimentacoes_legado;
+
+-- Índices da 0002, agora definidos na tabela particionada (replicados em cada partição)
+CREATE INDEX ix_movimentacoes_data_id ON movimentacoes (data_movimentacao, id);
+CREATE INDEX ix_movimentacoes_produto_data ON movimentacoes (produto_id, data_movimentacao, id);
+CREATE INDEX ix_movimentacoes_local_data ON movimentacoes (local_id, data_movimentacao, id);
+CREATE INDEX ix_movimentacoes_tipo_data ON movimentacoes (tipo, data_movimentacao, id);
@@ -0,0 +1,8 @@
+-- Saldos de estoque ao fim de cada dia (ver models.EstoqueSnapshot e snapshots_estoque.py)
+CREATE TABLE IF NOT EXISTS estoque_snapshots (
+    dia DATE NOT NULL,
+    produto_id INTEGER NOT NULL REFERENCES produtos (id) ON DELETE CASCADE,
+    local_id INTEGER NOT NULL REFERENCES locais (id) ON DELETE CASCADE,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, produto_id, local_id)
+);
@@ -0,0 +1,19 @@
+-- Busca de produtos (/produtos/busca, crud.buscar_produtos)
+
+-- Prefixo do SKU: LIKE 'abc...' vira um intervalo do índice, já na ordem do resultado
+CREATE INDEX IF NOT EXISTS ix_produtos_sku_prefixo ON produtos ((lower(sku) COLLATE "C"));
+
+-- Trecho e semelhança por trigramas (pg_trgm). Se o servidor não tiver a
+-- extensão, a busca usa o índice em memória (busca_produtos.py); depois de
+-- instalá-la, execute este bloco de novo
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS ix_produtos_sku_trgm ON produtos USING gin (lower(sku) gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS ix_produtos_descricao_trgm ON produtos USING gin (lower(descricao) gin_trgm_ops);
+    ELSE
+        RAISE NOTICE 'pg_trgm indisponível: /produtos/busca usa o índice em memória';
+    END IF;
+END
+$$;
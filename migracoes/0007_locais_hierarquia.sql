@@ -0,0 +1,2 @@
+-- Filtros e agrupamento do inventário por armazém > corredor > rack/nível (ver crud.relatorio_inventario_hierarquia)
+CREATE INDEX IF NOT EXISTS ix_locais_hierarquia ON locais (armazem, corredor, rack_nivel);
@@ -0,0 +1,30 @@
+-- Saldos gravados direto no estoque (POST /estoque, /popular_estoque) antes
+-- das movimentações de ajuste: a diferença entre o saldo atual e o que o
+-- resumo diário explica vira um "ajuste" no primeiro dia conhecido do par
+-- (a primeira movimentação ou atualizado_em), para /relatorios/estoque-em
+-- não mostrar esse saldo em datas anteriores
+CREATE TEMP TABLE ajustes_0008 AS
+SELECT e.produto_id, e.local_id,
+       COALESCE(e.quantidade, 0) - COALESCE(r.saldo, 0) AS quantidade,
+       LEAST(r.primeiro_dia, CAST(COALESCE(e.atualizado_em, now()) AS DATE)) AS dia
+FROM estoque e
+LEFT JOIN (
+    SELECT produto_id, local_id,
+           SUM(CASE WHEN tipo = 'saida' THEN -quantidade_total ELSE quantidade_total END) AS saldo,
+           MIN(dia) AS primeiro_dia
+    FROM movimentacoes_resumo_diario
+    GROUP BY produto_id, local_id
+) r ON r.produto_id = e.produto_id AND r.local_id = e.local_id
+WHERE e.produto_id IS NOT NULL AND e.local_id IS NOT NULL
+  AND COALESCE(e.quantidade, 0) - COALESCE(r.saldo, 0) <> 0;
+
+INSERT INTO movimentacoes (tipo, quantidade, produto_id, local_id, data_movimentacao)
+SELECT 'ajuste', quantidade, produto_id, local_id, dia FROM ajustes_0008;
+
+INSERT INTO movimentacoes_resumo_diario (produto_id, local_id, tipo, dia, quantidade_total, movimentacoes)
+SELECT produto_id, local_id, 'ajuste', dia, quantidade, 1 FROM ajustes_0008
+ON CONFLICT (produto_id, local_id, tipo, dia) DO UPDATE SET
+    quantidade_total = movimentacoes_resumo_diario.quantidade_total + EXCLUDED.quantidade_total,
+    movimentacoes = movimentacoes_resumo_diario.movimentacoes + EXCLUDED.movimentacoes;
+
+DROP TABLE ajustes_0008;
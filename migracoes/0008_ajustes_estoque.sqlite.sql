@@ -0,0 +1,31 @@
+-- Mesmo ajuste de 0008_ajustes_estoque.postgresql.sql, com as funções de data do SQLite
+CREATE TEMP TABLE ajustes_0008 AS
+SELECT e.produto_id, e.local_id,
+       COALESCE(e.quantidade, 0) - COALESCE(r.saldo, 0) AS quantidade,
+       CASE
+           WHEN r.primeiro_dia IS NOT NULL AND r.primeiro_dia < COALESCE(date(e.atualizado_em), date('now'))
+           THEN r.primeiro_dia
+           ELSE COALESCE(date(e.atualizado_em), date('now'))
+       END AS dia
+FROM estoque e
+LEFT JOIN (
+    SELECT produto_id, local_id,
+           SUM(CASE WHEN tipo = 'saida' THEN -quantidade_total ELSE quantidade_total END) AS saldo,
+           MIN(dia) AS primeiro_dia
+    FROM movimentacoes_resumo_diario
+    GROUP BY produto_id, local_id
+) r ON r.produto_id = e.produto_id AND r.local_id = e.local_id
+WHERE e.produto_id IS NOT NULL AND e.local_id IS NOT NULL
+  AND COALESCE(e.quantidade, 0) - COALESCE(r.saldo, 0) <> 0;
+
+INSERT INTO movimentacoes (tipo, quantidade, produto_id, local_id, data_movimentacao)
+SELECT 'ajuste', quantidade, produto_id, local_id, dia FROM ajustes_0008;
+
+-- WHERE true: o SQLite exige para não confundir ON CONFLICT com um JOIN
+INSERT INTO movimentacoes_resumo_diario (produto_id, local_id, tipo, dia, quantidade_total, movimentacoes)
+SELECT produto_id, local_id, 'ajuste', dia, quantidade, 1 FROM ajustes_0008 WHERE true
+ON CONFLICT (produto_id, local_id, tipo, dia) DO UPDATE SET
+    quantidade_total = movimentacoes_resumo_diario.quantidade_total + excluded.quantidade_total,
+    movimentacoes = movimentacoes_resumo_diario.movimentacoes + excluded.movimentacoes;
+
+DROP TABLE ajustes_0008;
@@ -0,0 +1,90 @@
+# migracoes/__init__.py
+"""
+Migrações versionadas do schema.
+
+Cada arquivo `NNNN_descricao.sql` desta pasta é aplicado uma única vez, em
+ordem numérica, e registrado na tabela `schema_migracoes`. Arquivos
+`NNNN_descricao.postgresql.sql` só são aplicados em PostgreSQL, e
+`NNNN_descricao.sqlite.sql` só em SQLite.
+
+As tabelas dos modelos (models.py) são criadas antes das migrações; a API
+não cria nem altera o schema ao subir (exceto com SCHEMA_AUTOMATICO=true).
+
+Uso (a partir da raiz do projeto):
+    python -m migracoes            # cria as tabelas e aplica as pendentes
+    python -m migracoes --listar   # mostra aplicadas e pendentes
+"""
+import re
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+
+PASTA = Path(__file__).parent
+PADRAO_ARQUIVO = re.compile(r"^(\d{4})_(\w+?)(?:\.(postgresql|sqlite))?\.sql$")
+
+
+def listar_arquivos(dialeto: str):
+    """Retorna [(versao, caminho)] em ordem, filtrando os específicos de outro banco."""
+    arquivos = []
+    for caminho in sorted(PASTA.glob("*.sql")):
+        m = PADRAO_ARQUIVO.match(caminho.name)
+        if not m:
+            continue
+        if m.group(3) and m.group(3) != dialeto:
+            continue
+        arquivos.append((m.group(1), caminho))
+    return arquivos
+
+def _criar_tabela_controle(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migracoes ("
+        " versao VARCHAR(10) PRIMARY KEY,"
+        " arquivo VARCHAR(255) NOT NULL,"
+        " aplicada_em TIMESTAMP NOT NULL)"
+    ))
+
+def versoes_aplicadas(conn) -> set[str]:
+    _criar_tabela_controle(conn)
+    return {v for (v,) in conn.execute(text("SELECT versao FROM schema_migracoes"))}
+
+def _executar_script(conn, sql: str):
+    if conn.dialect.name == "postgresql":
+        # psycopg2 aceita vários comandos (inclusive blocos $$ ... $$) numa execução
+        conn.exec_driver_sql(sql)
+    else:
+        # SQLite executa um comando por vez; comentários saem antes da divisão
+        sem_comentarios = "\n".join(
+            linha for linha in sql.splitlines() if not linha.strip().startswith("--")
+        )
+        for comando in sem_comentarios.split(";"):
+            if comando.strip():
+                conn.exec_driver_sql(comando)
+
+def aplicar(engine, verbose: bool = True) -> list[str]:
+    """Aplica as migrações pendentes, cada uma na sua transação. Retorna as versões aplicadas."""
+    aplicadas = []
+    with engine.begin() as conn:
+        ja_aplicadas = versoes_aplicadas(conn)
+
+    for versao, caminho in listar_arquivos(engine.dialect.name):
+        if versao in ja_aplicadas:
+            continue
+        with engine.begin() as conn:
+            _executar_script(conn, caminho.read_text(encoding="utf-8"))
+            conn.execute(
+                text("INSERT INTO schema_migracoes (versao, arquivo, aplicada_em) VALUES (:v, :a, :d)"),
+                {"v": versao, "a": caminho.name, "d": datetime.utcnow()}
+            )
+        aplicadas.append(versao)
+        if verbose:
+            print(f"Migração aplicada: {caminho.name}")
+    return aplicadas
+
+def preparar_schema(engine, verbose: bool = True) -> list[str]:
+    """Cria as tabelas que faltam (Base.metadata) e aplica as migrações pendentes."""
+    import models  # registra os modelos em Base.metadata
+    from database import Base
+
+    Base.metadata.create_all(bind=engine)
+    return aplicar(engine, verbose)
@@ -0,0 +1,18 @@
+# migracoes/__main__.py
+import argparse
+
+from database import engine
+from migracoes import listar_arquivos, preparar_schema, versoes_aplicadas
+
+parser = argparse.ArgumentParser(prog="python -m migracoes", description="Aplica as migrações versionadas do schema.")
+parser.add_argument("--listar", action="store_true", help="apenas lista migrações aplicadas e pendentes")
+args = parser.parse_args()
+
+if args.listar:
+    with engine.begin() as conn:
+        aplicadas = versoes_aplicadas(conn)
+    for versao, caminho in listar_arquivos(engine.dialect.name):
+        print(f"[{'x' if versao in aplicadas else ' '}] {caminho.name}")
+else:
+    if not preparar_schema(engine):
+        print("Nenhuma migração pendente.")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Date, ForeignKey, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
 from database import Base
@@ -14,6 +14,10 @@ class Produto(Base):
 
 class Local(Base):
     __tablename__ = "locais"
+    __table_args__ = (
+        # Filtros e agrupamento do inventário por hierarquia
+        Index("ix_locais_hierarquia", "armazem", "corredor", "rack_nivel"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     codigo = Column(String(50), unique=True, nullable=False)
     armazem = Column(String(50))
@@ -23,6 +27,11 @@ class Local(Base):
 
 class Estoque(Base):
     __tablename__ = "estoque"
+    __table_args__ = (
+        # Um único saldo por produto/local; também serve ao ON CONFLICT das movimentações
+        UniqueConstraint("produto_id", "local_id", name="uq_estoque_produto_local"),
+        Index("ix_estoque_local_id", "local_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     produto_id = Column(Integer, ForeignKey("produtos.id", ondelete="CASCADE"))
     local_id = Column(Integer, ForeignKey("locais.id", ondelete="CASCADE"))
@@ -33,14 +42,56 @@ class Estoque(Base):
     local = relationship("Local")
 
 class Movimentacao(Base):
+    # No PostgreSQL a tabela é particionada por mês em data_movimentacao
+    # (migração 0004, particoes.py), com chave primária (id, data_movimentacao)
     __tablename__ = "movimentacoes"
+    __table_args__ = (
+        # Chave da paginação keyset em /movimentacoes e filtros por período
+        Index("ix_movimentacoes_data_id", "data_movimentacao", "id"),
+        # Filtros de get_movimentacoes_filtradas, já na ordem da paginação
+        Index("ix_movimentacoes_produto_data", "produto_id", "data_movimentacao", "id"),
+        Index("ix_movimentacoes_local_data", "local_id", "data_movimentacao", "id"),
+        Index("ix_movimentacoes_tipo_data", "tipo", "data_movimentacao", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    tipo = Column(String, nullable=False)  # "entrada" ou "saida"
+    tipo = Column(String, nullable=False)  # "entrada", "saida" ou "ajuste" (escrita direta no saldo, quantidade com sinal)
     quantidade = Column(Integer, nullable=False)
     produto_id = Column(Integer, ForeignKey("produtos.id"))
     local_id = Column(Integer, ForeignKey("locais.id"))
-    data_movimentacao = Column(Date, nullable=False)
+    data_movimentacao = Column(Date, nullable=False, default=datetime.utcnow)
 
     produto = relationship("Produto")
-    local = relationship("Local")
\ No newline at end of file
+    local = relationship("Local")
+
+class MovimentacaoResumoDiario(Base):
+    """
+    Totais de movimentação por produto, local, tipo e dia, mantidos na mesma
+    transação de cada movimentação. Os resumos leem daqui em vez de agrupar
+    todo o histórico de `movimentacoes`.
+    """
+    __tablename__ = "movimentacoes_resumo_diario"
+    __table_args__ = (
+        # Resumos limitados por período
+        Index("ix_movimentacoes_resumo_dia", "dia"),
+    )
+
+    produto_id = Column(Integer, ForeignKey("produtos.id"), primary_key=True)
+    local_id = Column(Integer, ForeignKey("locais.id"), primary_key=True)
+    tipo = Column(String, primary_key=True)
+    dia = Column(Date, primary_key=True)
+    quantidade_total = Column(BigInteger, nullable=False, default=0)
+    movimentacoes = Column(Integer, nullable=False, default=0)
+
+class EstoqueSnapshot(Base):
+    """
+    Saldo de cada produto/local ao fim de um dia (snapshots_estoque.py). O
+    estoque numa data é reconstruído a partir do snapshot mais próximo e só
+    dos dias de movimentação entre os dois.
+    """
+    __tablename__ = "estoque_snapshots"
+
+    dia = Column(Date, primary_key=True)
+    produto_id = Column(Integer, ForeignKey("produtos.id", ondelete="CASCADE"), primary_key=True)
+    local_id = Column(Integer, ForeignKey("locais.id", ondelete="CASCADE"), primary_key=True)
+    quantidade = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,86 @@
+# paginacao.py
+import base64
+import json
+from datetime import date, datetime
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import tuple_
+
+LIMITE_PADRAO = 100
+LIMITE_MAXIMO = 1000
+
+
+# --- Cursor opaco ---
+def _serializar(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+def _desserializar(valor, coluna):
+    if valor is None:
+        return None
+    tipo = coluna.type.python_type
+    if tipo is datetime:
+        return datetime.fromisoformat(valor)
+    if tipo is date:
+        # Aceita também cursores gerados a partir de colunas datetime
+        return datetime.fromisoformat(valor).date() if "T" in valor else date.fromisoformat(valor)
+    return tipo(valor)
+
+def codificar_cursor(valores) -> str:
+    dados = json.dumps([_serializar(v) for v in valores], separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip("=")
+
+def decodificar_cursor(cursor: str, colunas) -> list:
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        if not isinstance(valores, list) or len(valores) != len(colunas):
+            raise ValueError("cursor com número de chaves incorreto")
+        return [_desserializar(v, c) for v, c in zip(valores, colunas)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+
+
+# --- Paginação por chave (keyset) ---
+def preparar_pagina(query, colunas, limit: int = LIMITE_PADRAO, cursor: str | None = None, desc: bool = False):
+    """
+    Aplica filtro do cursor, ordenação e limite (+1 para detectar a próxima
+    página). Aceita tanto Query quanto select(), para uso síncrono ou assíncrono.
+    """
+    limit = max(1, min(limit, LIMITE_MAXIMO))
+    chave = tuple_(*colunas)
+
+    if cursor:
+        valores = tuple_(*decodificar_cursor(cursor, colunas))
+        query = query.filter(chave < valores if desc else chave > valores)
+
+    ordem = [c.desc() for c in colunas] if desc else list(colunas)
+    return query.order_by(*ordem).limit(limit + 1)
+
+def fechar_pagina(itens, colunas, limit: int = LIMITE_PADRAO):
+    """Corta o item extra e monta o cursor da próxima página a partir do último item."""
+    limit = max(1, min(limit, LIMITE_MAXIMO))
+    if len(itens) <= limit:
+        return itens, None
+
+    itens = itens[:limit]
+    ultimo = itens[-1]
+    return itens, codificar_cursor([getattr(ultimo, c.key) for c in colunas])
+
+def paginar(query, colunas, limit: int = LIMITE_PADRAO, cursor: str | None = None, desc: bool = False):
+    """
+    Aplica paginação keyset à query, ordenando pelas colunas informadas
+    (a última deve ser única, ex.: o id). Retorna (itens, proximo_cursor);
+    proximo_cursor é None na última página.
+    """
+    itens = preparar_pagina(query, colunas, limit, cursor, desc).all()
+    return fechar_pagina(itens, colunas, limit)
+
+def definir_link_proximo(request: Request, response: Response, proximo_cursor: str | None, limit: int):
+    """Expõe o cursor da próxima página nos headers Link (rel="next") e X-Next-Cursor."""
+    if not proximo_cursor:
+        return
+    url = request.url.include_query_params(cursor=proximo_cursor, limit=limit)
+    response.headers["Link"] = f'<{url}>; rel="next"'
+    response.headers["X-Next-Cursor"] = proximo_cursor
@@ -0,0 +1,147 @@
+# particoes.py
+"""
+Partições mensais da tabela movimentacoes (PostgreSQL, migração 0004).
+
+Cada mês fica em `movimentacoes_AAAA_MM`; datas sem partição caem em
+`movimentacoes_padrao`. Os relatórios por período filtram data_movimentacao
+por intervalo de datas, então o planejador só lê os meses pedidos.
+
+Uso (a partir da raiz do projeto):
+    python particoes.py listar
+    python particoes.py criar --meses 3           # garante os próximos meses
+    python particoes.py arquivar --antes-de 2023-01-01 --pasta arquivo/movimentacoes
+
+`arquivar` desanexa cada mês anterior à data, grava as linhas em
+`<pasta>/movimentacoes_AAAA_MM.csv.gz` e apaga a partição. Os totais
+continuam no resumo diário (movimentacoes_resumo_diario): o recálculo sem
+período (backfill_resumo.py) começa na partição mais antiga ainda anexada e
+não toca nos meses arquivados. Para restaurar:
+    gunzip -c movimentacoes_2022_05.csv.gz | psql -c "COPY movimentacoes FROM STDIN WITH (FORMAT csv, HEADER)"
+"""
+import argparse
+import gzip
+import os
+import re
+from datetime import date, datetime
+from pathlib import Path
+
+from sqlalchemy import text
+
+# Meses futuros mantidos criados (também garantidos ao subir a API)
+MESES_A_FRENTE = int(os.getenv("PARTICOES_MESES_A_FRENTE", "3"))
+PASTA_ARQUIVO = os.getenv("ARQUIVO_MOVIMENTACOES_DIR", "arquivo/movimentacoes")
+
+PADRAO_PARTICAO = re.compile(r"^movimentacoes_(\d{4})_(\d{2})$")
+
+
+def _primeiro_dia(d: date, meses: int = 0) -> date:
+    total = d.year * 12 + d.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+def particionada(conn) -> bool:
+    """True se movimentacoes já é uma tabela particionada (PostgreSQL com a migração 0004)."""
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('movimentacoes')"
+    )).scalar() or False
+
+def listar_particoes(conn) -> list[tuple[str, int]]:
+    """[(nome, linhas estimadas)] das partições de movimentacoes, em ordem de nome."""
+    return [tuple(r) for r in conn.execute(text(
+        "SELECT c.relname, GREATEST(c.reltuples, 0)::bigint "
+        "FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('movimentacoes') "
+        "ORDER BY c.relname"
+    ))]
+
+def inicio_particoes(conn) -> date | None:
+    """Primeiro dia da partição mensal mais antiga ainda anexada, ou None se não houver."""
+    meses = [PADRAO_PARTICAO.match(nome) for nome, _ in listar_particoes(conn)]
+    meses = [date(int(m.group(1)), int(m.group(2)), 1) for m in meses if m]
+    return min(meses) if meses else None
+
+def criar_particoes(engine, inicio: date, fim: date) -> int:
+    """Cria as partições mensais de `inicio` até `fim`. Retorna quantas foram criadas."""
+    with engine.begin() as conn:
+        if not particionada(conn):
+            return 0
+        return conn.execute(
+            text("SELECT criar_particoes_movimentacoes(:inicio, :fim)"),
+            {"inicio": inicio, "fim": fim}
+        ).scalar()
+
+def garantir_particoes(engine, meses: int = MESES_A_FRENTE) -> int:
+    """Garante as partições do mês atual e dos `meses` seguintes. Sem efeito fora do PostgreSQL."""
+    if engine.dialect.name != "postgresql":
+        return 0
+    hoje = datetime.utcnow().date()  # mesmo relógio de data_movimentacao
+    return criar_particoes(engine, _primeiro_dia(hoje), _primeiro_dia(hoje, meses))
+
+def arquivar_particoes(engine, antes_de: date, pasta: str = PASTA_ARQUIVO) -> list[Path]:
+    """
+    Arquiva os meses inteiramente anteriores a `antes_de`: DETACH, COPY para
+    um .csv.gz e DROP, na mesma transação por partição (se a cópia falhar,
+    a partição continua anexada). Retorna os arquivos gerados.
+    """
+    limite = _primeiro_dia(antes_de)
+    destino = Path(pasta)
+    destino.mkdir(parents=True, exist_ok=True)
+
+    with engine.connect() as conn:
+        if not particionada(conn):
+            raise RuntimeError("movimentacoes não está particionada (aplique as migrações no PostgreSQL)")
+        nomes = [nome for nome, _ in listar_particoes(conn)]
+
+    arquivos = []
+    for nome in nomes:
+        m = PADRAO_PARTICAO.match(nome)
+        if not m or date(int(m.group(1)), int(m.group(2)), 1) >= limite:
+            continue
+
+        caminho = destino / f"{nome}.csv.gz"
+        temporario = caminho.with_suffix(".tmp")
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"ALTER TABLE movimentacoes DETACH PARTITION {nome}")
+            with gzip.open(temporario, "wb") as arquivo:
+                cursor = conn.connection.cursor()
+                cursor.copy_expert(
+                    f"COPY {nome} (id, tipo, quantidade, produto_id, local_id, data_movimentacao) "
+                    "TO STDOUT WITH (FORMAT csv, HEADER)",
+                    arquivo
+                )
+            os.replace(temporario, caminho)
+            conn.exec_driver_sql(f"DROP TABLE {nome}")
+        arquivos.append(caminho)
+    return arquivos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("listar", help="lista as partições e linhas estimadas")
+    criar = comandos.add_parser("criar", help="garante as partições do mês atual e dos próximos")
+    criar.add_argument("--meses", type=int, default=MESES_A_FRENTE)
+    arquivar = comandos.add_parser("arquivar", help="arquiva e remove os meses anteriores a uma data")
+    arquivar.add_argument("--antes-de", type=date.fromisoformat, required=True, help="AAAA-MM-DD")
+    arquivar.add_argument("--pasta", default=PASTA_ARQUIVO)
+    args = parser.parse_args()
+
+    from database import engine
+
+    if args.comando == "listar":
+        with engine.connect() as conn:
+            if not particionada(conn):
+                raise SystemExit("movimentacoes não está particionada")
+            for nome, linhas in listar_particoes(conn):
+                print(f"{nome}: ~{linhas} linhas")
+    elif args.comando == "criar":
+        print(f"Partições criadas: {garantir_particoes(engine, args.meses)}")
+    else:
+        for caminho in arquivar_particoes(engine, args.antes_de, args.pasta):
+            print(f"Arquivada: {caminho}")
+
+
+if __name__ == "__main__":
+    main()
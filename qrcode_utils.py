@@ -1,11 +1,33 @@
 from io import BytesIO
+from functools import lru_cache
 import qrcode
 from PIL import Image, ImageDraw, ImageFont
 from fastapi.responses import StreamingResponse
 from datetime import datetime
+from metricas import ETIQUETA_SEGUNDOS, cronometrar
 
 # Caminho da fonte
 FONT_PATH = "arial.ttf"
+TAMANHO_MINIMO_FONTE = 8
+
+
+# --- Registro de fontes e métricas de texto ---
+@lru_cache(maxsize=128)
+def carregar_fonte(font_path: str, tamanho: int):
+    """Fonte carregada uma única vez por (caminho, tamanho); usa a padrão se o arquivo não existir."""
+    try:
+        return ImageFont.truetype(font_path, tamanho)
+    except OSError:
+        return ImageFont.load_default()
+
+@lru_cache(maxsize=8192)
+def _largura_texto(font, texto: str) -> float:
+    return font.getlength(texto)
+
+@lru_cache(maxsize=2048)
+def _altura_texto(font, texto: str) -> int:
+    bbox = font.getbbox(texto)
+    return bbox[3] - bbox[1]
 
 # --- Geração do QR Code ---
 def gerar_qr_code_img(dados: str, tamanho_qr: int = 150):
@@ -23,7 +45,9 @@ def gerar_qr_code_img(dados: str, tamanho_qr: int = 150):
 
 
 # --- Etiqueta simples (para locais / racks) ---
-def gerar_etiqueta_qr_rack(codigo: str, descricao: str, rack_nivel: str, id_item: int):
+@cronometrar(ETIQUETA_SEGUNDOS, tipo="rack")
+def renderizar_etiqueta_rack(codigo: str, descricao: str, rack_nivel: str, id_item: int) -> bytes:
+    """Desenha a etiqueta do rack e retorna o PNG codificado."""
     qr_img = gerar_qr_code_img(f"{codigo} - {descricao} - ID: {id_item}")
 
     largura, altura = 510, 200
@@ -32,11 +56,7 @@ def gerar_etiqueta_qr_rack(codigo: str, descricao: str, rack_nivel: str, id_item
 
     etiqueta.paste(qr_img, (10, 25))
 
-    try:
-        font_size = qr_img.height
-        font = ImageFont.truetype(FONT_PATH, size=font_size)
-    except:
-        font = ImageFont.load_default()
+    font = carregar_fonte(FONT_PATH, qr_img.height)
 
     x_text = 10 + qr_img.width + 10
     y_text = 20
@@ -50,14 +70,17 @@ def gerar_etiqueta_qr_rack(codigo: str, descricao: str, rack_nivel: str, id_item
     txt_img = txt_img.resize((largura_desejada, qr_img.height))
     etiqueta.paste(txt_img, (x_text, y_text))
 
-    buf = BytesIO()
-    etiqueta.save(buf, format="PNG")
-    buf.seek(0)
-    return StreamingResponse(buf, media_type="image/png")
+    return _para_png(etiqueta)
+
+def gerar_etiqueta_qr_rack(codigo: str, descricao: str, rack_nivel: str, id_item: int):
+    png = renderizar_etiqueta_rack(codigo, descricao, rack_nivel, id_item)
+    return StreamingResponse(BytesIO(png), media_type="image/png")
 
 
 # --- Etiqueta completa (para produtos) ---
-def gerar_etiqueta_qr_produto(produto):
+@cronometrar(ETIQUETA_SEGUNDOS, tipo="produto")
+def renderizar_etiqueta_produto(produto) -> bytes:
+    """Desenha a etiqueta do produto (SKU, descrição, lote e validade) e retorna o PNG codificado."""
     qr_img = gerar_qr_code_img(f"{produto.sku} - {produto.descricao} - ID: {produto.id}")
 
     largura, altura = 400, 150
@@ -66,18 +89,13 @@ def gerar_etiqueta_qr_produto(produto):
 
     etiqueta.paste(qr_img, (2, 2))
 
-    try:
-        font_bold = ImageFont.truetype(FONT_PATH, 16)
-        font_regular = ImageFont.truetype(FONT_PATH, 16)
-    except:
-        font_bold = ImageFont.load_default()
-        font_regular = ImageFont.load_default()
+    font_regular = carregar_fonte(FONT_PATH, 16)
 
     x_text = 5 + qr_img.width + 10
     y_text = 20
 
     # SKU
-    font_sku = ImageFont.truetype(FONT_PATH, 20)
+    font_sku = carregar_fonte(FONT_PATH, 20)
     draw.text((x_text, y_text), f"SKU: {produto.sku}", fill="black", font=font_sku)
     y_text += 30
 
@@ -88,8 +106,7 @@ def gerar_etiqueta_qr_produto(produto):
 
     font_desc, linhas_desc = ajustar_fonte_para_cabimento(draw, texto_desc, max_width, espaco_disponivel, FONT_PATH, tamanho_inicial=16)
     for linha in linhas_desc:
-        bbox = draw.textbbox((0,0), linha, font=font_desc)
-        altura_linha = bbox[3] - bbox[1]
+        altura_linha = _altura_texto(font_desc, linha)
         draw.text((x_text, y_text), linha, fill="black", font=font_desc)
         y_text += altura_linha + 4
 
@@ -116,49 +133,68 @@ def gerar_etiqueta_qr_produto(produto):
     y_text += 20
     draw.text((x_text, y_text), f"Validade: {validade_date}", fill="black", font=font_regular)
 
+    return _para_png(etiqueta)
+
+def gerar_etiqueta_qr_produto(produto):
+    return StreamingResponse(BytesIO(renderizar_etiqueta_produto(produto)), media_type="image/png")
+
+
+def _para_png(imagem) -> bytes:
     buf = BytesIO()
-    etiqueta.save(buf, format="PNG")
-    buf.seek(0)
-    return StreamingResponse(buf, media_type="image/png")
+    imagem.save(buf, format="PNG")
+    return buf.getvalue()
 
 
 # --- Ajuste automático da fonte da descrição ---
-def ajustar_fonte_para_cabimento(draw, texto, max_width, max_altura, font_path, tamanho_inicial=16):
-    tamanho = tamanho_inicial
-    try:
-        font = ImageFont.truetype(font_path, tamanho)
-    except:
-        font = ImageFont.load_default()
-    
-    while True:
-        linhas = []
-        palavras = texto.split()
-        linha = ""
-        for palavra in palavras:
-            teste = linha + palavra + " "
-            largura_linha = draw.textlength(teste, font=font)
-            if largura_linha <= max_width:
-                linha = teste
-            else:
-                linhas.append(linha.strip())
-                linha = palavra + " "
-        if linha:
-            linhas.append(linha.strip())
-
-        altura_texto = 0
-        for l in linhas:
-            bbox = draw.textbbox((0,0), l, font=font)
-            altura_linha = bbox[3] - bbox[1]
-            altura_texto += altura_linha + 4
-
-        if altura_texto <= max_altura or tamanho <= 8:
-            break
-        tamanho -= 1
-        try:
-            font = ImageFont.truetype(font_path, tamanho)
-        except:
-            font = ImageFont.load_default()
+def _quebrar_linhas(font, palavras, max_width):
+    # Largura da linha = soma das larguras (memorizadas) de cada palavra + espaços
+    espaco = _largura_texto(font, " ")
+    linhas = []
+    linha = []
+    largura = 0.0
+    for palavra in palavras:
+        largura_palavra = _largura_texto(font, palavra) + espaco
+        if linha and largura + largura_palavra > max_width:
+            linhas.append(" ".join(linha))
+            linha, largura = [], 0.0
+        linha.append(palavra)
+        largura += largura_palavra
+    if linha:
+        linhas.append(" ".join(linha))
+    return linhas
+
+def _layout_texto(font, palavras, max_width):
+    linhas = _quebrar_linhas(font, palavras, max_width)
+    altura = sum(_altura_texto(font, l) + 4 for l in linhas)
+    return linhas, altura
 
+def ajustar_fonte_para_cabimento(draw, texto, max_width, max_altura, font_path, tamanho_inicial=16):
+    """
+    Maior tamanho de fonte (até tamanho_inicial, mínimo TAMANHO_MINIMO_FONTE)
+    em que o texto quebrado em linhas cabe em max_width x max_altura.
+    Busca binária sobre os tamanhos, com fontes e larguras em cache.
+    """
+    palavras = texto.split()
+
+    font = carregar_fonte(font_path, tamanho_inicial)
+    linhas, altura = _layout_texto(font, palavras, max_width)
+    if altura <= max_altura or tamanho_inicial <= TAMANHO_MINIMO_FONTE:
+        return font, linhas
+
+    # Menor tamanho sempre aceito; procura o maior que ainda cabe
+    menor, maior = TAMANHO_MINIMO_FONTE, tamanho_inicial - 1
+    melhor = menor
+    while menor <= maior:
+        meio = (menor + maior) // 2
+        _, altura = _layout_texto(carregar_fonte(font_path, meio), palavras, max_width)
+        if altura <= max_altura:
+            melhor = meio
+            menor = meio + 1
+        else:
+            maior = meio - 1
+
+    font = carregar_fonte(font_path, melhor)
+    linhas, _ = _layout_texto(font, palavras, max_width)
     return font, linhas
 
 
@@ -0,0 +1,73 @@
+# respostas.py
+"""
+Caminho rápido de serialização para listas grandes (relatórios, /estoque).
+
+As linhas saem do banco como tuplas e viram JSON com orjson de uma vez,
+sem Row._mapping, sem jsonable_encoder e sem validação Pydantic por linha.
+orjson é opcional: sem ele, cai no json da biblioteca padrão (mais lento,
+mesma saída).
+"""
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import Date, DateTime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Com "false", /estoque responde pelo caminho rápido, sem validar pelo response_model
+VALIDAR_RESPOSTAS = os.getenv("VALIDAR_RESPOSTAS", "true").lower() in ("1", "true", "sim")
+
+
+def _padrao(valor):
+    # Tipos que o orjson/json não serializam sozinhos
+    if isinstance(valor, Decimal):
+        return int(valor) if valor == valor.to_integral_value() else float(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+def dumps(conteudo) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(conteudo, default=_padrao, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(conteudo, default=_padrao, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class RespostaJSONRapida(JSONResponse):
+    """JSONResponse serializada com orjson; aceita também bytes já serializados."""
+
+    def render(self, content) -> bytes:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        return dumps(content)
+
+
+def _formatar_data(valor):
+    # Mesmo formato de crud.linha_relatorio
+    return valor.strftime("%Y-%m-%d %H:%M:%S") if valor is not None else None
+
+def relatorio_json(query) -> bytes:
+    """
+    Executa a query de relatório e serializa as linhas como lista de objetos,
+    com a mesma saída de [crud.linha_relatorio(r) for r in query]. Só as
+    colunas de data passam por conversão; o resto vai direto da tupla.
+    """
+    nomes = [d["name"] for d in query.column_descriptions]
+    colunas_data = [
+        i for i, d in enumerate(query.column_descriptions) if isinstance(d["type"], (Date, DateTime))
+    ]
+    linhas = query.all()
+    if colunas_data:
+        linhas = [list(linha) for linha in linhas]
+        for linha in linhas:
+            for i in colunas_data:
+                linha[i] = _formatar_data(linha[i])
+    return dumps([dict(zip(nomes, linha)) for linha in linhas])
+
+def responder_relatorio(query) -> RespostaJSONRapida:
+    return RespostaJSONRapida(relatorio_json(query))
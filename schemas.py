@@ -1,4 +1,5 @@
 # schemas.py
+from typing import Literal
 from pydantic import BaseModel
 from datetime import date
 from datetime import date, datetime
@@ -19,6 +20,9 @@ class Produto(ProdutoBase):
     class Config:
         from_attributes = True
 
+class ProdutoBusca(Produto):
+    relevancia: float  # 1.0 = SKU igual ao termo (ver busca_produtos.py)
+
 # Local
 class LocalBase(BaseModel):
     codigo: str
@@ -83,4 +87,45 @@ class Movimentacao(MovimentacaoBase):
     id: int
     data_movimentacao: datetime
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class MovimentacaoLoteResultado(BaseModel):
+    indice: int  # posição do item na lista enviada
+    sucesso: bool
+    movimentacao: Movimentacao | None = None
+    erro: str | None = None
+
+# Etiquetas em lote
+class EtiquetasLocaisLote(BaseModel):
+    ids: list[int] | None = None
+    armazem: str | None = None
+    corredor: str | None = None
+    formato: Literal["zip", "pdf"] = "zip"
+
+class EtiquetasProdutosLote(BaseModel):
+    ids: list[int] | None = None
+    prefixo_sku: str | None = None
+    formato: Literal["zip", "pdf"] = "zip"
+
+# Relatórios em segundo plano (jobs)
+class RelatorioJobCreate(BaseModel):
+    relatorio: Literal["movimentacoes", "estoque-geral", "inventario-por-local", "operacoes"]
+    formato: Literal["csv", "parquet"] = "csv"
+    data_inicio: date | None = None  # obrigatórias para "movimentacoes"
+    data_fim: date | None = None
+
+class RelatorioJob(BaseModel):
+    id: str
+    relatorio: str
+    formato: str
+    parametros: dict
+    status: Literal["pendente", "executando", "concluido", "erro"]
+    criado_em: datetime
+    iniciado_em: datetime | None = None
+    concluido_em: datetime | None = None
+    linhas: int | None = None
+    tamanho_bytes: int | None = None
+    erro: str | None = None
+    arquivo: str | None = None  # URL de download quando concluído
+    class Config:
+        from_attributes = True
@@ -0,0 +1,78 @@
+# snapshots_estoque.py
+"""
+Snapshots diários do estoque (tabela estoque_snapshots), base do relatório
+/relatorios/estoque-em/{data}.
+
+Cada snapshot guarda o saldo de todos os produtos/locais ao fim de um dia.
+Rode diariamente (cron) ou deixe a API gravar sozinha definindo
+SNAPSHOT_INTERVALO_HORAS no .env.
+
+Uso (a partir da raiz do projeto):
+    python snapshots_estoque.py                    # snapshot de ontem
+    python snapshots_estoque.py --dia 2025-03-31   # qualquer dia já encerrado
+"""
+import argparse
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+import crud, models
+from database import SessionLocal
+
+# 0 desliga o agendador interno da API
+SNAPSHOT_INTERVALO_HORAS = float(os.getenv("SNAPSHOT_INTERVALO_HORAS", "0"))
+
+logger = logging.getLogger("wms.snapshots")
+
+
+def snapshot_de_ontem(substituir: bool = False) -> int:
+    """Grava o snapshot do dia anterior, se ainda não existir. Retorna as linhas gravadas."""
+    ontem = datetime.utcnow().date() - timedelta(days=1)
+    db = SessionLocal()
+    try:
+        if not substituir and db.query(models.EstoqueSnapshot.dia).filter(models.EstoqueSnapshot.dia == ontem).first():
+            return 0
+        return crud.criar_snapshot_estoque(db, ontem)
+    finally:
+        db.close()
+
+def iniciar_agendador(intervalo_horas: float = SNAPSHOT_INTERVALO_HORAS):
+    """Thread em segundo plano que grava o snapshot de ontem a cada intervalo (idempotente)."""
+    if intervalo_horas <= 0:
+        return None
+    parar = threading.Event()
+
+    def _executar():
+        while not parar.is_set():
+            try:
+                snapshot_de_ontem()
+            except Exception:
+                logger.exception("Falha ao gravar snapshot de estoque")
+            parar.wait(intervalo_horas * 3600)
+
+    threading.Thread(target=_executar, name="snapshots-estoque", daemon=True).start()
+    return parar
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dia", type=lambda v: datetime.strptime(v, "%Y-%m-%d").date(), default=None,
+                        help="dia já encerrado (AAAA-MM-DD); padrão: ontem")
+    args = parser.parse_args()
+
+    if args.dia is None:
+        gravadas = snapshot_de_ontem(substituir=True)
+    else:
+        db = SessionLocal()
+        try:
+            gravadas = crud.criar_snapshot_estoque(db, args.dia)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        finally:
+            db.close()
+    print(f"Snapshot gravado: {gravadas} linhas")
+
+
+if __name__ == "__main__":
+    main()
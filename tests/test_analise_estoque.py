@@ -0,0 +1,49 @@
+# tests/test_analise_estoque.py
+from datetime import date, datetime
+
+import analise_estoque, crud, models, schemas
+
+
+class _RelogioUTC(datetime):
+    """Relógio fixo perto da virada do dia em UTC."""
+
+    @classmethod
+    def utcnow(cls):
+        return datetime(2024, 3, 10, 23, 30)
+
+
+def test_periodo_da_analise_usa_a_data_utc_das_movimentacoes(db, monkeypatch):
+    db.add_all([models.Produto(id=1, sku="P1", descricao="Produto"), models.Local(id=1, codigo="L1")])
+    db.flush()
+    db.add_all([
+        models.MovimentacaoResumoDiario(produto_id=1, local_id=1, tipo="saida", dia=date(2024, 3, 9),
+                                        quantidade_total=4, movimentacoes=1),
+        models.MovimentacaoResumoDiario(produto_id=1, local_id=1, tipo="saida", dia=date(2024, 3, 10),
+                                        quantidade_total=6, movimentacoes=1),
+    ])
+    db.commit()
+    monkeypatch.setattr(analise_estoque, "datetime", _RelogioUTC)
+
+    # Um dia de período: só o dia UTC de hoje
+    assert analise_estoque.analise(db, 1).saidas.tolist() == [6.0]
+    assert analise_estoque.analise(db, 2).saidas.tolist() == [10.0]
+
+def test_movimentacao_com_id_menor_invalida_o_cache(db):
+    db.add_all([models.Produto(id=1, sku="P1", descricao="Produto"), models.Local(id=1, codigo="L1")])
+    db.commit()
+    hoje = datetime.utcnow()
+
+    def saida(id_, quantidade):
+        # Como em crud.create_movimentacao: a movimentação e o resumo na mesma transação
+        db.add(models.Movimentacao(id=id_, tipo="saida", quantidade=quantidade, produto_id=1, local_id=1,
+                                   data_movimentacao=hoje.date()))
+        db.execute(crud._stmt_somar_resumo(db, [crud._linha_resumo(
+            schemas.MovimentacaoCreate(tipo="saida", produto_id=1, local_id=1, quantidade=quantidade), hoje
+        )]))
+        db.commit()
+
+    saida(10, 3)
+    assert analise_estoque.analise(db, 30).saidas.tolist() == [3.0]
+    # Transação que pegou o id 5 antes e só confirmou agora: o maior id não muda
+    saida(5, 2)
+    assert analise_estoque.analise(db, 30).saidas.tolist() == [5.0]
@@ -0,0 +1,35 @@
+# tests/test_busca_produtos.py
+import pytest
+
+import crud, models
+
+
+def _cadastrar(db):
+    # Muitos casamentos fracos (trecho no meio da palavra) antes do melhor
+    db.add_all([models.Produto(sku=f"T-{i:03d}", descricao=f"Trava antiparafuso {i}") for i in range(300)])
+    db.add_all([
+        models.Produto(sku="PAR-001", descricao="Parafuso allen"),
+        models.Produto(sku="Z-1", descricao="Caixa de parafuso sextavado"),
+    ])
+    db.commit()
+
+
+def test_busca_em_memoria(db):
+    _cadastrar(db)
+    encontrados = crud.buscar_produtos(db, "par-001", 5)
+    assert [(p["sku"], p["relevancia"]) for p in encontrados][:1] == [("PAR-001", 1.0)]
+    assert [p["sku"] for p in crud.buscar_produtos(db, "sextavado", 5)] == ["Z-1"]
+
+@pytest.mark.postgresql
+def test_busca_por_trigramas_ordena_antes_de_limitar(db_postgresql):
+    db = db_postgresql
+    if not crud._tem_trigramas(db):
+        pytest.skip("servidor sem pg_trgm: a busca usa o índice em memória")
+    _cadastrar(db)
+
+    encontrados = crud.buscar_produtos(db, "parafuso", 3)
+    # Palavras que começam com o termo (0.8) vêm antes dos trechos, por mais que haja
+    assert [p["sku"] for p in encontrados[:2]] == ["PAR-001", "Z-1"]
+    assert encontrados[2]["relevancia"] < 0.8
+    relevancias = [p["relevancia"] for p in crud.buscar_produtos(db, "antiparafus", 20)]
+    assert relevancias == sorted(relevancias, reverse=True)
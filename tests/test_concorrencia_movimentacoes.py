@@ -0,0 +1,55 @@
+# tests/test_concorrencia_movimentacoes.py
+"""
+Invariante de benchmarks/stress_movimentacoes.py (modo atomico), em escala
+de CI: movimentações concorrentes no mesmo item nunca perdem atualização
+nem deixam o saldo negativo.
+"""
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import crud, models, schemas
+
+WORKERS = 8
+OPERACOES = 25
+SALDO_INICIAL = 20
+
+
+def _worker(engine, semente: int) -> int:
+    rnd = random.Random(semente)
+    aceitas = 0
+    with Session(engine) as db:
+        for _ in range(OPERACOES):
+            mov = schemas.MovimentacaoCreate(
+                tipo=rnd.choice(("entrada", "saida")), produto_id=1, local_id=1, quantidade=rnd.randint(1, 5)
+            )
+            try:
+                crud.create_movimentacao(db, mov)
+                aceitas += 1
+            except HTTPException:
+                db.rollback()
+    return aceitas
+
+
+@pytest.mark.postgresql
+def test_movimentacoes_concorrentes_no_mesmo_item(db_postgresql):
+    db = db_postgresql
+    db.add_all([models.Produto(id=1, sku="P1", descricao="Produto"), models.Local(id=1, codigo="L1")])
+    db.flush()
+    db.add(models.Estoque(produto_id=1, local_id=1, quantidade=SALDO_INICIAL))
+    db.commit()
+
+    engine = db.get_bind()
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        aceitas = sum(pool.map(lambda i: _worker(engine, i), range(WORKERS)))
+
+    somas = dict(db.query(models.Movimentacao.tipo, func.sum(models.Movimentacao.quantidade))
+                 .group_by(models.Movimentacao.tipo).all())
+    saldos = db.query(models.Estoque.quantidade).filter_by(produto_id=1, local_id=1).all()
+    assert db.query(func.count(models.Movimentacao.id)).scalar() == aceitas
+    assert saldos == [(SALDO_INICIAL + (somas.get("entrada") or 0) - (somas.get("saida") or 0),)]
+    assert saldos[0][0] >= 0
@@ -0,0 +1,30 @@
+# tests/test_definicoes.py
+import ast
+from collections import Counter
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def _redefinidas(corpo) -> list[str]:
+    nomes = Counter(
+        no.name for no in corpo
+        if isinstance(no, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+        # @x.setter, @overload e afins redefinem de propósito
+        and not any(ast.unparse(d).endswith((".setter", ".deleter", "overload")) for d in no.decorator_list)
+    )
+    return [nome for nome, total in nomes.items() if total > 1]
+
+
+def test_nenhuma_funcao_ou_classe_definida_duas_vezes():
+    repetidas = {}
+    for caminho in sorted(RAIZ.rglob("*.py")):
+        if ".venv" in caminho.parts:
+            continue
+        arvore = ast.parse(caminho.read_text(encoding="utf-8"))
+        blocos = [arvore.body] + [no.body for no in ast.walk(arvore) if isinstance(no, ast.ClassDef)]
+        nomes = [nome for corpo in blocos for nome in _redefinidas(corpo)]
+        if nomes:
+            repetidas[str(caminho.relative_to(RAIZ))] = nomes
+    # A segunda definição substitui a primeira sem aviso
+    assert repetidas == {}
@@ -0,0 +1,104 @@
+# tests/test_estoque_em.py
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+import crud, database, migracoes, models
+
+HOJE = datetime.utcnow().date()
+
+
+@pytest.fixture
+def cadastro(client):
+    client.post("/produtos", json={"sku": "P1", "descricao": "Produto 1"})
+    client.post("/locais", json={"codigo": "L1", "armazem": "A", "corredor": "C", "rack_nivel": "R"})
+    client.post("/locais", json={"codigo": "L2", "armazem": "A", "corredor": "C", "rack_nivel": "R"})
+    return client
+
+def _estoque_em(client, dia: date) -> dict:
+    resposta = client.get(f"/relatorios/estoque-em/{dia}")
+    assert resposta.status_code == 200
+    return {(linha["produto_id"], linha["local"]): linha["quantidade"] for linha in resposta.json()}
+
+
+def test_estoque_criado_direto_nao_aparece_em_datas_anteriores(cadastro):
+    assert cadastro.post("/estoque", json={"produto_id": 1, "local_id": 1, "quantidade": 15}).status_code == 200
+
+    assert _estoque_em(cadastro, date(1999, 1, 1)) == {}
+    assert _estoque_em(cadastro, HOJE - timedelta(days=1)) == {}
+    assert _estoque_em(cadastro, HOJE) == {(1, "L1"): 15}
+
+def test_estoque_semeado_nao_aparece_em_datas_anteriores(cadastro):
+    assert cadastro.post("/popular_estoque", params={"quantidade": 7}).json()["criados"] == 2
+    # Semear de novo não recria os pares nem duplica os ajustes
+    assert cadastro.post("/popular_estoque", params={"quantidade": 7}).json()["criados"] == 0
+
+    assert _estoque_em(cadastro, date(1999, 1, 1)) == {}
+    assert _estoque_em(cadastro, HOJE) == {(1, "L1"): 7, (1, "L2"): 7}
+
+def test_semeadura_registra_um_ajuste_por_saldo_criado(db):
+    # Mais pares que o limite de variáveis do SQLite por comando
+    db.add_all([models.Produto(sku=f"P{i}", descricao=f"Produto {i}") for i in range(40)])
+    db.add_all([models.Local(codigo=f"L{i}") for i in range(30)])
+    db.commit()
+    # Um saldo de outra origem no meio dos ids não ganha ajuste
+    db.add(models.Estoque(produto_id=1, local_id=1, quantidade=3))
+    db.commit()
+
+    assert crud.popular_estoque(db, 2) == 40 * 30 - 1
+    ajustes = db.query(models.Movimentacao.produto_id, models.Movimentacao.local_id).all()
+    assert len(ajustes) == len(set(ajustes)) == 40 * 30 - 1
+    assert (1, 1) not in ajustes
+
+def test_snapshot_anterior_ao_estoque_direto(cadastro, db):
+    crud.criar_snapshot_estoque(db, HOJE - timedelta(days=3))
+    cadastro.post("/estoque", json={"produto_id": 1, "local_id": 2, "quantidade": 4})
+    cadastro.post("/movimentacoes", json={"tipo": "saida", "produto_id": 1, "local_id": 2, "quantidade": 1})
+    crud.criar_snapshot_estoque(db, HOJE - timedelta(days=1))
+
+    assert _estoque_em(cadastro, HOJE - timedelta(days=2)) == {}
+    assert _estoque_em(cadastro, HOJE) == {(1, "L2"): 3}
+
+def test_migracao_registra_ajuste_de_estoque_antigo(cadastro):
+    # Saldo gravado antes das movimentações de ajuste, com uma entrada depois
+    criado = datetime.utcnow() - timedelta(days=10)
+    with database.engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO estoque (produto_id, local_id, quantidade, atualizado_em) VALUES (1, 1, 12, :criado)"
+        ), {"criado": criado})
+        conn.execute(text(
+            "INSERT INTO movimentacoes_resumo_diario (produto_id, local_id, tipo, dia, quantidade_total, movimentacoes)"
+            " VALUES (1, 1, 'entrada', :dia, 2, 1)"
+        ), {"dia": HOJE - timedelta(days=5)})
+
+    [(_, caminho)] = [a for a in migracoes.listar_arquivos("sqlite") if a[1].name.startswith("0008_")]
+    with database.engine.begin() as conn:
+        migracoes._executar_script(conn, caminho.read_text(encoding="utf-8"))
+
+    assert _estoque_em(cadastro, HOJE - timedelta(days=11)) == {}
+    assert _estoque_em(cadastro, HOJE - timedelta(days=10)) == {(1, "L1"): 10}
+    assert _estoque_em(cadastro, HOJE - timedelta(days=5)) == {(1, "L1"): 12}
+    with database.SessionLocal() as db:
+        assert db.query(models.Movimentacao.tipo, models.Movimentacao.quantidade).all() == [("ajuste", 10)]
+
+@pytest.mark.postgresql
+def test_migracao_registra_ajuste_de_estoque_antigo_postgresql(db_postgresql):
+    db = db_postgresql
+    db.add_all([models.Produto(id=1, sku="P1", descricao="Produto 1"), models.Local(id=1, codigo="L1")])
+    db.flush()
+    db.add(models.Estoque(produto_id=1, local_id=1, quantidade=12, atualizado_em=datetime.utcnow() - timedelta(days=10)))
+    db.add(models.MovimentacaoResumoDiario(
+        produto_id=1, local_id=1, tipo="entrada", dia=HOJE - timedelta(days=5), quantidade_total=2, movimentacoes=1
+    ))
+    db.commit()
+
+    [(_, caminho)] = [a for a in migracoes.listar_arquivos("postgresql") if a[1].name.startswith("0008_")]
+    with db.get_bind().begin() as conn:
+        migracoes._executar_script(conn, caminho.read_text(encoding="utf-8"))
+
+    def saldo(dia):
+        return [(r["local"], r["quantidade"]) for r in crud.relatorio_estoque_em(db, dia)]
+    assert saldo(HOJE - timedelta(days=11)) == []
+    assert saldo(HOJE - timedelta(days=10)) == [("L1", 10)]
+    assert saldo(HOJE - timedelta(days=5)) == [("L1", 12)]
@@ -0,0 +1,14 @@
+# tests/test_etiquetas_lote.py
+from types import SimpleNamespace
+
+from etiquetas_lote import item_local, item_produto
+
+
+def test_nomes_no_zip_nao_colidem_com_barra_e_sublinhado():
+    locais = [SimpleNamespace(id=i, codigo=codigo, descricao=None, rack_nivel="R")
+              for i, codigo in enumerate(("A/1", "A_1"), start=1)]
+    produtos = [SimpleNamespace(id=i, sku=sku, descricao="x", lote=None, validade=None)
+                for i, sku in enumerate(("P/1", "P_1"), start=1)]
+
+    nomes = [item_local(l)["nome"] for l in locais] + [item_produto(p)["nome"] for p in produtos]
+    assert nomes == ["local_1_A_1.png", "local_2_A_1.png", "produto_1_P_1.png", "produto_2_P_1.png"]
@@ -0,0 +1,106 @@
+# tests/test_exportacao_movimentacoes.py
+from datetime import date
+
+import pytest
+
+import exportacao_movimentacoes, models
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.dataset  # noqa: E402
+
+
+def _movimentar(db, *ids):
+    db.add_all([
+        models.Movimentacao(id=i, tipo="entrada", quantidade=i, produto_id=1, local_id=1,
+                            data_movimentacao=date(2024, 1 + i % 2, 10))
+        for i in ids
+    ])
+    db.commit()
+
+def _exportados(pasta) -> list[int]:
+    return sorted(pyarrow.dataset.dataset(pasta, partitioning="hive").to_table(columns=["id"]).column("id").to_pylist())
+
+
+@pytest.fixture
+def cadastro(db):
+    db.add_all([models.Produto(id=1, sku="P1", descricao="Produto"), models.Local(id=1, codigo="L1")])
+    db.commit()
+    return db
+
+def test_exportacao_rele_ids_que_apareceram_abaixo_do_watermark(cadastro, tmp_path):
+    db = cadastro
+    # O id 3 ainda estava numa transação aberta durante a primeira exportação
+    _movimentar(db, 1, 2, 4, 5)
+    resumo = exportacao_movimentacoes.exportar_parquet(str(tmp_path))
+    assert (resumo["ultimo_id"], resumo["lacunas"]) == (5, 1)
+
+    _movimentar(db, 3, 6)
+    resumo = exportacao_movimentacoes.exportar_parquet(str(tmp_path))
+    assert (resumo["linhas"], resumo["lacunas"]) == (2, 0)
+    assert _exportados(tmp_path) == [1, 2, 3, 4, 5, 6]
+
+    # Nada novo: nenhuma linha repetida
+    assert exportacao_movimentacoes.exportar_parquet(str(tmp_path))["linhas"] == 0
+    assert _exportados(tmp_path) == [1, 2, 3, 4, 5, 6]
+
+def test_parte_que_so_releu_lacunas_sobrevive_as_execucoes_seguintes(cadastro, tmp_path):
+    db = cadastro
+    _movimentar(db, 1, 2, 4, 5)
+    exportacao_movimentacoes.exportar_parquet(str(tmp_path))
+    # O id 3 chega atrasado e nada acima do watermark: a execução só relê a lacuna
+    _movimentar(db, 3)
+    assert exportacao_movimentacoes.exportar_parquet(str(tmp_path))["linhas"] == 1
+    exportacao_movimentacoes.exportar_parquet(str(tmp_path))
+
+    assert _exportados(tmp_path) == [1, 2, 3, 4, 5]
+    assert exportacao_movimentacoes.ler_watermark(tmp_path)["lacunas"] == []
+
+def test_partes_de_execucao_interrompida_sao_apagadas(cadastro, tmp_path):
+    _movimentar(cadastro, 1, 2)
+    exportacao_movimentacoes.exportar_parquet(str(tmp_path))
+    # Execução 2 gravou e renomeou a parte, mas caiu antes de avançar o watermark
+    _movimentar(cadastro, 3)
+    watermark = (tmp_path / exportacao_movimentacoes.ARQUIVO_WATERMARK).read_text(encoding="utf-8")
+    exportacao_movimentacoes.exportar_parquet(str(tmp_path))
+    (tmp_path / exportacao_movimentacoes.ARQUIVO_WATERMARK).write_text(watermark, encoding="utf-8")
+
+    assert exportacao_movimentacoes.exportar_parquet(str(tmp_path))["linhas"] == 1
+    assert _exportados(tmp_path) == [1, 2, 3]
+
+def test_lacuna_abaixo_da_margem_e_esquecida(cadastro, tmp_path, monkeypatch):
+    monkeypatch.setattr(exportacao_movimentacoes, "EXPORTACAO_MARGEM_IDS", 3)
+    _movimentar(cadastro, 1, 4, 5, 6, 7)
+    exportacao_movimentacoes.exportar_parquet(str(tmp_path))
+
+    assert exportacao_movimentacoes.ler_watermark(tmp_path)["lacunas"] == []
+    assert _exportados(tmp_path) == [1, 4, 5, 6, 7]
+
+def _stream(client, **params):
+    resposta = client.get("/movimentacoes/exportar", params=params)
+    assert resposta.status_code == 200
+    ids = pa.ipc.open_stream(resposta.content).read_all().column("id").to_pylist()
+    return ids, resposta.headers
+
+def test_stream_devolve_lacunas_e_rele_so_elas(cadastro, client):
+    _movimentar(cadastro, 1, 2, 4, 5)
+    ids, headers = _stream(client, desde_id=0)
+    assert (ids, headers["X-Watermark"], headers["X-Lacunas"]) == ([1, 2, 4, 5], "5", "3-3")
+    assert 'filename="movimentacoes-1-5.arrows"' in headers["Content-Disposition"]
+
+    # Sem nada atrasado, a sincronização seguinte não repete linhas
+    ids, headers = _stream(client, desde_id=5, lacunas="3-3")
+    assert (ids, headers["X-Watermark"], headers["X-Lacunas"]) == ([], "5", "3-3")
+
+    _movimentar(cadastro, 3, 6)
+    ids, headers = _stream(client, desde_id=5, lacunas="3-3")
+    assert (ids, headers["X-Watermark"], headers["X-Lacunas"]) == ([3, 6], "6", "")
+    assert 'filename="movimentacoes-6-6.arrows"' in headers["Content-Disposition"]
+
+def test_stream_lacunas_fora_da_margem_ou_invalidas(cadastro, client, monkeypatch):
+    monkeypatch.setattr(exportacao_movimentacoes, "EXPORTACAO_MARGEM_IDS", 2)
+    _movimentar(cadastro, 1, 5)
+    assert _stream(client, desde_id=0)[1]["X-Lacunas"] == "4-4"
+    _movimentar(cadastro, 2)
+    # O id 2 já está abaixo da margem de desde_id=5: é dado como desfeito
+    assert _stream(client, desde_id=5, lacunas="2-4")[0] == []
+    assert client.get("/movimentacoes/exportar", params={"desde_id": 5, "lacunas": "4-x"}).status_code == 400
@@ -0,0 +1,62 @@
+# tests/test_jobs_relatorios.py
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import crud, jobs_relatorios
+from jobs_relatorios import FilaRelatorios, Job
+
+
+def _gravar_antigo(fila, status, dias=2):
+    job = Job("operacoes", "csv", {}, "chave")
+    job.status = status
+    if status not in jobs_relatorios.EM_ANDAMENTO:
+        job.concluido_em = datetime.utcnow() - timedelta(days=dias)
+    fila._gravar_estado(job)
+    antigo = time.time() - dias * 86400
+    os.utime(fila._caminho_estado(job.id), (antigo, antigo))
+    return job
+
+def _aguardar(condicao, limite=5.0):
+    fim = time.monotonic() + limite
+    while not condicao():
+        assert time.monotonic() < fim, "tempo esgotado"
+        time.sleep(0.01)
+
+
+def test_limpeza_mantem_jobs_em_andamento_de_outros_workers(tmp_path):
+    fila = FilaRelatorios(str(tmp_path))
+    executando = _gravar_antigo(fila, "executando")
+    pendente = _gravar_antigo(fila, "pendente")
+    concluido = _gravar_antigo(fila, "concluido")
+
+    fila.limpar_expirados()
+
+    assert fila.consultar(executando.id).status == "executando"
+    assert fila.consultar(pendente.id).status == "pendente"
+    assert not fila._caminho_estado(concluido.id).exists()
+
+def test_encerrar_marca_jobs_da_fila_como_erro(db, tmp_path, monkeypatch):
+    liberar, iniciado = threading.Event(), threading.Event()
+    def bloqueante(sessao):
+        iniciado.set()
+        liberar.wait(5)
+        return crud.query_relatorio_operacoes(sessao)
+    monkeypatch.setitem(jobs_relatorios.RELATORIOS, "operacoes", (bloqueante, ()))
+
+    fila = FilaRelatorios(str(tmp_path), workers=1)
+    executando = fila.solicitar("operacoes", "csv")
+    iniciado.wait(5)
+    na_fila = fila.solicitar("estoque-geral", "csv")
+
+    fila.encerrar()
+    liberar.set()
+
+    assert na_fila.status == "erro"
+    estado = json.loads(fila._caminho_estado(na_fila.id).read_text(encoding="utf-8"))
+    assert estado["status"] == "erro" and estado["concluido_em"]
+    # O job que já executava termina normalmente
+    _aguardar(lambda: executando.status == "concluido")
+    assert fila.consultar(executando.id).status == "concluido"
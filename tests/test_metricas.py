@@ -0,0 +1,29 @@
+# tests/test_metricas.py
+import re
+
+from sqlalchemy import text
+
+import database, metricas
+
+
+def _valor(nome: str, **labels) -> float:
+    filtro = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    m = re.search(rf"^{nome}\{{{filtro}\}} (\S+)$", metricas.exportar(), re.MULTILINE)
+    return float(m.group(1)) if m else 0.0
+
+
+def test_espera_no_pool_e_medida_a_cada_conexao(db):
+    antes = _valor("wms_pool_espera_checkout_segundos_count", engine="principal")
+    for _ in range(3):
+        with database.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    assert _valor("wms_pool_espera_checkout_segundos_count", engine="principal") == antes + 3
+
+def test_ocupacao_do_pool(db):
+    with database.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        em_uso = _valor("wms_pool_conexoes", engine="principal", estado="em_uso")
+        tamanho = _valor("wms_pool_conexoes", engine="principal", estado="tamanho")
+        assert em_uso >= 1
+        assert _valor("wms_pool_conexoes", engine="principal", estado="saturacao") == round(em_uso / tamanho, 4)
+    assert _valor("wms_pool_conexoes", engine="principal", estado="em_uso") == em_uso - 1
@@ -0,0 +1,45 @@
+# tests/test_movimentacoes.py
+from datetime import datetime
+
+import pytest
+
+import models
+
+
+@pytest.fixture
+def cadastro(client):
+    client.post("/produtos", json={"sku": "P1", "descricao": "Produto 1"})
+    client.post("/locais", json={"codigo": "L1", "armazem": "A", "corredor": "C", "rack_nivel": "R"})
+    return client
+
+def _movimentar(client, tipo, quantidade, produto_id=1, local_id=1):
+    return client.post("/movimentacoes", json={
+        "tipo": tipo, "produto_id": produto_id, "local_id": local_id, "quantidade": quantidade
+    })
+
+
+def test_movimentacao_atualiza_saldo_e_resumo(cadastro, db):
+    entrada = _movimentar(cadastro, "entrada", 5)
+    assert entrada.status_code == 200
+    assert _movimentar(cadastro, "saida", 2).status_code == 200
+
+    hoje = datetime.utcnow().date()
+    # A resposta traz a data como gravada (coluna Date), igual à listagem
+    assert entrada.json()["data_movimentacao"] == f"{hoje}T00:00:00"
+    assert cadastro.get("/movimentacoes").json()[-1]["data_movimentacao"] == entrada.json()["data_movimentacao"]
+    assert db.query(models.Estoque.quantidade).all() == [(3,)]
+    resumo = models.MovimentacaoResumoDiario
+    assert sorted(db.query(resumo.tipo, resumo.dia, resumo.quantidade_total, resumo.movimentacoes)) == [
+        ("entrada", hoje, 5, 1), ("saida", hoje, 2, 1)
+    ]
+
+def test_movimentacao_recusada_nao_grava_nada(cadastro, db):
+    assert _movimentar(cadastro, "saida", 1).json()["detail"] == "Estoque não encontrado para saída"
+    _movimentar(cadastro, "entrada", 1)
+    resposta = _movimentar(cadastro, "saida", 2)
+    assert (resposta.status_code, resposta.json()["detail"]) == (400, "Quantidade insuficiente em estoque")
+    assert _movimentar(cadastro, "entrada", 1, produto_id=99).status_code == 404
+    assert _movimentar(cadastro, "ajuste", 1).status_code == 400
+
+    assert db.query(models.Movimentacao.tipo).all() == [("entrada",)]
+    assert db.query(models.Estoque.quantidade).all() == [(1,)]
@@ -0,0 +1,33 @@
+# tests/test_orcamento_queries.py
+"""
+Orçamento de queries por requisição dos endpoints de estoque: um número
+fixo (sem N+1), independentemente de quantas linhas retornam.
+"""
+import pytest
+
+import crud, models
+
+# Máximo de queries por requisição (a sessão não faz BEGIN explícito)
+ORCAMENTOS = {
+    "/estoque?limit=1000": 1,
+    "/produtos_por_local/{local_id}": 1,
+    "/locais_do_produto/{produto_id}": 1,
+}
+
+
+@pytest.mark.parametrize("produtos, locais", [(5, 4), (50, 20)])
+@pytest.mark.parametrize("rota", ORCAMENTOS)
+def test_endpoints_de_estoque_cabem_no_orcamento(client, db, contar_queries, rota, produtos, locais):
+    db.add_all(models.Produto(sku=f"ORC-{i}", descricao=f"Produto {i}") for i in range(produtos))
+    db.add_all(models.Local(codigo=f"ORC-{i}", armazem="ORC", corredor="1", rack_nivel=str(i), descricao=f"Local {i}") for i in range(locais))
+    db.commit()
+    crud.popular_estoque(db, quantidade_default=1)
+    produto_id = db.query(models.Produto.id).filter(models.Produto.sku == "ORC-0").scalar()
+    local_id = db.query(models.Local.id).filter(models.Local.codigo == "ORC-0").scalar()
+
+    url = rota.format(produto_id=produto_id, local_id=local_id)
+    with contar_queries(maximo=ORCAMENTOS[rota]):
+        resposta = client.get(url)
+    assert resposta.status_code == 200
+    assert len(resposta.json()) == (produtos * locais if rota.startswith("/estoque") else
+                                    produtos if "por_local" in rota else locais)
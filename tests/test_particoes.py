@@ -0,0 +1,39 @@
+# tests/test_particoes.py
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import text
+
+import models, particoes
+
+
+class _RelogioUTC(datetime):
+    """Meia-noite e meia do dia 1º em UTC: a oeste de Greenwich ainda é o mês anterior."""
+
+    @classmethod
+    def utcnow(cls):
+        return datetime(2031, 3, 1, 0, 30)
+
+
+@pytest.mark.postgresql
+def test_garantir_particoes_usa_o_mes_utc(db_postgresql, monkeypatch):
+    db = db_postgresql
+    engine = db.get_bind()
+    monkeypatch.setattr(particoes, "datetime", _RelogioUTC)
+    try:
+        particoes.garantir_particoes(engine, meses=1)
+        with engine.connect() as conn:
+            assert "movimentacoes_2031_03" in dict(particoes.listar_particoes(conn))
+
+        db.add_all([models.Produto(id=1, sku="P1", descricao="Produto"), models.Local(id=1, codigo="L1")])
+        db.flush()
+        db.add(models.Movimentacao(tipo="entrada", quantidade=1, produto_id=1, local_id=1,
+                                   data_movimentacao=date(2031, 3, 1)))
+        db.commit()
+        assert db.execute(text("SELECT tableoid::regclass::text FROM movimentacoes")).scalar() == "movimentacoes_2031_03"
+    finally:
+        db.rollback()
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM movimentacoes"))
+            for nome in ("movimentacoes_2031_03", "movimentacoes_2031_04"):
+                conn.execute(text(f"DROP TABLE IF EXISTS {nome}"))
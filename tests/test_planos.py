@@ -0,0 +1,131 @@
+# tests/test_planos.py
+"""
+Regressão de planos de execução das consultas quentes de crud.py
+(PostgreSQL): com volume sintético e ANALYZE, cada comando SELECT gerado
+passa por EXPLAIN (FORMAT JSON). Falha se cair em Seq Scan numa tabela
+grande, ler partições demais ou passar do custo estimado máximo.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+import crud, particoes
+
+pytestmark = pytest.mark.postgresql
+
+PRODUTOS, LOCAIS, MOVIMENTACOES = 1000, 200, 50_000
+TABELAS_GRANDES = {"movimentacoes", "estoque"}
+# Consultas por período: máximo de partições mensais que podem ler
+PODA_MAXIMA = {"relatório por período (1 dia)": 1}
+CUSTO_MAXIMO = 2000.0
+DIA = date(2023, 6, 1)
+
+
+def _segunda_pagina(db):
+    _, cursor = crud.get_movimentacoes(db, limit=100)
+    return crud.get_movimentacoes(db, limit=100, cursor=cursor)
+
+# Consultas quentes: nome -> chamada ao crud. Relatórios completos ficam de fora.
+CASOS = {
+    "get_movimentacoes": lambda db: crud.get_movimentacoes(db, limit=100),
+    "get_movimentacoes (página 2)": _segunda_pagina,
+    "filtradas por produto": lambda db: crud.get_movimentacoes_filtradas(db, produto_id=7),
+    "filtradas por local": lambda db: crud.get_movimentacoes_filtradas(db, local_id=3),
+    "filtradas por tipo e período": lambda db: crud.get_movimentacoes_filtradas(
+        db, tipo="saida", data_inicio=DIA, data_fim=DIA),
+    "relatório por período (1 dia)": lambda db: crud.relatorio_movimentacoes_por_periodo(db, DIA, DIA),
+    "get_estoque": lambda db: crud.get_estoque(db, limit=100),
+    "estoque por local": lambda db: crud.get_estoque_por_local(db, 3),
+    "estoque por produto": lambda db: crud.get_estoque_por_produto(db, 7),
+    "relatório estoque por produto": lambda db: crud.relatorio_estoque_por_produto(db, 7),
+}
+
+
+@pytest.fixture(scope="module")
+def engine_semeado(_engine_postgresql):
+    engine = _engine_postgresql
+    with engine.connect() as conn:
+        antes = {nome for nome, _ in particoes.listar_particoes(conn)}
+    # Volume gerado no próprio banco (generate_series), para semear rápido
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE movimentacoes, estoque, produtos, locais RESTART IDENTITY CASCADE"))
+        conn.execute(text(
+            "INSERT INTO produtos (sku, descricao) "
+            "SELECT 'SKU-' || g, 'Produto ' || g FROM generate_series(1, :n) g"
+        ), {"n": PRODUTOS})
+        conn.execute(text(
+            "INSERT INTO locais (codigo, armazem, corredor, rack_nivel, descricao) "
+            "SELECT 'L-' || g, 'A' || (g % 4), 'C' || (g % 20), 'R' || g, 'Local ' || g "
+            "FROM generate_series(1, :n) g"
+        ), {"n": LOCAIS})
+        conn.execute(text(
+            "INSERT INTO estoque (produto_id, local_id, quantidade, atualizado_em) "
+            "SELECT p.id, l.id, 10, now() FROM produtos p CROSS JOIN locais l "
+            "WHERE (p.id + l.id) % 5 = 0"
+        ))
+        conn.execute(text(
+            "INSERT INTO movimentacoes (tipo, quantidade, produto_id, local_id, data_movimentacao) "
+            "SELECT CASE WHEN g % 3 = 0 THEN 'saida' ELSE 'entrada' END, 1 + g % 7, "
+            "1 + g % :p, 1 + g % :l, DATE '2020-01-01' + (g % 1800) "
+            "FROM generate_series(1, :n) g"
+        ), {"p": PRODUTOS, "l": LOCAIS, "n": MOVIMENTACOES})
+    # Tira os meses semeados da partição padrão
+    particoes.criar_particoes(engine, date(2020, 1, 1), date(2025, 1, 1))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+    yield engine
+
+    # As partições criadas aqui não ficam para os outros testes (arquivar, recálculo)
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE movimentacoes, estoque, produtos, locais RESTART IDENTITY CASCADE"))
+        for nome, _ in particoes.listar_particoes(conn):
+            if nome not in antes:
+                conn.execute(text(f"DROP TABLE {nome}"))
+
+def _capturar(engine, chamada):
+    comandos = []
+
+    def _registrar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            comandos.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _registrar)
+    try:
+        with Session(engine) as db:
+            chamada(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", _registrar)
+    return comandos
+
+def _tabela(relacao: str | None) -> str | None:
+    # Partições mensais contam como a própria movimentacoes
+    if relacao and (particoes.PADRAO_PARTICAO.match(relacao) or relacao == "movimentacoes_padrao"):
+        return "movimentacoes"
+    return relacao
+
+def _nos(plano):
+    yield plano
+    for filho in plano.get("Plans", []):
+        yield from _nos(filho)
+
+
+@pytest.mark.parametrize("nome", CASOS)
+def test_plano_da_consulta_quente(engine_semeado, nome):
+    comandos = _capturar(engine_semeado, CASOS[nome])
+    assert comandos
+    with engine_semeado.connect() as conn:
+        for statement, parameters in comandos:
+            plano = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()[0]["Plan"]
+            seq_scans = sorted({
+                n["Relation Name"] for n in _nos(plano)
+                if n["Node Type"] == "Seq Scan" and _tabela(n.get("Relation Name")) in TABELAS_GRANDES
+            })
+            particoes_lidas = {
+                n["Relation Name"] for n in _nos(plano)
+                if particoes.PADRAO_PARTICAO.match(n.get("Relation Name") or "")
+            }
+            assert seq_scans == [], statement
+            assert len(particoes_lidas) <= PODA_MAXIMA.get(nome, len(particoes_lidas)), statement
+            assert plano["Total Cost"] <= CUSTO_MAXIMO, statement
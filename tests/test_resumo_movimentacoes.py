@@ -0,0 +1,69 @@
+# tests/test_resumo_movimentacoes.py
+from datetime import date
+
+import pytest
+from sqlalchemy import delete, func, select
+
+import crud, models, particoes
+
+
+def _cadastrar(db):
+    db.add_all([models.Produto(id=1, sku="P1", descricao="Produto"), models.Local(id=1, codigo="L1")])
+    db.flush()
+    db.add_all([
+        models.Movimentacao(tipo="entrada", quantidade=10, produto_id=1, local_id=1, data_movimentacao=date(2023, 1, 10)),
+        models.Movimentacao(tipo="saida", quantidade=4, produto_id=1, local_id=1, data_movimentacao=date(2023, 1, 20)),
+        models.Movimentacao(tipo="entrada", quantidade=7, produto_id=1, local_id=1, data_movimentacao=date(2023, 2, 5)),
+    ])
+    db.commit()
+
+def _totais(db):
+    resumo = models.MovimentacaoResumoDiario
+    return {
+        (dia, tipo): total
+        for dia, tipo, total in db.execute(select(resumo.dia, resumo.tipo, func.sum(resumo.quantidade_total))
+                                           .group_by(resumo.dia, resumo.tipo))
+    }
+
+
+def test_recalculo_sem_periodo_mantem_meses_fora_de_movimentacoes(db):
+    _cadastrar(db)
+    crud.recalcular_resumo_movimentacoes(db)
+    antes = _totais(db)
+    assert antes[(date(2023, 1, 10), "entrada")] == 10
+
+    # Janeiro arquivado: as linhas saem de movimentacoes e só restam no resumo
+    db.execute(delete(models.Movimentacao).where(models.Movimentacao.data_movimentacao < date(2023, 2, 1)))
+    db.commit()
+
+    assert crud.recalcular_resumo_movimentacoes(db) == 1
+    assert _totais(db) == antes
+    # Um período explícito também não apaga o que veio antes do histórico presente
+    crud.recalcular_resumo_movimentacoes(db, date(2023, 1, 1), date(2023, 2, 28))
+    assert _totais(db) == antes
+
+def test_recalculo_sem_movimentacoes_nao_apaga_o_resumo(db):
+    _cadastrar(db)
+    crud.recalcular_resumo_movimentacoes(db)
+    antes = _totais(db)
+    db.execute(delete(models.Movimentacao))
+    db.commit()
+
+    assert crud.recalcular_resumo_movimentacoes(db) == 0
+    assert _totais(db) == antes
+
+
+@pytest.mark.postgresql
+def test_recalculo_depois_de_arquivar_particoes(db_postgresql, tmp_path):
+    db = db_postgresql
+    engine = db.get_bind()
+    particoes.criar_particoes(engine, date(2023, 1, 1), date(2023, 2, 1))
+    _cadastrar(db)
+    crud.recalcular_resumo_movimentacoes(db)
+    antes = _totais(db)
+
+    arquivos = particoes.arquivar_particoes(engine, date(2023, 2, 1), str(tmp_path))
+    assert [a.name for a in arquivos] == ["movimentacoes_2023_01.csv.gz"]
+
+    crud.recalcular_resumo_movimentacoes(db)
+    assert _totais(db) == antes